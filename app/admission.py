@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .config import settings
+from .logging_context import request_client_cv
+
+logger = logging.getLogger(__name__)
+
+# 保留最近多少次准入的排队耗时，用于计算平均值与 p95
+WAIT_SAMPLE_SIZE = 1000
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+class AdmissionTicket:
+    def __init__(self, node: str, storage_key: Optional[str], caller: str):
+        self.node = node
+        self.storage_key = storage_key
+        self.caller = caller
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.released = False
+        self.event = threading.Event()
+
+    @property
+    def keys(self) -> Tuple[Tuple[str, str], ...]:
+        if self.storage_key is None:
+            return (('node', self.node),)
+        return (('node', self.node), ('storage', self.storage_key))
+
+
+class AdmissionScheduler:
+    # 变更类操作（创建、删除容器）的准入调度：按节点与存储限制同时进行的 Proxmox 任务数，
+    # 配额一直占用到任务结束；排队的请求按调用方轮转放行，避免单个调用方的批量操作饿死其他调用方
+
+    def __init__(self, service, node_limit: int = None, storage_limit: int = None):
+        self.service = service
+        self.node_limit = settings.admission_node_concurrency if node_limit is None else node_limit
+        self.storage_limit = settings.admission_storage_concurrency if storage_limit is None else storage_limit
+        self._lock = threading.Lock()
+        self._running: Dict[Tuple[str, str], int] = {}
+        self._held: Dict[int, AdmissionTicket] = {}
+        self._waiting: Dict[str, Deque[AdmissionTicket]] = {}
+        self._rotation: Deque[str] = deque()
+        self._wait_samples: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self.admitted = 0
+        self.timeouts = 0
+        self.expired = 0
+
+    def _storage_key(self, node: str, storage: Optional[str]) -> Optional[str]:
+        # 共享存储（如 Ceph、NFS）在整个集群内共用一个限额，本地存储按节点分别限流
+        if not storage:
+            return None
+        try:
+            for entry in self.service.get_storages(node):
+                if entry.get('storage') == storage and entry.get('shared'):
+                    return storage
+        except Exception as e:
+            logger.warning(f"获取节点 {node} 存储信息失败，按节点本地存储限流: {str(e)}")
+        return f"{node}/{storage}"
+
+    def _limit(self, key: Tuple[str, str]) -> int:
+        return self.node_limit if key[0] == 'node' else self.storage_limit
+
+    def _fits(self, ticket: AdmissionTicket) -> bool:
+        for key in ticket.keys:
+            limit = self._limit(key)
+            if limit > 0 and self._running.get(key, 0) >= limit:
+                return False
+        return True
+
+    def _grant(self, ticket: AdmissionTicket):
+        for key in ticket.keys:
+            self._running[key] = self._running.get(key, 0) + 1
+        ticket.granted_at = time.monotonic()
+        self._held[id(ticket)] = ticket
+        self._wait_samples.append(ticket.granted_at - ticket.enqueued_at)
+        self.admitted += 1
+        ticket.event.set()
+
+    def _release_locked(self, ticket: AdmissionTicket):
+        if ticket.released or ticket.granted_at is None:
+            return
+        ticket.released = True
+        self._held.pop(id(ticket), None)
+        for key in ticket.keys:
+            self._running[key] -= 1
+            if not self._running[key]:
+                del self._running[key]
+
+    def _reap_expired(self):
+        # 任务结束的通知丢失时（如跟踪器超时），超过占用时限的配额强制回收，避免节点被永久锁死
+        deadline = time.monotonic() - settings.admission_hold_timeout
+        for ticket in [t for t in self._held.values() if t.granted_at < deadline]:
+            logger.warning(f"节点 {ticket.node} 的操作配额占用超过 {settings.admission_hold_timeout:.0f} 秒，强制回收")
+            self._release_locked(ticket)
+            self.expired += 1
+
+    def _dispatch(self):
+        self._reap_expired()
+        progressed = True
+        while progressed and self._rotation:
+            progressed = False
+            for _ in range(len(self._rotation)):
+                caller = self._rotation[0]
+                self._rotation.rotate(-1)
+                queue = self._waiting[caller]
+                # 每个调用方内部按提交顺序，跳过目标节点或存储已满的请求
+                ticket = next((t for t in queue if self._fits(t)), None)
+                if ticket is None:
+                    continue
+                queue.remove(ticket)
+                if not queue:
+                    del self._waiting[caller]
+                    self._rotation.remove(caller)
+                self._grant(ticket)
+                progressed = True
+                break
+
+    def acquire(self, node: str, storage: Optional[str] = None, timeout: float = None) -> AdmissionTicket:
+        ticket = AdmissionTicket(node, self._storage_key(node, storage), request_client_cv.get())
+        timeout = settings.admission_wait_timeout if timeout is None else timeout
+        deadline = ticket.enqueued_at + timeout
+        with self._lock:
+            if ticket.caller not in self._waiting:
+                self._waiting[ticket.caller] = deque()
+                self._rotation.append(ticket.caller)
+            self._waiting[ticket.caller].append(ticket)
+            self._dispatch()
+
+        while not ticket.event.wait(min(max(deadline - time.monotonic(), 0), 1.0)):
+            with self._lock:
+                if ticket.granted_at is not None:
+                    break
+                self._dispatch()
+                if ticket.granted_at is not None:
+                    break
+                if time.monotonic() >= deadline:
+                    queue = self._waiting[ticket.caller]
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._waiting[ticket.caller]
+                        self._rotation.remove(ticket.caller)
+                    self.timeouts += 1
+                    raise AdmissionTimeout(f"等待节点 {node} 的操作配额超时（{timeout:.0f} 秒），当前排队 {self._queued_locked()} 个")
+        return ticket
+
+    def release(self, ticket: AdmissionTicket):
+        with self._lock:
+            self._release_locked(ticket)
+            self._dispatch()
+
+    def hold(self, ticket: AdmissionTicket, upid: Optional[str]):
+        # 配额一直占用到 Proxmox 任务结束，由任务跟踪器在任务完成时回调释放
+        if not upid:
+            self.release(ticket)
+            return
+        self.service.task_tracker.track(ticket.node, upid).add_done_callback(lambda _: self.release(ticket))
+
+    def _queued_locked(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            queued_by_key: Dict[str, int] = {}
+            oldest = 0.0
+            for queue in self._waiting.values():
+                for ticket in queue:
+                    for kind, name in ticket.keys:
+                        label = f"{kind}:{name}"
+                        queued_by_key[label] = queued_by_key.get(label, 0) + 1
+                    oldest = max(oldest, now - ticket.enqueued_at)
+            samples = sorted(self._wait_samples)
+            return {
+                'node_limit': self.node_limit,
+                'storage_limit': self.storage_limit,
+                'running': {f"{kind}:{name}": count for (kind, name), count in self._running.items()},
+                'queued': self._queued_locked(),
+                'queued_by_key': queued_by_key,
+                'queued_by_caller': {caller: len(queue) for caller, queue in self._waiting.items()},
+                'oldest_wait_seconds': round(oldest, 3),
+                'wait_seconds': {
+                    'mean': round(sum(samples) / len(samples), 3) if samples else 0.0,
+                    'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3) if samples else 0.0,
+                    'max': round(samples[-1], 3) if samples else 0.0
+                },
+                'admitted': self.admitted,
+                'timeouts': self.timeouts,
+                'expired': self.expired
+            }
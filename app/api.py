@@ -1,9 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Query, Path, Body
+import asyncio
+import datetime
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query, Path, Body, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
-from .database import get_db
-from .auth import verify_api_key, log_operation
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from .database import get_db, get_async_db, SessionLocal
+from .auth import verify_api_key, log_operation_async, log_operations_async
 from .proxmox import proxmox_service
+from .concurrency import run_blocking, iterate_blocking
+from .config import settings
+from .inventory import inventory_poller, container_matches, decode_cursor, ContainerIndex
+from .task_stream import task_stream_hub
+from .tasks import parse_upid
+from .jobs import job_manager
+from .provisioning import provisioner
+from .placement import node_placer
+from .audit import audit_writer
+from .operation_logs import decode_log_cursor, log_to_dict, query_operation_logs
+from .log_retention import log_retention
 from . import schemas, models # Added models
 from . import nat_service # Added nat_service
 from .logging_context import request_task_id_cv
@@ -11,20 +27,97 @@ from .logging_context import request_task_id_cv
 
 router = APIRouter()
 
+
+def _wants_fresh_data(request: Request) -> bool:
+    cache_control = request.headers.get("cache-control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control or "max-age=0" in cache_control
+
+
+MAX_STALENESS_QUERY = Query(None, ge=0, description="可接受的集群快照最大陈旧秒数（需启用后台快照刷新），0 表示实时查询；默认使用服务配置")
+
+
+def _inventory_snapshot(request: Request, response: Response, max_staleness: Optional[float]):
+    if _wants_fresh_data(request):
+        return None
+    snapshot = inventory_poller.get_snapshot(max_staleness)
+    if snapshot is not None:
+        response.headers["X-Inventory-Age"] = f"{snapshot.age:.3f}"
+    return snapshot
+
+
+BACKGROUND_QUERY = Query(False, description="为 true 时作为持久化的后台作业执行，立即返回 202 和作业 ID，可通过 `/jobs/{job_id}` 查询进度")
+
+
+async def _job_submitted(db: Session, request: Request, response: Response, operation: str, result: Dict[str, Any]) -> schemas.OperationResponse:
+    job = result['job']
+    await log_operation_async(
+        db, operation,
+        job.vmid, job.node, "成功" if result['success'] else "失败",
+        result['message'], request.client.host,
+        task_id=job.id
+    )
+    if not result['success']:
+        raise HTTPException(status_code=409, detail=result['message'])
+    response.status_code = 202
+    return schemas.OperationResponse(
+        success=True,
+        message=result['message'],
+        data=job.to_dict()
+    )
+
+
+def _raise_if_busy(result: Dict[str, Any]):
+    # 未能在 ADMISSION_SYNC_WAIT_TIMEOUT 内取得节点或存储的操作配额
+    if result.get('busy'):
+        raise HTTPException(
+            status_code=429,
+            detail=f"{result['message']}。请稍后重试，或使用 background=true 提交后台作业排队执行",
+            headers={"Retry-After": f"{settings.admission_sync_wait_timeout:.0f}"}
+        )
+
+
+@router.get("/metrics", response_model=schemas.OperationResponse, summary="获取服务运行指标",
+            description="获取缓存命中率等服务内部运行指标。",
+            tags=["服务状态"])
+async def get_service_metrics(
+    _: bool = Depends(verify_api_key)
+):
+    return schemas.OperationResponse(
+        success=True,
+        message="服务指标获取成功",
+        data={
+            **proxmox_service.get_metrics(),
+            'inventory': inventory_poller.get_metrics(),
+            'task_streams': task_stream_hub.get_metrics(),
+            'jobs': await run_blocking(job_manager.get_metrics),
+            'provisioning': provisioner.get_metrics(),
+            'placement': node_placer.get_metrics(),
+            'audit': audit_writer.get_metrics(),
+            'log_retention': log_retention.get_metrics()
+        }
+    )
+
+
 @router.get("/nodes", response_model=schemas.NodeListResponse, summary="获取节点列表",
-            description="获取Proxmox VE集群中所有在线节点的基本信息。",
+            description="获取Proxmox VE集群中所有在线节点的基本信息。结果会被短暂缓存，请求头 `Cache-Control: no-cache` 可强制刷新。",
             tags=["节点管理"])
 async def get_nodes(
     request: Request,
+    response: Response,
+    max_staleness: Optional[float] = MAX_STALENESS_QUERY,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
     request_id = request_task_id_cv.get()
     try:
-        nodes_data = proxmox_service.get_nodes()
+        snapshot = _inventory_snapshot(request, response, max_staleness)
+        if snapshot is not None:
+            nodes_data = snapshot.nodes
+        else:
+            nodes_data = await run_blocking(proxmox_service.get_nodes, not _wants_fresh_data(request))
         nodes_info = [schemas.NodeInfo(**node) for node in nodes_data]
 
-        log_operation(
+        await log_operation_async(
             db, "获取节点列表",
             "集群", "所有节点", "成功",
             f"获取到 {len(nodes_info)} 个节点",
@@ -39,7 +132,7 @@ async def get_nodes(
         )
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取节点列表",
             "集群", "所有节点", "失败",
             str(e), request.client.host,
@@ -49,7 +142,7 @@ async def get_nodes(
 
 
 @router.get("/nodes/{node}/templates", response_model=schemas.NodeResourceResponse, summary="获取节点CT模板",
-            description="获取指定Proxmox节点上可用的LXC容器模板列表。",
+            description="获取指定Proxmox节点上可用的LXC容器模板列表。结果会被缓存，请求头 `Cache-Control: no-cache` 可强制刷新。",
             tags=["节点管理"])
 async def get_node_templates(
     node: str,
@@ -59,8 +152,8 @@ async def get_node_templates(
 ):
     request_id = request_task_id_cv.get()
     try:
-        templates_data = proxmox_service.get_templates(node)
-        log_operation(
+        templates_data = await run_blocking(proxmox_service.get_templates, node, not _wants_fresh_data(request))
+        await log_operation_async(
             db, "获取节点模板",
             node, node, "成功",
             f"获取到 {len(templates_data)} 个模板",
@@ -73,7 +166,7 @@ async def get_node_templates(
             data=templates_data
         )
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取节点模板",
             node, node, "失败",
             str(e), request.client.host,
@@ -83,7 +176,7 @@ async def get_node_templates(
 
 
 @router.get("/nodes/{node}/storages", response_model=schemas.NodeResourceResponse, summary="获取节点存储",
-            description="获取指定Proxmox节点上的存储资源列表及其信息。",
+            description="获取指定Proxmox节点上的存储资源列表及其信息。结果会被缓存，请求头 `Cache-Control: no-cache` 可强制刷新。",
             tags=["节点管理"])
 async def get_node_storages(
     node: str,
@@ -93,8 +186,8 @@ async def get_node_storages(
 ):
     request_id = request_task_id_cv.get()
     try:
-        storages_data = proxmox_service.get_storages(node)
-        log_operation(
+        storages_data = await run_blocking(proxmox_service.get_storages, node, not _wants_fresh_data(request))
+        await log_operation_async(
             db, "获取节点存储",
             node, node, "成功",
             f"获取到 {len(storages_data)} 个存储",
@@ -107,7 +200,7 @@ async def get_node_storages(
             data=storages_data
         )
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取节点存储",
             node, node, "失败",
             str(e), request.client.host,
@@ -117,7 +210,7 @@ async def get_node_storages(
 
 
 @router.get("/nodes/{node}/networks", response_model=schemas.NodeResourceResponse, summary="获取节点网络",
-            description="获取指定Proxmox节点上的网络（桥接）接口列表。",
+            description="获取指定Proxmox节点上的网络（桥接）接口列表。结果会被缓存，请求头 `Cache-Control: no-cache` 可强制刷新。",
             tags=["节点管理"])
 async def get_node_networks(
     node: str,
@@ -127,8 +220,8 @@ async def get_node_networks(
 ):
     request_id = request_task_id_cv.get()
     try:
-        networks_data = proxmox_service.get_networks(node)
-        log_operation(
+        networks_data = await run_blocking(proxmox_service.get_networks, node, not _wants_fresh_data(request))
+        await log_operation_async(
             db, "获取节点网络",
             node, node, "成功",
             f"获取到 {len(networks_data)} 个网络接口",
@@ -141,7 +234,7 @@ async def get_node_networks(
             data=networks_data
         )
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取节点网络",
             node, node, "失败",
             str(e), request.client.host,
@@ -149,45 +242,153 @@ async def get_node_networks(
         )
         raise HTTPException(status_code=500, detail=f"获取节点网络失败: {str(e)}")
 
+def _container_status(container: Dict[str, Any]) -> schemas.ContainerStatus:
+    return schemas.ContainerStatus(
+        vmid=str(container['vmid']),
+        name=container.get('name', f"CT-{container['vmid']}"),
+        status=container.get('status', 'unknown'),
+        uptime=container.get('uptime', 0),
+        cpu=container.get('cpu', 0),
+        mem=container.get('mem', 0),
+        maxmem=container.get('maxmem', 0),
+        node=container['node']
+    )
+
+
+def _ndjson_line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode()
+
+
+def _snapshot_batches(snapshot, node: Optional[str]):
+    by_node: Dict[str, List[Dict[str, Any]]] = {}
+    for container in snapshot.get_containers(node):
+        by_node.setdefault(container['node'], []).append(container)
+    for node_name in sorted(by_node):
+        yield node_name, by_node[node_name], None
+
+
+async def _stream_containers(request: Request, node: Optional[str], mode: Optional[str], snapshot,
+                             filters: Dict[str, Any]) -> StreamingResponse:
+    # 每行一个 JSON 对象：type=container 为单个容器，type=error 为失败的节点，最后一行 type=end 给出总数与错误汇总；
+    # 按节点查询时每个节点的结果一到就写出，内存中只保留当前节点的容器
+    request_id = request_task_id_cv.get()
+    batches = iterate_blocking(
+        _snapshot_batches(snapshot, node) if snapshot is not None else proxmox_service.iter_containers(node, mode)
+    )
+    # 先取到第一个节点的结果再开始响应，节点列表获取失败等错误仍以 500 返回
+    first = await anext(batches, None)
+    if node and first is not None and first[2] is not None:
+        raise Exception(f"获取容器列表失败: {node}: {first[2]}")
+
+    async def lines():
+        total, errors = 0, {}
+        batch = first
+        try:
+            while batch is not None:
+                node_name, node_containers, error = batch
+                if error is not None:
+                    errors[node_name] = error
+                    yield _ndjson_line({'type': 'error', 'node': node_name, 'message': error})
+                else:
+                    matched = [c for c in node_containers if container_matches(c, **filters)]
+                    chunk = b"".join(
+                        _ndjson_line({'type': 'container', **_container_status(c).model_dump()}) for c in matched
+                    )
+                    total += len(matched)
+                    if chunk:
+                        yield chunk
+                batch = await anext(batches, None)
+            yield _ndjson_line({'type': 'end', 'total': total, 'errors': errors or None})
+        finally:
+            await batches.aclose()
+            db = SessionLocal()
+            try:
+                await log_operation_async(
+                    db, "获取容器列表",
+                    node or "所有节点", node or "所有节点", "部分成功" if errors else "成功",
+                    f"流式返回 {total} 个容器" + (f"，{len(errors)} 个节点失败" if errors else ""),
+                    request.client.host,
+                    task_id=request_id
+                )
+            finally:
+                db.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/containers", response_model=schemas.ContainerList, summary="获取容器列表",
-            description="获取Proxmox VE节点上的LXC容器列表。可指定节点或获取所有在线节点的容器。",
+            description="获取Proxmox VE节点上的LXC容器列表。可指定节点或获取所有在线节点的容器。"
+                        "支持按状态、名称、模板标志过滤，按 cpu/mem/uptime 等排序，并用 `limit` + `cursor` 游标分页"
+                        "（`total` 为匹配总数，`next_cursor` 为下一页游标）；启用后台快照时直接在快照索引上查询。"
+                        "`format=ndjson`（或 `Accept: application/x-ndjson`）时以 NDJSON 流式返回，每个节点的结果到达后立即写出。",
             tags=["容器管理"])
 async def get_containers(
     request: Request,
+    response: Response,
     node: str = None,
+    mode: Optional[str] = Query(None, pattern="^(cluster|nodes)$", description="获取方式: cluster 单次集群查询，nodes 按节点查询；默认使用服务配置"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$", description="返回格式: json 一次性返回（默认），ndjson 按节点流式返回"),
+    status: Optional[str] = Query(None, description="按状态过滤，如 running、stopped"),
+    name: Optional[str] = Query(None, description="按名称包含的子串过滤（不区分大小写）"),
+    name_prefix: Optional[str] = Query(None, description="按名称前缀过滤（不区分大小写）"),
+    template: Optional[bool] = Query(None, description="true 只返回模板，false 排除模板"),
+    sort: Optional[str] = Query(None, pattern="^-?(vmid|name|cpu|mem|uptime)$", description="排序字段，前缀 - 表示降序，如 -cpu；默认按 vmid"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="每页数量，不指定时返回全部匹配项"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    max_staleness: Optional[float] = MAX_STALENESS_QUERY,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
     request_id = request_task_id_cv.get()
+    filters = {'status': status, 'template': template, 'name': name, 'name_prefix': name_prefix}
+    paginated = sort is not None or limit is not None or cursor is not None
+    streaming = format == "ndjson" or (format is None and "application/x-ndjson" in request.headers.get("accept", ""))
+    if streaming and paginated:
+        raise HTTPException(status_code=400, detail="NDJSON 流式返回不支持排序与分页，仅支持过滤条件")
+    sort_field, descending = (sort or 'vmid').lstrip('-'), bool(sort and sort.startswith('-'))
+    if cursor is not None:
+        try:
+            decode_cursor(cursor, sort_field)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
-        containers_data = proxmox_service.get_containers(node)
-        containers = []
-
-        for container in containers_data:
-            status_info = schemas.ContainerStatus(
-                vmid=str(container['vmid']),
-                name=container.get('name', f"CT-{container['vmid']}"),
-                status=container.get('status', 'unknown'),
-                uptime=container.get('uptime', 0),
-                cpu=container.get('cpu', 0),
-                mem=container.get('mem', 0),
-                maxmem=container.get('maxmem', 0),
-                node=container['node']
+        snapshot = _inventory_snapshot(request, response, max_staleness)
+        if snapshot is not None and node and node not in snapshot.node_names:
+            snapshot = None
+        if streaming:
+            streaming_response = await _stream_containers(request, node, mode, snapshot, filters)
+            streaming_response.headers.update({k: v for k, v in response.headers.items() if k.lower().startswith("x-")})
+            return streaming_response
+
+        next_cursor = None
+        if snapshot is not None:
+            index, node_errors = snapshot.index, {}
+        else:
+            containers_data, node_errors = await run_blocking(proxmox_service.get_containers_with_errors, node, mode)
+            index = ContainerIndex(containers_data)
+        if paginated or any(value is not None for value in filters.values()):
+            containers_data, total, next_cursor = index.query(
+                node=node, sort=sort_field, descending=descending, cursor=cursor, limit=limit, **filters
             )
-            containers.append(status_info)
+        else:
+            containers_data = snapshot.get_containers(node) if snapshot is not None else index.containers
+            total = len(containers_data)
+        containers = [_container_status(container) for container in containers_data]
 
-        log_operation(
+        await log_operation_async(
             db, "获取容器列表",
-            node or "所有节点", node or "所有节点", "成功",
-            f"获取到 {len(containers)} 个容器",
+            node or "所有节点", node or "所有节点", "部分成功" if node_errors else "成功",
+            f"获取到 {len(containers)} 个容器" + (f"（匹配 {total} 个）" if total != len(containers) else "")
+            + (f"，{len(node_errors)} 个节点失败" if node_errors else ""),
             request.client.host,
             task_id=request_id
         )
 
-        return schemas.ContainerList(containers=containers, total=len(containers))
+        return schemas.ContainerList(containers=containers, total=total, errors=node_errors or None,
+                                     next_cursor=next_cursor)
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取容器列表",
             node or "所有节点", node or "所有节点", "失败",
             str(e), request.client.host,
@@ -196,22 +397,36 @@ async def get_containers(
         raise HTTPException(status_code=500, detail=f"获取容器列表失败: {str(e)}")
 
 @router.post("/containers", response_model=schemas.OperationResponse, summary="创建LXC容器",
-             description="在指定的Proxmox节点上创建一个新的LXC容器。",
+             description="在指定的Proxmox节点上创建一个新的LXC容器。`background=true` 时作为后台作业执行并等待创建任务完成。"
+                         "同步请求在节点或存储的操作配额已满且短时间内未释放时返回 429。",
              tags=["容器管理"])
 async def create_container(
     container_data: schemas.ContainerCreate,
     request: Request,
+    response: Response,
+    background: bool = BACKGROUND_QUERY,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
+    if background:
+        return await _job_submitted(db, request, response, "提交创建作业",
+                                    await run_blocking(job_manager.submit_create, container_data, request.client.host))
     request_id = request_task_id_cv.get()
     pve_task_id = None
     try:
-        result = proxmox_service.create_container(container_data)
+        container_data.node = await run_blocking(
+            node_placer.assign, container_data.node, container_data.storage,
+            container_data.memory, container_data.disk_size
+        )
+        # 同步请求只短暂等待节点与存储的操作配额，避免在共享线程池中长时间占用线程
+        result = await run_blocking(proxmox_service.create_container, container_data,
+                                    admission_timeout=settings.admission_sync_wait_timeout)
         pve_task_id = result.get('task_id')
+        # 待创建数保持到创建任务结束，供后续的自动选点参考
+        node_placer.release_when_done(container_data.node, pve_task_id)
         effective_task_id = pve_task_id or request_id
 
-        log_operation(
+        await log_operation_async(
             db, "创建容器",
             str(container_data.vmid), container_data.node,
             "成功" if result['success'] else "失败",
@@ -220,6 +435,7 @@ async def create_container(
         )
 
         if not result['success']:
+            _raise_if_busy(result)
             raise HTTPException(status_code=400, detail=result['message'])
 
         return schemas.OperationResponse(
@@ -228,8 +444,10 @@ async def create_container(
             data={'task_id': effective_task_id} if result['success'] else None
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "创建容器",
             str(container_data.vmid), container_data.node, "失败",
             str(e), request.client.host,
@@ -244,14 +462,21 @@ async def get_container_status(
     node: str,
     vmid: str,
     request: Request,
+    response: Response,
+    max_staleness: Optional[float] = MAX_STALENESS_QUERY,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
     request_id = request_task_id_cv.get()
     try:
-        status_data = proxmox_service.get_container_status(node, vmid)
-
-        log_operation(
+        snapshot = _inventory_snapshot(request, response, max_staleness)
+        cached_container = snapshot.get_container(node, vmid) if snapshot is not None else None
+        if cached_container is not None:
+            status_data = dict(cached_container, vmid=vmid, name=cached_container.get('name') or f'CT-{vmid}')
+        else:
+            status_data = await run_blocking(proxmox_service.get_container_status, node, vmid)
+
+        await log_operation_async(
             db, "获取容器状态",
             vmid, node, "成功",
             f"容器状态: {status_data['status']}",
@@ -262,7 +487,7 @@ async def get_container_status(
         return schemas.ContainerStatus(**status_data)
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取容器状态",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -270,6 +495,70 @@ async def get_container_status(
         )
         raise HTTPException(status_code=500, detail=f"获取容器状态失败: {str(e)}")
 
+POWER_ACTION_NAMES = {
+    schemas.PowerAction.START: "启动容器",
+    schemas.PowerAction.STOP: "强制停止容器",
+    schemas.PowerAction.SHUTDOWN: "关闭容器",
+    schemas.PowerAction.REBOOT: "重启容器"
+}
+
+@router.post("/containers/bulk/power", response_model=schemas.BulkPowerResponse, summary="批量电源操作",
+             description="对多个容器并发执行启动、停止、关机或重启，每个节点同时执行的操作数受 `BULK_NODE_CONCURRENCY` 限制。"
+                         "返回每个条目的结果及 Proxmox 任务 ID，操作日志在一次事务中批量写入。",
+             tags=["容器操作"])
+async def bulk_power_action(
+    bulk: schemas.BulkPowerRequest,
+    request: Request,
+    _: bool = Depends(verify_api_key),
+    db: Session = Depends(get_db)
+):
+    request_id = request_task_id_cv.get()
+    if len(bulk.items) > settings.bulk_max_items:
+        raise HTTPException(status_code=400, detail=f"单次最多提交 {settings.bulk_max_items} 个条目")
+    seen = set()
+    for item in bulk.items:
+        if (item.node, item.vmid) in seen:
+            raise HTTPException(status_code=400, detail=f"容器 {item.vmid} (节点 {item.node}) 重复出现")
+        seen.add((item.node, item.vmid))
+
+    node_limits: Dict[str, asyncio.Semaphore] = {}
+
+    async def run_item(item: schemas.BulkPowerItem) -> schemas.BulkPowerResult:
+        limit = node_limits.setdefault(item.node, asyncio.Semaphore(settings.bulk_node_concurrency))
+        async with limit:
+            try:
+                result = await run_blocking(proxmox_service.run_power_action, item.node, item.vmid, item.action.value)
+            except Exception as e:
+                result = {'success': False, 'message': str(e)}
+        return schemas.BulkPowerResult(
+            node=item.node, vmid=item.vmid, action=item.action,
+            success=result['success'], message=result['message'], task_id=result.get('task_id')
+        )
+
+    results = await asyncio.gather(*(run_item(item) for item in bulk.items))
+    succeeded = sum(1 for r in results if r.success)
+
+    await log_operations_async(db, [
+        {
+            'operation': POWER_ACTION_NAMES[r.action],
+            'container_id': r.vmid,
+            'node_name': r.node,
+            'status': "成功" if r.success else "失败",
+            'message': r.message,
+            'ip_address': request.client.host,
+            'task_id': r.task_id or request_id
+        }
+        for r in results
+    ])
+
+    return schemas.BulkPowerResponse(
+        success=succeeded == len(results),
+        message=f"批量操作完成: 成功 {succeeded} 个, 失败 {len(results) - succeeded} 个",
+        data=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded
+    )
+
 @router.post("/containers/{node}/{vmid}/start", response_model=schemas.OperationResponse, summary="启动容器",
              description="启动指定的LXC容器。",
              tags=["容器操作"])
@@ -283,11 +572,11 @@ async def start_container(
     request_id = request_task_id_cv.get()
     pve_task_id = None
     try:
-        result = proxmox_service.start_container(node, vmid)
+        result = await run_blocking(proxmox_service.start_container, node, vmid)
         pve_task_id = result.get('task_id')
         effective_task_id = pve_task_id or request_id
 
-        log_operation(
+        await log_operation_async(
             db, "启动容器",
             vmid, node, "成功" if result['success'] else "失败",
             result['message'], request.client.host,
@@ -301,7 +590,7 @@ async def start_container(
         )
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "启动容器",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -322,11 +611,11 @@ async def stop_container(
     request_id = request_task_id_cv.get()
     pve_task_id = None
     try:
-        result = proxmox_service.stop_container(node, vmid)
+        result = await run_blocking(proxmox_service.stop_container, node, vmid)
         pve_task_id = result.get('task_id')
         effective_task_id = pve_task_id or request_id
 
-        log_operation(
+        await log_operation_async(
             db, "强制停止容器",
             vmid, node, "成功" if result['success'] else "失败",
             result['message'], request.client.host,
@@ -340,7 +629,7 @@ async def stop_container(
         )
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "强制停止容器",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -361,11 +650,11 @@ async def shutdown_container(
     request_id = request_task_id_cv.get()
     pve_task_id = None
     try:
-        result = proxmox_service.shutdown_container(node, vmid)
+        result = await run_blocking(proxmox_service.shutdown_container, node, vmid)
         pve_task_id = result.get('task_id')
         effective_task_id = pve_task_id or request_id
 
-        log_operation(
+        await log_operation_async(
             db, "关闭容器",
             vmid, node, "成功" if result['success'] else "失败",
             result['message'], request.client.host,
@@ -379,7 +668,7 @@ async def shutdown_container(
         )
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "关闭容器",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -400,11 +689,11 @@ async def reboot_container(
     request_id = request_task_id_cv.get()
     pve_task_id = None
     try:
-        result = proxmox_service.reboot_container(node, vmid)
+        result = await run_blocking(proxmox_service.reboot_container, node, vmid)
         pve_task_id = result.get('task_id')
         effective_task_id = pve_task_id or request_id
 
-        log_operation(
+        await log_operation_async(
             db, "重启容器",
             vmid, node, "成功" if result['success'] else "失败",
             result['message'], request.client.host,
@@ -418,7 +707,7 @@ async def reboot_container(
         )
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "重启容器",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -427,23 +716,30 @@ async def reboot_container(
         raise HTTPException(status_code=500, detail=f"重启容器失败: {str(e)}")
 
 @router.delete("/containers/{node}/{vmid}", response_model=schemas.OperationResponse, summary="删除容器",
-               description="删除指定的LXC容器。**危险操作，请谨慎使用！**",
+               description="删除指定的LXC容器。**危险操作，请谨慎使用！** `background=true` 时作为后台作业执行并等待删除任务完成。"
+                           "同步请求在节点或存储的操作配额已满且短时间内未释放时返回 429。",
                tags=["容器操作"])
 async def delete_container(
     node: str,
     vmid: str,
     request: Request,
+    response: Response,
+    background: bool = BACKGROUND_QUERY,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
+    if background:
+        return await _job_submitted(db, request, response, "提交删除作业",
+                                    await run_blocking(job_manager.submit_delete, node, vmid, request.client.host))
     request_id = request_task_id_cv.get()
     pve_task_id = None
     try:
-        result = proxmox_service.delete_container(node, vmid)
+        result = await run_blocking(proxmox_service.delete_container, node, vmid,
+                                    admission_timeout=settings.admission_sync_wait_timeout)
         pve_task_id = result.get('task_id')
         effective_task_id = pve_task_id or request_id
 
-        log_operation(
+        await log_operation_async(
             db, "删除容器",
             vmid, node, "成功" if result['success'] else "失败",
             result['message'], request.client.host,
@@ -451,6 +747,7 @@ async def delete_container(
         )
 
         if not result['success']:
+             _raise_if_busy(result)
              raise HTTPException(status_code=400, detail=result['message'])
 
         return schemas.OperationResponse(
@@ -459,8 +756,10 @@ async def delete_container(
             data={'task_id': effective_task_id} if result['success'] else None
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "删除容器",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -468,61 +767,207 @@ async def delete_container(
         )
         raise HTTPException(status_code=500, detail=f"删除容器失败: {str(e)}")
 
-@router.post("/containers/{node}/{vmid}/rebuild", response_model=schemas.OperationResponse, summary="重建容器",
-             description="销毁并使用新的配置重新创建指定的LXC容器。**危险操作，数据会丢失！**",
+@router.post("/containers/batch", response_model=schemas.OperationResponse, status_code=202, summary="批量创建容器",
+             description="按模板批量创建容器：自动分配 VMID、在节点间分散放置，并按节点和存储限制并发创建。"
+                         "接口立即返回作业 ID，可通过 `/jobs/{job_id}` 查询逐项及汇总进度。",
+             tags=["容器操作"])
+async def batch_create_containers(
+    batch: schemas.ContainerBatchCreate,
+    request: Request,
+    response: Response,
+    _: bool = Depends(verify_api_key),
+    db: Session = Depends(get_db)
+):
+    try:
+        result = await run_blocking(provisioner.submit, batch, request.client.host)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"批量创建参数无效: {str(e)}")
+    return await _job_submitted(db, request, response, "提交批量创建作业", result)
+      
+@router.post("/containers/{node}/{vmid}/rebuild", response_model=schemas.OperationResponse, status_code=202, summary="重建容器",
+             description="销毁并使用新的配置重新创建指定的LXC容器。**危险操作，数据会丢失！** "
+                         "重建在后台作业中按 停止、删除、创建、启动 阶段执行，接口立即返回作业 ID，可通过 `/jobs/{job_id}` 查询进度。",
              tags=["容器操作"])
 async def rebuild_container_api(
     node: str,
     vmid: str,
     rebuild_data: schemas.ContainerRebuild,
     request: Request,
+    response: Response,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
-    request_id = request_task_id_cv.get()
-    pve_task_id = None
-    try:
-        result = proxmox_service.rebuild_container(node, vmid, rebuild_data)
-        pve_task_id = result.get('task_id')
-        effective_task_id = pve_task_id or request_id
-
-        log_operation(
-            db, "重建容器",
-            vmid, node, "成功" if result['success'] else "失败",
-            result['message'], request.client.host,
-            task_id=effective_task_id
-        )
-
-        if not result['success']:
-             raise HTTPException(status_code=400, detail=result['message'])
-
-        return schemas.OperationResponse(
-            success=result['success'],
-            message=result['message'],
-            data={'task_id': effective_task_id} if result['success'] else None
-        )
+    return await _job_submitted(db, request, response, "提交重建作业",
+                                await run_blocking(job_manager.submit_rebuild, node, vmid, rebuild_data, request.client.host))
 
+@router.get("/jobs", response_model=schemas.JobListResponse, summary="查询作业列表",
+            description="按状态、类型、节点或容器查询持久化的后台作业，按创建时间倒序分页返回。",
+            tags=["任务管理"])
+async def list_jobs(
+    status: Optional[str] = Query(None, description="作业状态: queued、running、succeeded、failed、cancelled"),
+    type: Optional[str] = Query(None, description="作业类型: rebuild、provision、create、delete、nat_resync"),
+    node: Optional[str] = Query(None, description="节点名称"),
+    vmid: Optional[str] = Query(None, description="容器 ID"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    _: bool = Depends(verify_api_key)
+):
+    jobs, total = await run_blocking(job_manager.list_jobs, status, type, node, vmid, skip, limit)
+    return schemas.JobListResponse(
+        success=True,
+        message="作业列表获取成功",
+        data=[job.to_dict() for job in jobs],
+        total=total
+    )
+
+@router.get("/jobs/{job_id}", response_model=schemas.OperationResponse, summary="获取作业进度",
+            description="获取后台作业的状态、当前阶段及各阶段进度。",
+            tags=["任务管理"])
+async def get_job(
+    job_id: str,
+    _: bool = Depends(verify_api_key)
+):
+    job = await run_blocking(job_manager.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"作业 {job_id} 不存在")
+    return schemas.OperationResponse(
+        success=True,
+        message="作业状态获取成功",
+        data=job.to_dict()
+    )
+
+@router.post("/jobs/{job_id}/cancel", response_model=schemas.OperationResponse, summary="取消作业",
+             description="取消排队中或执行中的后台作业。执行中的作业会中止当前的 Proxmox 任务，并在当前阶段结束。",
+             tags=["任务管理"])
+async def cancel_job(
+    job_id: str,
+    request: Request,
+    _: bool = Depends(verify_api_key),
+    db: Session = Depends(get_db)
+):
+    result = await run_blocking(job_manager.cancel, job_id)
+    job = result.get('job')
+    if job is None:
+        raise HTTPException(status_code=404, detail=result['message'])
+
+    await log_operation_async(
+        db, "取消作业",
+        job.vmid, job.node, "成功" if result['success'] else "失败",
+        result['message'], request.client.host,
+        task_id=job.id
+    )
+
+    if not result['success']:
+        raise HTTPException(status_code=409, detail=result['message'])
+
+    return schemas.OperationResponse(
+        success=True,
+        message=result['message'],
+        data=job.to_dict()
+    )
+
+@router.get("/logs", response_model=schemas.OperationLogListResponse, summary="查询操作日志",
+            description="按容器、节点、操作类型、状态、任务 ID 与时间范围查询操作日志，按时间倒序返回。"
+                        "使用 `next_cursor` 作为下一次请求的 `cursor` 翻页（基于 (created_at, id) 的键集分页，翻到任意深度耗时不变）。",
+            tags=["操作日志"])
+async def list_operation_logs(
+    container_id: Optional[str] = Query(None, description="容器标识，如 100 或 pve/100"),
+    node_name: Optional[str] = Query(None, description="节点名称"),
+    operation: Optional[str] = Query(None, description="操作类型，如 创建容器"),
+    status: Optional[str] = Query(None, description="操作结果，如 成功、失败、异常"),
+    task_id: Optional[str] = Query(None, description="请求 ID 或 Proxmox 任务 UPID"),
+    since: Optional[datetime.datetime] = Query(None, description="起始时间（含），未带时区时按 UTC"),
+    until: Optional[datetime.datetime] = Query(None, description="结束时间（不含），未带时区时按 UTC"),
+    limit: int = Query(100, ge=1, le=1000, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    _: bool = Depends(verify_api_key),
+    db: Session = Depends(get_db)
+):
+    if cursor is not None:
+        try:
+            decode_log_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    filters = {'container_id': container_id, 'node_name': node_name, 'operation': operation,
+               'status': status, 'task_id': task_id}
+    try:
+        logs, next_cursor = await run_blocking(query_operation_logs, db, filters, since, until, cursor, limit)
     except Exception as e:
-        log_operation(
-            db, "重建容器",
-            vmid, node, "失败",
-            str(e), request.client.host,
-            task_id=pve_task_id or request_id
-        )
-        raise HTTPException(status_code=500, detail=f"重建容器失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"查询操作日志失败: {str(e)}")
+    return schemas.OperationLogListResponse(
+        success=True,
+        message="操作日志获取成功",
+        data=[log_to_dict(log) for log in logs],
+        next_cursor=next_cursor
+    )
+
+@router.get("/logs/archive", response_model=schemas.OperationLogListResponse, summary="查询已归档的操作日志",
+            description="查询超过保留期限、已移入压缩归档文件的操作日志，过滤条件与分页方式同 `/logs`；"
+                        "只读取时间范围内的日期分区，建议指定 `since`/`until`。",
+            tags=["操作日志"])
+async def list_archived_operation_logs(
+    container_id: Optional[str] = Query(None, description="容器标识，如 100 或 pve/100"),
+    node_name: Optional[str] = Query(None, description="节点名称"),
+    operation: Optional[str] = Query(None, description="操作类型，如 创建容器"),
+    status: Optional[str] = Query(None, description="操作结果，如 成功、失败、异常"),
+    task_id: Optional[str] = Query(None, description="请求 ID 或 Proxmox 任务 UPID"),
+    since: Optional[datetime.datetime] = Query(None, description="起始时间（含），未带时区时按 UTC"),
+    until: Optional[datetime.datetime] = Query(None, description="结束时间（不含），未带时区时按 UTC"),
+    limit: int = Query(100, ge=1, le=1000, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    _: bool = Depends(verify_api_key)
+):
+    if cursor is not None:
+        try:
+            decode_log_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    filters = {'container_id': container_id, 'node_name': node_name, 'operation': operation,
+               'status': status, 'task_id': task_id}
+    try:
+        logs, next_cursor = await run_blocking(log_retention.read_archive, filters, since, until, cursor, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"读取归档日志失败: {str(e)}")
+    return schemas.OperationLogListResponse(
+        success=True,
+        message="归档日志获取成功",
+        data=logs,
+        next_cursor=next_cursor
+    )
+
+def _check_task_id(node: str, task_id: str):
+    # 格式错误或不属于该节点的 UPID 永远查不到，不能交给任务跟踪器
+    info = parse_upid(task_id)
+    if not info:
+        raise HTTPException(status_code=400, detail=f"无效的任务ID: {task_id}")
+    if info['node'] != node:
+        raise HTTPException(status_code=400, detail=f"任务 {task_id} 属于节点 {info['node']}，与请求的节点 {node} 不符")
+
 
 @router.get("/tasks/{node}/{task_id}", response_model=schemas.OperationResponse, summary="获取任务状态",
-            description="获取Proxmox中特定异步任务的状态。",
+            description="获取Proxmox中特定异步任务的状态。指定 `wait` 时由共享任务跟踪器等待任务结束后再返回。",
             tags=["任务管理"])
 async def get_task_status(
     node: str,
     task_id: str, 
     request: Request,
+    wait: Optional[float] = Query(None, gt=0, le=300, description="等待任务结束的最长秒数，超时后返回当前状态"),
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db) 
 ):
+    _check_task_id(node, task_id)
     try:
-        task_status = proxmox_service.get_task_status(node, task_id)
+        task_status = None
+        if wait:
+            try:
+                task_status = await proxmox_service.task_tracker.wait(node, task_id, timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                # 跟踪失败（任务不存在或查询持续出错）时直接查询一次，由查询结果说明任务当前状态
+                pass
+        if task_status is None:
+            task_status = await run_blocking(proxmox_service.get_task_status, node, task_id)
         return schemas.OperationResponse(
             success=True,
             message="任务状态获取成功",
@@ -532,6 +977,39 @@ async def get_task_status(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取任务状态失败: {str(e)}")
 
+def _format_sse(event: Optional[Dict[str, Any]]) -> str:
+    if event is None:
+        return ": keep-alive\n\n"
+    data = json.dumps(event['data'], ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+@router.get("/tasks/{node}/{task_id}/stream", summary="订阅任务状态与日志",
+            description="以 Server-Sent Events 推送任务状态变化（`status`）、增量任务日志（`log`），任务结束时发送 `done` 后关闭连接。"
+                        "同一任务的多个订阅方共享一个上游轮询；断线重连可携带 `Last-Event-ID` 从断点继续。",
+            tags=["任务管理"])
+async def stream_task(
+    node: str,
+    task_id: str,
+    _: bool = Depends(verify_api_key),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    _check_task_id(node, task_id)
+
+    async def event_source():
+        events = task_stream_hub.subscribe(node, task_id, last_event_id)
+        try:
+            async for event in events:
+                yield _format_sse(event)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/containers/{node}/{vmid}/console", response_model=schemas.ConsoleResponse, summary="获取容器控制台票据",
              description="获取用于连接到LXC容器控制台的票据和连接信息。",
              tags=["容器操作"])
@@ -544,9 +1022,9 @@ async def get_container_console(
 ):
     request_id = request_task_id_cv.get()
     try:
-        result = proxmox_service.get_container_console(node, vmid)
+        result = await run_blocking(proxmox_service.get_container_console, node, vmid)
 
-        log_operation(
+        await log_operation_async(
             db, "获取控制台",
             vmid, node, "成功" if result['success'] else "失败",
             result['message'], request.client.host,
@@ -563,7 +1041,7 @@ async def get_container_console(
         )
 
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取控制台",
             vmid, node, "失败",
             str(e), request.client.host,
@@ -575,18 +1053,23 @@ async def get_container_console(
     "/nat/rules/resync",
     response_model=schemas.OperationResponse,
     summary="重新同步所有NAT规则",
-    description="清除所有由本服务管理的iptables NAT规则，并根据数据库中的启用规则重新应用它们。",
+    description="清除所有由本服务管理的iptables NAT规则，并根据数据库中的启用规则重新应用它们。`background=true` 时作为后台作业执行。",
     tags=["NAT管理"]
 )
 async def resync_nat_rules_endpoint(
     request: Request,
+    response: Response,
+    background: bool = BACKGROUND_QUERY,
     _: bool = Depends(verify_api_key),
     db: Session = Depends(get_db)
 ):
+    if background:
+        return await _job_submitted(db, request, response, "提交NAT同步作业",
+                                    await run_blocking(job_manager.submit_nat_resync, request.client.host))
     request_id = request_task_id_cv.get()
     try:
-        success, message, stats = nat_service.resync_all_iptables_rules(db)
-        log_operation(
+        success, message, stats = await run_blocking(nat_service.resync_all_iptables_rules, db)
+        await log_operation_async(
             db, "重新同步NAT规则", "全部", "系统",
             "成功" if success else "失败",
             message, request.client.host, task_id=request_id
@@ -596,7 +1079,7 @@ async def resync_nat_rules_endpoint(
              return schemas.OperationResponse(success=False, message=message, data=stats)
         return schemas.OperationResponse(success=True, message=message, data=stats)
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "重新同步NAT规则", "全部", "系统", "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -621,10 +1104,10 @@ async def create_nat_rule_for_container(
 ):
     request_id = request_task_id_cv.get()
     try:
-        db_rule, message = nat_service.create_nat_rule(db, node, vmid, rule_create)
+        db_rule, message = await run_blocking(nat_service.create_nat_rule, db, node, vmid, rule_create)
         
         status_log = "成功" if db_rule and db_rule.enabled else "失败" if not db_rule else "警告"
-        log_operation(
+        await log_operation_async(
             db, "创建NAT规则", f"{node}/{vmid}", node, status_log,
             message, request.client.host, task_id=request_id
         )
@@ -641,7 +1124,7 @@ async def create_nat_rule_for_container(
     except HTTPException:
         raise
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "创建NAT规则", f"{node}/{vmid}", node, "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -661,12 +1144,12 @@ async def list_nat_rules_for_container(
     limit: int = Query(100, ge=1, le=200, description="每页最大记录数"),
     request: Request = None,
     _: bool = Depends(verify_api_key),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     request_id = request_task_id_cv.get()
     try:
-        rules, total = nat_service.get_nat_rules_for_container(db, node=node, vmid=vmid, skip=skip, limit=limit)
-        log_operation(
+        rules, total = await nat_service.get_nat_rules_for_container_async(db, node=node, vmid=vmid, skip=skip, limit=limit)
+        await log_operation_async(
             db, "列出容器NAT规则", f"{node}/{vmid}", node, "成功",
             f"获取到 {len(rules)} 条规则，总计 {total} 条。", request.client.host, task_id=request_id
         )
@@ -677,7 +1160,7 @@ async def list_nat_rules_for_container(
             total=total
         )
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "列出容器NAT规则", f"{node}/{vmid}", node, "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -694,12 +1177,12 @@ async def list_all_nat_rules(
     limit: int = Query(100, ge=1, le=200, description="每页最大记录数"),
     request: Request = None,
     _: bool = Depends(verify_api_key),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     request_id = request_task_id_cv.get()
     try:
-        rules, total = nat_service.get_all_nat_rules(db, skip=skip, limit=limit)
-        log_operation(
+        rules, total = await nat_service.get_all_nat_rules_async(db, skip=skip, limit=limit)
+        await log_operation_async(
             db, "列出所有NAT规则", "全部", "系统", "成功",
             f"获取到 {len(rules)} 条规则，总计 {total} 条。", request.client.host, task_id=request_id
         )
@@ -710,7 +1193,7 @@ async def list_all_nat_rules(
             total=total
         )
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "列出所有NAT规则", "全部", "系统", "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -727,19 +1210,19 @@ async def get_specific_nat_rule(
     rule_id: int = Path(..., description="NAT规则的ID", ge=1),
     request: Request = None,
     _: bool = Depends(verify_api_key),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     request_id = request_task_id_cv.get()
     try:
-        db_rule = nat_service.get_nat_rule_by_id(db, rule_id)
+        db_rule = await nat_service.get_nat_rule_by_id_async(db, rule_id)
         if not db_rule:
-            log_operation(
+            await log_operation_async(
                 db, "获取NAT规则详情", str(rule_id), "系统", "失败",
                 "规则未找到", request.client.host, task_id=request_id
             )
             raise HTTPException(status_code=404, detail="未找到指定的NAT规则。")
         
-        log_operation(
+        await log_operation_async(
             db, "获取NAT规则详情", str(rule_id), "系统", "成功",
             f"成功获取规则 ID {rule_id}。", request.client.host, task_id=request_id
         )
@@ -747,7 +1230,7 @@ async def get_specific_nat_rule(
     except HTTPException:
         raise
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "获取NAT规则详情", str(rule_id), "系统", "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -769,13 +1252,13 @@ async def update_specific_nat_rule(
 ):
     request_id = request_task_id_cv.get()
     try:
-        updated_rule, message = nat_service.update_nat_rule(db, rule_id, rule_update)
+        updated_rule, message = await run_blocking(nat_service.update_nat_rule, db, rule_id, rule_update)
         
         status_log = "失败"
         if updated_rule:
             status_log = "成功" if updated_rule.enabled and "iptables应用失败" not in message and "已被禁用" not in message else "警告"
 
-        log_operation(
+        await log_operation_async(
             db, "更新NAT规则", str(rule_id), updated_rule.node if updated_rule else "系统", status_log,
             message, request.client.host, task_id=request_id
         )
@@ -788,7 +1271,7 @@ async def update_specific_nat_rule(
     except HTTPException:
         raise
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "更新NAT规则", str(rule_id), "系统", "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -809,14 +1292,14 @@ async def delete_specific_nat_rule(
 ):
     request_id = request_task_id_cv.get()
     # Store details for logging before potential deletion
-    rule_to_log = nat_service.get_nat_rule_by_id(db, rule_id)
+    rule_to_log = await run_blocking(nat_service.get_nat_rule_by_id, db, rule_id)
     node_for_log = rule_to_log.node if rule_to_log else "系统"
     vmid_for_log = str(rule_to_log.vmid) if rule_to_log else str(rule_id)
 
     try:
-        success, message = nat_service.delete_nat_rule(db, rule_id)
+        success, message = await run_blocking(nat_service.delete_nat_rule, db, rule_id)
         
-        log_operation(
+        await log_operation_async(
             db, "删除NAT规则", f"{node_for_log}/{vmid_for_log}", node_for_log, "成功" if success else "失败",
             message, request.client.host, task_id=request_id
         )
@@ -828,7 +1311,7 @@ async def delete_specific_nat_rule(
     except HTTPException:
         raise
     except Exception as e:
-        log_operation(
+        await log_operation_async(
             db, "删除NAT规则", f"{node_for_log}/{vmid_for_log}", node_for_log, "异常",
             str(e), request.client.host, task_id=request_id
         )
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from .config import settings
+from .database import engine
+from .models import OperationLog
+from .operation_logs import utcnow
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP = 'drop'
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    # 后台批量写入操作日志：请求线程只把日志放入有界队列，写入线程按条数或时间阈值一次插入多行；
+    # 队列满时按 AUDIT_OVERFLOW_POLICY 处理：block 等待空位（事件循环中改由线程池等待，超时后丢弃并计数），drop 直接丢弃并计数
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float, overflow_policy: str):
+        if overflow_policy not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+            raise ValueError(f"未知的审计日志溢出策略: {overflow_policy}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.blocked = 0
+        self.max_batch = 0
+        self.flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"操作日志后台写入已启动，队列上限 {self._queue.maxsize}，批量 {self.batch_size} 条")
+
+    def stop(self, timeout: float = None):
+        # 先放入结束标记再等待写入线程退出，队列中已有的日志会全部写完
+        if not self.running:
+            return
+        timeout = settings.audit_drain_timeout if timeout is None else timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("操作日志队列已满，无法放入结束标记")
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"操作日志在 {timeout} 秒内未写完，剩余约 {self._queue.qsize()} 条")
+        else:
+            logger.info(f"操作日志后台写入已停止，共写入 {self.written} 条，丢弃 {self.dropped} 条，写入失败 {self.failed} 条")
+        self._thread = None
+
+    def submit(self, entry: Dict[str, Any]):
+        # 入队时记录时间，避免批量写入使 created_at 晚于实际操作时间
+        entry.setdefault('created_at', utcnow())
+        try:
+            self._queue.put_nowait(entry)
+            return
+        except queue.Full:
+            pass
+        if self.overflow_policy != OVERFLOW_BLOCK:
+            self._drop()
+            return
+        with self._lock:
+            self.blocked += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # 在事件循环中调用（async 路由）时不能在此等待队列空位，否则整个事件循环都会停顿；改由线程池等待
+            loop.run_in_executor(None, self._put_blocking, entry)
+            return
+        self._put_blocking(entry)
+
+    def _put_blocking(self, entry: Dict[str, Any]):
+        try:
+            self._queue.put(entry, timeout=settings.audit_block_timeout)
+        except queue.Full:
+            self._drop()
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+            dropped = self.dropped
+        if dropped == 1 or dropped % 1000 == 0:
+            logger.warning(f"操作日志队列已满，已丢弃 {dropped} 条日志")
+
+    async def submit_async(self, entry: Dict[str, Any]):
+        # 与 submit 相同，但 block 策略下调用方会等到日志入队（或超时丢弃）后再继续，等待期间不阻塞事件循环
+        entry.setdefault('created_at', utcnow())
+        try:
+            self._queue.put_nowait(entry)
+            return
+        except queue.Full:
+            pass
+        if self.overflow_policy != OVERFLOW_BLOCK:
+            self._drop()
+            return
+        with self._lock:
+            self.blocked += 1
+        await asyncio.get_running_loop().run_in_executor(None, self._put_blocking, entry)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._flush(batch)
+        # 结束标记之后入队的日志同样写完
+        leftover = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                leftover.append(entry)
+        for start in range(0, len(leftover), self.batch_size):
+            self._flush(leftover[start:start + self.batch_size])
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                # 单个事务内一次 executemany 插入整批日志
+                with engine.begin() as conn:
+                    conn.execute(insert(OperationLog), batch)
+                break
+            except Exception as e:
+                # 数据库被锁等临时错误按指数退避重试整批，重试用尽才计为写入失败；关闭时写完剩余日志也走同样的重试
+                if attempt >= settings.audit_flush_retries:
+                    logger.error(f"批量写入 {len(batch)} 条操作日志失败，已重试 {attempt} 次: {str(e)}")
+                    with self._lock:
+                        self.failed += len(batch)
+                    return
+                delay = settings.audit_retry_backoff * 2 ** attempt
+                attempt += 1
+                logger.warning(f"批量写入 {len(batch)} 条操作日志失败，{delay:.1f} 秒后第 {attempt} 次重试: {str(e)}")
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(batch))
+            self.flush_seconds += time.perf_counter() - started
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self.running,
+                'overflow_policy': self.overflow_policy,
+                'queued': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'written': self.written,
+                'batches': self.batches,
+                'mean_batch': round(self.written / self.batches, 1) if self.batches else 0.0,
+                'max_batch': self.max_batch,
+                'mean_flush_ms': round(self.flush_seconds / self.batches * 1000, 2) if self.batches else 0.0,
+                'blocked': self.blocked,
+                'dropped': self.dropped,
+                'retries': self.retries,
+                'failed': self.failed
+            }
+
+
+audit_writer = AuditLogWriter(
+    settings.audit_queue_size,
+    settings.audit_batch_size,
+    settings.audit_flush_interval,
+    settings.audit_overflow_policy
+)
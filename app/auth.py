@@ -1,9 +1,14 @@
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from .database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Union
+from .concurrency import run_blocking
+from .database import get_db, ThreadedSession
 from .models import OperationLog
 from .config import settings
+from .audit import audit_writer
+from .operation_logs import utcnow
 
 security = HTTPBearer()
 
@@ -21,15 +26,79 @@ def log_operation(
     ip_address: str = None,
     task_id: str = None
 ):
-    log_entry = OperationLog(
-        operation=operation,
-        container_id=container_id,
-        node_name=node_name,
-        status=status,
-        message=message,
-        ip_address=ip_address,
-        task_id=task_id
-    )
-
-    db.add(log_entry)
+    entry = {
+        'operation': operation,
+        'container_id': container_id,
+        'node_name': node_name,
+        'status': status,
+        'message': message,
+        'ip_address': ip_address,
+        'task_id': task_id,
+        # 时间由应用写入（不带时区的 UTC），与后台批量写入的日志格式一致，便于按 (created_at, id) 分页
+        'created_at': utcnow()
+    }
+    # 后台写入线程运行时只入队，不在请求中提交事务；未启动（如脚本直接调用）时同步写入
+    if audit_writer.running:
+        audit_writer.submit(entry)
+        return
+
+    db.add(OperationLog(**entry))
     db.commit()
+
+def log_operations(db: Session, entries: List[Dict[str, Any]]):
+    # 批量写入操作日志：每项的键与 OperationLog 的列名一致
+    if audit_writer.running:
+        for entry in entries:
+            audit_writer.submit(dict(entry))
+        return
+
+    db.add_all([OperationLog(**{'created_at': utcnow(), **entry}) for entry in entries])
+    db.commit()
+
+def _commit_logs(db: Session, entries: List[Dict[str, Any]]):
+    db.add_all([OperationLog(**entry) for entry in entries])
+    db.commit()
+
+async def log_operation_async(
+    db: Union[Session, AsyncSession, ThreadedSession],
+    operation: str,
+    container_id: str,
+    node_name: str,
+    status: str,
+    message: str,
+    ip_address: str = None,
+    task_id: str = None
+):
+    # log_operation 的异步版本，供 async 路由调用：同步会话的提交放到线程池执行，异步会话直接 await
+    entry = {
+        'operation': operation,
+        'container_id': container_id,
+        'node_name': node_name,
+        'status': status,
+        'message': message,
+        'ip_address': ip_address,
+        'task_id': task_id,
+        'created_at': utcnow()
+    }
+    if audit_writer.running:
+        await audit_writer.submit_async(entry)
+        return
+    if isinstance(db, Session):
+        await run_blocking(_commit_logs, db, [entry])
+        return
+
+    db.add(OperationLog(**entry))
+    await db.commit()
+
+async def log_operations_async(db: Union[Session, AsyncSession, ThreadedSession], entries: List[Dict[str, Any]]):
+    entries = [{'created_at': utcnow(), **entry} for entry in entries]
+    if audit_writer.running:
+        for entry in entries:
+            await audit_writer.submit_async(entry)
+        return
+    if isinstance(db, Session):
+        await run_blocking(_commit_logs, db, entries)
+        return
+
+    db.add_all([OperationLog(**entry) for entry in entries])
+    await db.commit()
@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterator
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.proxmox_executor_workers,
+    thread_name_prefix="pve-blocking"
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    # 阻塞调用 (proxmoxer/requests、iptables 子进程) 放到有界线程池执行，避免卡住事件循环；
+    # 复制 contextvars 以保留请求 task_id 等日志上下文
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+async def iterate_blocking(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    # 逐项在线程池中推进阻塞的迭代器（如按节点完成顺序产出结果的生成器），每取到一项即交给调用方
+    done = object()
+    while True:
+        item = await run_blocking(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def shutdown_executor(wait: bool = False):
+    logger.info("正在关闭阻塞调用线程池...")
+    _executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class SingleFlight:
+    # 相同 key 的并发调用只执行一次，其余调用方等待并共享同一结果（或异常）
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executed': self.executed,
+                'coalesced': self.coalesced
+            }
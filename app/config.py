@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,9 +7,98 @@ class Settings(BaseSettings):
     proxmox_port: int = 8006
     proxmox_user: str = "root@pam"
     proxmox_password: str = ""
+    proxmox_token_name: str = ""
+    proxmox_token_value: str = ""
+    proxmox_ticket_refresh_age: float = 3000.0
+    proxmox_ticket_check_interval: float = 60.0
     proxmox_verify_ssl: bool = False
+    proxmox_executor_workers: int = 32
+    proxmox_node_concurrency: int = 8
+    proxmox_node_timeout: float = 10.0
+    proxmox_coalesce_reads: bool = True
+    proxmox_connect_timeout: float = 5.0
+    proxmox_connect_retry_interval: float = 5.0
+    proxmox_read_timeout: float = 30.0
+    proxmox_pool_connections: int = 4
+    proxmox_pool_maxsize: int = 32
+    proxmox_tcp_keepalive: bool = True
+    proxmox_keepalive_idle: int = 30
+    proxmox_keepalive_interval: int = 10
+    container_list_mode: str = "cluster"
+
+    cache_max_entries: int = 512
+    cache_ttl_nodes: float = 15.0
+    cache_ttl_templates: float = 300.0
+    cache_ttl_storages: float = 60.0
+    cache_ttl_networks: float = 300.0
+    config_cache_ttl: float = 10.0
+    config_cache_retention: float = 600.0
+    config_cache_max_entries: int = 2048
+
+    task_poll_backoff: float = 1.5
+    task_track_timeout: float = 3600.0
+    task_poll_max_errors: int = 3
+    task_stream_poll_interval: float = 1.0
+    task_stream_heartbeat: float = 15.0
+    task_log_page_size: int = 500
+
+    bulk_max_items: int = 500
+    bulk_node_concurrency: int = 4
+    provision_max_parallel: int = 16
+
+    admission_node_concurrency: int = 2
+    admission_storage_concurrency: int = 4
+    admission_wait_timeout: float = 600.0
+    admission_sync_wait_timeout: float = 5.0
+    admission_hold_timeout: float = 1800.0
+
+    job_workers: int = 8
+    job_max_attempts: int = 3
+    job_retry_backoff: float = 10.0
+    job_retry_backoff_max: float = 300.0
+    job_poll_interval: float = 1.0
+    job_stage_timeout: float = 300.0
+    job_cancel_check_interval: float = 1.0
+    job_item_persist_batch: int = 20
+    job_item_persist_interval: float = 2.0
+    job_heartbeat_interval: float = 10.0
+    job_lease_timeout: float = 60.0
+
+    inventory_poll_enabled: bool = False
+    inventory_poll_interval: float = 5.0
+    inventory_max_staleness: float = 10.0
+
+    placement_weights: Dict[str, float] = {'cpu': 1.0, 'memory': 1.0, 'storage': 0.5, 'pending': 0.25}
+    placement_max_staleness: float = 30.0
 
     database_url: str = "sqlite:///./lxc_api.db"
+    database_pool_size: int = 16
+    database_max_overflow: int = 16
+    database_pool_timeout: float = 30.0
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: float = 10.0
+    sqlite_cache_size_kb: int = 65536
+    sqlite_mmap_size: int = 268435456
+
+    audit_async: bool = True
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 0.5
+    audit_overflow_policy: str = "block"
+    audit_block_timeout: float = 1.0
+    audit_drain_timeout: float = 10.0
+    audit_flush_retries: int = 3
+    audit_retry_backoff: float = 0.2
+
+    log_retention_enabled: bool = False
+    log_retention_days: int = 90
+    log_retention_max_rows: int = 0
+    log_retention_interval: float = 3600.0
+    log_retention_chunk_size: int = 10000
+    log_retention_delete_batch: int = 1000
+    log_retention_batch_pause: float = 0.05
+    log_archive_dir: str = "./log_archive"
 
     api_title: str = "Proxmox LXC 管理接口"
     api_description: str = "用于管理 Proxmox LXC 容器的 REST API 服务"
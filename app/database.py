@@ -1,15 +1,202 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+from typing import Optional, Union
+
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import Engine, Result, ScalarResult, URL
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from .concurrency import run_blocking
 from .config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas() -> dict:
+    # cache_size 为负数时单位为 KiB
+    return {
+        'journal_mode': settings.sqlite_journal_mode,
+        'synchronous': settings.sqlite_synchronous,
+        'busy_timeout': int(settings.sqlite_busy_timeout * 1000),
+        'cache_size': -settings.sqlite_cache_size_kb,
+        'mmap_size': settings.sqlite_mmap_size,
+        'temp_store': 'MEMORY'
+    }
+
+
+def _install_sqlite_pragmas(target: Engine):
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(target, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def build_engine(url: str) -> Engine:
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_pre_ping=True
+        )
+
+    # timeout 为 sqlite3 驱动等待写锁的秒数，与 busy_timeout 一致
+    connect_args = {"check_same_thread": False, "timeout": settings.sqlite_busy_timeout}
+    if ":memory:" in url or url.rstrip("/") == "sqlite:":
+        new_engine = create_engine(url, connect_args=connect_args)
+    else:
+        # 线程池、作业、后台写入等线程各自持有连接；WAL 下读不阻塞写，连接池按并发线程数设置
+        new_engine = create_engine(
+            url,
+            connect_args=connect_args,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout
+        )
+    _install_sqlite_pragmas(new_engine)
+    return new_engine
+
+
+# 同步驱动对应的异步驱动，按 URL 中的数据库类型替换驱动部分（sqlite+pysqlite、postgresql+psycopg2 等同样适用）；
+# 已指定异步驱动（如 sqlite+aiosqlite）时原样使用
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'asyncpg',
+    'mysql': 'aiomysql'
+}
+
+
+def async_database_url(url: str) -> URL:
+    url = make_url(url)
+    if url.get_dialect().is_async:
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"数据库 {backend} 没有可用的异步驱动")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def build_async_engine(url: str) -> AsyncEngine:
+    # 异步引擎与同步引擎指向同一数据库，连接池与 SQLite 参数一致；aiosqlite 在每个连接的专用线程中执行 SQL，
+    # 协程等待期间事件循环可以处理其他请求
+    url = async_database_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return create_async_engine(
+            url,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_pre_ping=True
+        )
+
+    connect_args = {"timeout": settings.sqlite_busy_timeout}
+    if url.database in (None, "", ":memory:"):
+        new_engine = create_async_engine(url, connect_args=connect_args)
+    else:
+        # aiosqlite 对文件数据库默认不复用连接（NullPool），每次请求都要新建连接与工作线程，这里显式使用连接池
+        new_engine = create_async_engine(
+            url,
+            connect_args=connect_args,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout
+        )
+    _install_sqlite_pragmas(new_engine.sync_engine)
+    return new_engine
+
+
+engine = build_engine(settings.database_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_lock = threading.Lock()
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+_async_unavailable = False
+
+
+def get_async_engine() -> Optional[AsyncEngine]:
+    # 首次使用时创建异步引擎；未安装对应的异步驱动时返回 None，调用方改用线程池中的同步会话
+    global _async_engine, _async_session_factory, _async_unavailable
+    if _async_engine is not None or _async_unavailable:
+        return _async_engine
+    with _async_lock:
+        if _async_engine is None and not _async_unavailable:
+            try:
+                _async_engine = build_async_engine(settings.database_url)
+            except Exception as e:
+                _async_unavailable = True
+                logger.warning(f"无法创建异步数据库引擎，改用线程池中的同步会话: {str(e)}")
+                return None
+            # 提交后不使对象过期，避免在异步上下文中访问属性时触发隐式的懒加载查询
+            _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+class ThreadedSession:
+    # 没有异步驱动时 get_async_db 提供的会话：接口与路由中用到的 AsyncSession 方法一致，
+    # 实际在线程池中使用同步会话执行，同样不会阻塞事件循环
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_blocking(self.sync_session.get, entity, ident, **kwargs)
+
+    async def execute(self, statement, params=None, **kwargs) -> Result:
+        # 在线程池中取完全部结果，返回的 Result 在事件循环中读取时不再访问数据库
+        frozen = await run_blocking(lambda: self.sync_session.execute(statement, params, **kwargs).freeze())
+        return frozen()
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await run_blocking(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs) -> ScalarResult:
+        return (await self.execute(statement, params, **kwargs)).scalars()
+
+    async def commit(self):
+        await run_blocking(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_blocking(self.sync_session.rollback)
+
+    async def close(self):
+        await run_blocking(self.sync_session.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+def async_session() -> Union[AsyncSession, ThreadedSession]:
+    # 用法与 AsyncSession 相同：async with async_session() as db
+    if get_async_engine() is None:
+        return ThreadedSession(SessionLocal())
+    return _async_session_factory()
+
+
 Base = declarative_base()
 
 def get_db():
@@ -19,6 +206,14 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with async_session() as db:
+        yield db
+
 def create_tables():
     from . import models
+    from .operation_logs import upgrade_operation_logs
+    from .jobs import upgrade_jobs
     Base.metadata.create_all(bind=engine)
+    upgrade_operation_logs(engine)
+    upgrade_jobs(engine)
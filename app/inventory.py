@@ -0,0 +1,299 @@
+import asyncio
+import base64
+import bisect
+import json
+import logging
+import time
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from .config import settings
+from .concurrency import run_blocking
+from .proxmox import proxmox_service, ProxmoxService
+
+logger = logging.getLogger(__name__)
+
+
+CONTAINER_SORT_FIELDS = ('vmid', 'name', 'cpu', 'mem', 'uptime')
+
+# 候选集合小于总数的该比例时，直接对候选排序，而不是沿全量排序索引扫描
+SUBSET_SORT_RATIO = 0.125
+
+
+def container_matches(container: Dict[str, Any], status: Optional[str] = None, node: Optional[str] = None,
+                      template: Optional[bool] = None, name: Optional[str] = None,
+                      name_prefix: Optional[str] = None) -> bool:
+    if status is not None and container.get('status') != status:
+        return False
+    if node is not None and container.get('node') != node:
+        return False
+    if template is not None and bool(container.get('template')) != template:
+        return False
+    if name is not None or name_prefix is not None:
+        container_name = (container.get('name') or '').lower()
+        if name is not None and name.lower() not in container_name:
+            return False
+        if name_prefix is not None and not container_name.startswith(name_prefix.lower()):
+            return False
+    return True
+
+
+def encode_cursor(sort: str, key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple:
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(decoded, list) or len(decoded) != 4 or decoded[0] != sort:
+        raise ValueError("分页游标与当前排序方式不匹配")
+    value, node, vmid = decoded[1:]
+    # 游标值需与 ContainerIndex.sort_key 的类型一致，否则与有序索引比较时会出错
+    if sort == 'vmid':
+        value_ok = _is_int(value)
+    elif sort == 'name':
+        value_ok = isinstance(value, str)
+    else:
+        value_ok = _is_number(value)
+    if not value_ok or not isinstance(node, str) or not _is_int(vmid):
+        raise ValueError("无效的分页游标")
+    return value, node, vmid
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class ContainerIndex:
+    # 容器列表的内存索引：按状态、节点、模板标志建立位置集合，按排序字段懒构建有序索引；
+    # 游标为上一页最后一项的 (排序值, 节点, VMID)，快照刷新后仍可从同一位置继续翻页
+
+    def __init__(self, containers: List[Dict[str, Any]]):
+        self.containers = containers
+        self.by_status: Dict[str, Set[int]] = {}
+        self.by_node: Dict[str, Set[int]] = {}
+        self.by_template: Dict[bool, Set[int]] = {True: set(), False: set()}
+        for position, container in enumerate(containers):
+            self.by_status.setdefault(container.get('status'), set()).add(position)
+            self.by_node.setdefault(container.get('node'), set()).add(position)
+            self.by_template[bool(container.get('template'))].add(position)
+        self._orders: Dict[str, Tuple[List[Tuple], List[int], List[int]]] = {}
+
+    @staticmethod
+    def sort_key(container: Dict[str, Any], field: str) -> Tuple:
+        if field == 'vmid':
+            value = int(container['vmid'])
+        elif field == 'name':
+            value = (container.get('name') or '').lower()
+        else:
+            value = container.get(field) or 0
+        return value, container['node'], int(container['vmid'])
+
+    def _order(self, field: str) -> Tuple[List[Tuple], List[int], List[int]]:
+        # (有序的排序键, 按序排列的位置, 每个位置的名次)；并发构建时结果相同，后写覆盖即可
+        order = self._orders.get(field)
+        if order is None:
+            keyed = sorted((self.sort_key(c, field), position) for position, c in enumerate(self.containers))
+            keys = [key for key, _ in keyed]
+            positions = [position for _, position in keyed]
+            ranks = [0] * len(positions)
+            for rank, position in enumerate(positions):
+                ranks[position] = rank
+            order = self._orders[field] = (keys, positions, ranks)
+        return order
+
+    def query(self, status: Optional[str] = None, node: Optional[str] = None, template: Optional[bool] = None,
+              name: Optional[str] = None, name_prefix: Optional[str] = None, sort: str = 'vmid',
+              descending: bool = False, cursor: Optional[str] = None,
+              limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        candidates: Optional[Set[int]] = None
+        if status is not None:
+            candidates = self.by_status.get(status, set())
+        if node is not None:
+            subset = self.by_node.get(node, set())
+            candidates = subset if candidates is None else candidates & subset
+        if template is not None:
+            subset = self.by_template[template]
+            candidates = subset if candidates is None else candidates & subset
+
+        def name_ok(position: int) -> bool:
+            return container_matches(self.containers[position], name=name, name_prefix=name_prefix)
+
+        filter_names = name is not None or name_prefix is not None
+        if filter_names:
+            total = sum(1 for p in (candidates if candidates is not None else range(len(self.containers))) if name_ok(p))
+        else:
+            total = len(candidates) if candidates is not None else len(self.containers)
+
+        keys, positions, ranks = self._order(sort)
+        # 游标之后的第一个名次（升序）或游标之前的最后一个名次（降序）
+        if cursor is not None:
+            cursor_key = decode_cursor(cursor, sort)
+            start = bisect.bisect_right(keys, cursor_key) if not descending else bisect.bisect_left(keys, cursor_key) - 1
+        else:
+            start = 0 if not descending else len(keys) - 1
+
+        if candidates is not None and len(candidates) < len(self.containers) * SUBSET_SORT_RATIO:
+            candidate_ranks = sorted(ranks[p] for p in candidates)
+            if descending:
+                candidate_ranks = [r for r in reversed(candidate_ranks) if r <= start]
+            else:
+                candidate_ranks = candidate_ranks[bisect.bisect_left(candidate_ranks, start):]
+            ordered = (positions[r] for r in candidate_ranks)
+        else:
+            rank_range = range(start, len(keys)) if not descending else range(start, -1, -1)
+            ordered = (positions[r] for r in rank_range if candidates is None or positions[r] in candidates)
+
+        page: List[Dict[str, Any]] = []
+        has_more = False
+        for position in ordered:
+            if filter_names and not name_ok(position):
+                continue
+            if limit is not None and len(page) >= limit:
+                has_more = True
+                break
+            page.append(self.containers[position])
+        next_cursor = encode_cursor(sort, self.sort_key(page[-1], sort)) if has_more and page else None
+        return page, total, next_cursor
+
+
+class InventorySnapshot:
+    def __init__(self, nodes: List[Dict[str, Any]], containers: List[Dict[str, Any]],
+                 storages: List[Dict[str, Any]]):
+        self.nodes = nodes
+        self.containers = containers
+        self.storages = storages
+        self.refreshed_at = time.time()
+        self._containers_by_key: Dict[Tuple[str, str], Dict[str, Any]] = {
+            (c['node'], str(c['vmid'])): c for c in containers
+        }
+        self.node_names = {n['node'] for n in nodes}
+        self._index: Optional[ContainerIndex] = None
+
+    @property
+    def index(self) -> ContainerIndex:
+        # 首次带过滤或分页的查询时构建，同一份快照内复用
+        if self._index is None:
+            self._index = ContainerIndex(self.containers)
+        return self._index
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.refreshed_at
+
+    def get_containers(self, node: str = None) -> List[Dict[str, Any]]:
+        if node:
+            return [c for c in self.containers if c['node'] == node]
+        return self.containers
+
+    def get_container(self, node: str, vmid: str) -> Optional[Dict[str, Any]]:
+        return self._containers_by_key.get((node, str(vmid)))
+
+
+class InventoryPoller:
+    # 后台定期刷新集群快照（节点、容器及其状态），读接口在可接受的陈旧度内直接使用快照
+
+    def __init__(self, service: ProxmoxService, interval: float):
+        self.service = service
+        self.interval = interval
+        self.snapshot: Optional[InventorySnapshot] = None
+        # 最近一次刷新得到的快照，不随容器变更失效，供自动选点等容忍短暂过时的场景使用
+        self.last_snapshot: Optional[InventorySnapshot] = None
+        self.refresh_count = 0
+        self.served_from_snapshot = 0
+        self._generation = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.service.on_container_mutation(self._on_container_mutation)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def refresh(self) -> Optional[InventorySnapshot]:
+        generation = self._generation
+        try:
+            # 一次 /cluster/resources 即可得到节点、容器和存储
+            resources = self.service.get_cluster_resources()
+            nodes = [r for r in resources if r.get('type') == 'node' and r.get('status') == 'online']
+            containers = ProxmoxService.containers_from_resources(resources)
+            storages = [r for r in resources if r.get('type') == 'storage']
+        except Exception as e:
+            logger.warning(f"通过 /cluster/resources 刷新快照失败，改为按节点查询: {str(e)}")
+            nodes = self.service.get_nodes(use_cache=False)
+            containers = self.service.get_containers(mode="nodes")
+            storages = []
+
+        snapshot = InventorySnapshot(nodes, containers, storages)
+        self.refresh_count += 1
+        self.last_snapshot = snapshot
+        if generation != self._generation:
+            # 刷新期间有容器变更，丢弃这份可能过时的快照，等待下一轮刷新
+            return None
+        self.snapshot = snapshot
+        return snapshot
+
+    def get_snapshot(self, max_staleness: Optional[float] = None) -> Optional[InventorySnapshot]:
+        if not self.running or self.snapshot is None:
+            return None
+        max_staleness = settings.inventory_max_staleness if max_staleness is None else max_staleness
+        if self.snapshot.age > max_staleness:
+            return None
+        self.served_from_snapshot += 1
+        return self.snapshot
+
+    def _on_container_mutation(self, node: str, vmid: Optional[str] = None):
+        # 容器变更后快照立即失效，并提前唤醒后台刷新
+        self._generation += 1
+        self.snapshot = None
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await run_blocking(self.refresh)
+            except Exception as e:
+                logger.warning(f"刷新集群快照失败: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"集群快照后台刷新已启动，间隔 {self.interval} 秒")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("集群快照后台刷新已停止")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'snapshot_age': round(self.snapshot.age, 3) if self.snapshot else None,
+            'refresh_count': self.refresh_count,
+            'served_from_snapshot': self.served_from_snapshot
+        }
+
+
+inventory_poller = InventoryPoller(proxmox_service, settings.inventory_poll_interval)
@@ -0,0 +1,782 @@
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, or_
+from sqlalchemy.engine import Engine
+
+from . import models, nat_service
+from .auth import log_operation
+from .config import settings
+from .database import SessionLocal
+from .logging_context import request_task_id_cv, request_client_cv
+from .placement import node_placer
+from .proxmox import proxmox_service, ProxmoxService
+from .schemas import ContainerCreate, ContainerRebuild, NetworkInterface
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+STAGE_STOPPING = 'stopping'
+STAGE_DELETING = 'deleting'
+STAGE_CREATING = 'creating'
+STAGE_STARTING = 'starting'
+STAGE_RESYNCING = 'resyncing'
+REBUILD_STAGES = (STAGE_STOPPING, STAGE_DELETING, STAGE_CREATING, STAGE_STARTING)
+STAGE_COMPLETED_STATES = ('done', 'skipped')
+
+JOB_OPERATION_NAMES = {
+    'rebuild': "重建容器",
+    'provision': "批量创建容器",
+    'create': "创建容器",
+    'delete': "删除容器",
+    'nat_resync': "重新同步NAT规则"
+}
+
+# 不对应具体节点或容器的作业，node/vmid 列留空，展示与记录日志时使用的名称
+JOB_TARGET_LABELS = {
+    'nat_resync': ("系统", "全部")
+}
+
+# 作业结束后从持久化的参数中清除的敏感字段
+SECRET_PAYLOAD_KEYS = ('password',)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def upgrade_jobs(bind: Engine):
+    # create_all 不会给已存在的表补列：旧库首次启动时补建租约相关的列
+    table = models.Job.__table__
+    existing = {column['name'] for column in inspect(bind).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return
+    with bind.begin() as conn:
+        for column in missing:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+            )
+    logger.info(f"已为作业表补建列: {', '.join(column.name for column in missing)}")
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _isoformat(value: Optional[datetime.datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def wait_for_task(service: ProxmoxService, job: "Job", node: str, task_id: str) -> Dict[str, Any]:
+    # 分段等待 Proxmox 任务结束，期间检查取消请求；取消时中止该任务
+    future = service.task_tracker.track(node, task_id)
+    deadline = time.monotonic() + settings.job_stage_timeout
+    try:
+        while True:
+            if job.cancel_event.is_set():
+                service.stop_task(node, task_id)
+                raise JobCancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FutureTimeoutError(f"等待任务 {task_id} 超时")
+            try:
+                return future.result(timeout=min(remaining, settings.job_cancel_check_interval))
+            except FutureTimeoutError:
+                continue
+    finally:
+        service.task_tracker.untrack(task_id, future)
+
+
+def _scrub(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: ('******' if k in SECRET_PAYLOAD_KEYS else _scrub(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_scrub(v) for v in value]
+    return value
+
+
+class Job:
+    def __init__(self, job_type: str, node: str, vmid: str, stages: Tuple[str, ...] = (), client_ip: str = None,
+                 payload: Dict[str, Any] = None, max_attempts: int = None):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.node = node
+        self.vmid = str(vmid) if vmid is not None else None
+        self.client_ip = client_ip
+        self.payload: Dict[str, Any] = payload or {}
+        self.status = JOB_QUEUED
+        self.message = '已排队'
+        self.stage: Optional[str] = None
+        self.stages: List[Dict[str, Any]] = [{'name': name, 'status': 'pending'} for name in stages]
+        self.task_id: Optional[str] = None
+        # 批量作业的逐项进度，每项至少包含 status 字段
+        self.items: Optional[List[Dict[str, Any]]] = None
+        self.attempts = 0
+        self.max_attempts = max_attempts or settings.job_max_attempts
+        self.created_at = _now()
+        self.updated_at = self.created_at
+        self.next_run_at = self.created_at
+        self.started_at: Optional[datetime.datetime] = None
+        self.finished_at: Optional[datetime.datetime] = None
+        self.owner: Optional[str] = None
+        self.heartbeat_at: Optional[datetime.datetime] = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.RLock()
+        # 由 JobManager 设置，进度变化时写回数据库
+        self.persist: Optional[Callable[[], None]] = None
+        self._unsaved = 0
+        self._saved_at = 0.0
+
+    @classmethod
+    def from_row(cls, row: models.Job) -> "Job":
+        job = cls.__new__(cls)
+        job.id = row.id
+        job.type = row.type
+        job.node = row.node
+        job.vmid = row.vmid
+        job.client_ip = row.client_ip
+        job.payload = json.loads(row.payload) if row.payload else {}
+        job.status = row.status
+        job.message = row.message
+        job.stage = row.stage
+        job.stages = json.loads(row.stages) if row.stages else []
+        job.task_id = row.task_id
+        job.items = json.loads(row.items) if row.items else None
+        job.attempts = row.attempts
+        job.max_attempts = row.max_attempts
+        job.created_at = row.created_at
+        job.updated_at = row.updated_at
+        job.next_run_at = row.next_run_at
+        job.started_at = row.started_at
+        job.finished_at = row.finished_at
+        job.owner = row.owner
+        job.heartbeat_at = row.heartbeat_at
+        job.cancel_event = threading.Event()
+        job.lock = threading.RLock()
+        job.persist = None
+        job._unsaved = 0
+        job._saved_at = 0.0
+        return job
+
+    def to_row(self) -> models.Job:
+        with self.lock:
+            return models.Job(
+                id=self.id,
+                type=self.type,
+                node=self.node,
+                vmid=self.vmid,
+                status=self.status,
+                stage=self.stage,
+                message=self.message,
+                payload=json.dumps(self.payload, ensure_ascii=False),
+                stages=json.dumps(self.stages, ensure_ascii=False),
+                items=json.dumps(self.items, ensure_ascii=False) if self.items is not None else None,
+                task_id=self.task_id,
+                attempts=self.attempts,
+                max_attempts=self.max_attempts,
+                next_run_at=self.next_run_at,
+                client_ip=self.client_ip,
+                created_at=self.created_at,
+                updated_at=self.updated_at,
+                started_at=self.started_at,
+                finished_at=self.finished_at,
+                owner=self.owner,
+                heartbeat_at=self.heartbeat_at
+            )
+
+    @property
+    def target_labels(self) -> Tuple[Optional[str], Optional[str]]:
+        node_label, vmid_label = JOB_TARGET_LABELS.get(self.type, (None, None))
+        return self.node if self.node is not None else node_label, self.vmid if self.vmid is not None else vmid_label
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED_STATES
+
+    def _changed(self, deferred: bool = False):
+        # deferred: 批量条目的进度变化攒够 JOB_ITEM_PERSIST_BATCH 条或超过 JOB_ITEM_PERSIST_INTERVAL 秒才写回
+        self.updated_at = _now()
+        if self.persist is None:
+            return
+        self._unsaved += 1
+        if deferred and self._unsaved < settings.job_item_persist_batch \
+                and time.monotonic() - self._saved_at < settings.job_item_persist_interval:
+            return
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self.persist()
+
+    def flush(self):
+        # 写回尚未保存的条目进度
+        with self.lock:
+            if self._unsaved and self.persist is not None:
+                self._unsaved = 0
+                self._saved_at = time.monotonic()
+                self.persist()
+
+    def get_stage(self, name: str) -> Dict[str, Any]:
+        return next(stage for stage in self.stages if stage['name'] == name)
+
+    def begin_stage(self, name: str, message: str):
+        with self.lock:
+            self.stage = name
+            self.message = message
+            self.get_stage(name).update(status='running', started_at=_now().isoformat())
+            self._changed()
+
+    def end_stage(self, name: str, status: str = 'done', message: str = None):
+        with self.lock:
+            stage = self.get_stage(name)
+            stage.update(status=status, finished_at=_now().isoformat())
+            if message:
+                stage['message'] = message
+            self._changed()
+
+    def set_task(self, task_id: str):
+        # 记录当前阶段下发的 Proxmox 任务，恢复执行时据此等待已有任务而不是重复下发
+        with self.lock:
+            self.task_id = task_id
+            if self.stage:
+                self.get_stage(self.stage)['task_id'] = task_id
+            self._changed()
+
+    def update_item(self, index: int, **fields):
+        with self.lock:
+            self.items[index].update(fields)
+            self._changed(deferred=True)
+
+    @property
+    def progress(self) -> Optional[Dict[str, int]]:
+        if self.items is None:
+            return None
+        with self.lock:
+            counts = {'total': len(self.items)}
+            for item in self.items:
+                counts[item['status']] = counts.get(item['status'], 0) + 1
+            return counts
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            node, vmid = self.target_labels
+            data = {
+                'job_id': self.id,
+                'type': self.type,
+                'node': node,
+                'vmid': vmid,
+                'status': self.status,
+                'stage': self.stage,
+                'message': self.message,
+                'task_id': self.task_id,
+                'stages': [dict(stage) for stage in self.stages],
+                'attempts': self.attempts,
+                'max_attempts': self.max_attempts,
+                'created_at': _isoformat(self.created_at),
+                'updated_at': _isoformat(self.updated_at),
+                'next_run_at': _isoformat(self.next_run_at) if self.status == JOB_QUEUED else None,
+                'started_at': _isoformat(self.started_at),
+                'finished_at': _isoformat(self.finished_at)
+            }
+            if self.items is not None:
+                data['progress'] = self.progress
+                data['items'] = [dict(item) for item in self.items]
+            return data
+
+
+class JobManager:
+    # 长耗时操作持久化到 jobs 表，由工作线程池领取执行；失败按指数退避重试。
+    # 领取的作业由本进程定期续约，进程退出后租约过期的作业重新排队，并从最后完成的阶段继续执行
+
+    def __init__(self, service: ProxmoxService, workers: int):
+        self.service = service
+        self.workers = workers
+        self._handlers: Dict[str, Callable[[Job], str]] = {}
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._running: Dict[str, Job] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        # 租约持有者标识，区分同一数据库上的多个进程
+        self.owner = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.register('rebuild', self._rebuild)
+        self.register('create', self._create)
+        self.register('delete', self._delete)
+        self.register('nat_resync', self._nat_resync)
+
+    def register(self, job_type: str, handler: Callable[[Job], str]):
+        self._handlers[job_type] = handler
+
+    def start(self):
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stopping.clear()
+        self._recover()
+        if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"作业工作线程已启动，共 {self.workers} 个")
+
+    def shutdown(self):
+        # 不取消执行中的作业：它们保持 running 状态，本进程退出后租约过期，由 _recover 重新排队并继续执行
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def submit(self, job: Job, exclusive: bool = True) -> Dict[str, Any]:
+        # exclusive: 同一 (node, vmid) 同时只允许一个未结束的作业
+        active = None
+        with self._lock:
+            if exclusive:
+                db = SessionLocal()
+                try:
+                    query = db.query(models.Job.id).filter(
+                        models.Job.node == job.node,
+                        models.Job.vmid == job.vmid,
+                        models.Job.status.in_((JOB_QUEUED, JOB_RUNNING))
+                    )
+                    if job.node is None:
+                        # 不对应具体容器的作业只与同类型的作业互斥
+                        query = query.filter(models.Job.type == job.type)
+                    active = query.first()
+                finally:
+                    db.close()
+            if active is None:
+                self._save(job)
+        if active is not None:
+            # get_job 需要获取 self._lock，在释放后再查询已有作业
+            return {
+                'success': False,
+                'message': f'{JOB_OPERATION_NAMES[job.type]}已有未完成的作业 {active.id}' if job.node is None
+                else f'容器 {job.vmid} 已有未完成的作业 {active.id}',
+                'job': self.get_job(active.id)
+            }
+        with self._cond:
+            self._cond.notify()
+        logger.info(f"作业 {job.id} ({job.type}) 已提交")
+        return {'success': True, 'message': f'{JOB_OPERATION_NAMES[job.type]}作业已提交', 'job': job}
+
+    def submit_rebuild(self, node: str, vmid: str, data: ContainerRebuild, client_ip: str = None) -> Dict[str, Any]:
+        return self.submit(Job('rebuild', node, vmid, REBUILD_STAGES, client_ip, payload=data.model_dump(mode='json')))
+
+    def submit_create(self, data: ContainerCreate, client_ip: str = None) -> Dict[str, Any]:
+        return self.submit(Job('create', data.node, data.vmid, (STAGE_CREATING,), client_ip,
+                               payload=data.model_dump(mode='json')))
+
+    def submit_delete(self, node: str, vmid: str, client_ip: str = None) -> Dict[str, Any]:
+        return self.submit(Job('delete', node, vmid, (STAGE_DELETING,), client_ip))
+
+    def submit_nat_resync(self, client_ip: str = None) -> Dict[str, Any]:
+        return self.submit(Job('nat_resync', None, None, (STAGE_RESYNCING,), client_ip))
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._running.get(job_id)
+        if job is not None:
+            return job
+        db = SessionLocal()
+        try:
+            row = db.get(models.Job, job_id)
+            return Job.from_row(row) if row is not None else None
+        finally:
+            db.close()
+
+    def list_jobs(self, status: str = None, job_type: str = None, node: str = None, vmid: str = None,
+                  skip: int = 0, limit: int = 50) -> Tuple[List[Job], int]:
+        db = SessionLocal()
+        try:
+            query = db.query(models.Job)
+            if status:
+                query = query.filter(models.Job.status == status)
+            if job_type:
+                query = query.filter(models.Job.type == job_type)
+            if node:
+                query = query.filter(models.Job.node == node)
+            if vmid:
+                query = query.filter(models.Job.vmid == str(vmid))
+            total = query.count()
+            rows = query.order_by(models.Job.created_at.desc()).offset(skip).limit(limit).all()
+        finally:
+            db.close()
+        with self._lock:
+            # 执行中的作业以内存中的最新进度为准
+            return [self._running.get(row.id) or Job.from_row(row) for row in rows], total
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            running = self._running.get(job_id)
+        if running is not None:
+            running.cancel_event.set()
+            return {'success': True, 'message': f'已请求取消作业 {job_id}', 'job': running}
+
+        job = self.get_job(job_id)
+        if job is None:
+            return {'success': False, 'message': f'作业 {job_id} 不存在'}
+        if job.status == JOB_QUEUED:
+            db = SessionLocal()
+            try:
+                # 条件更新：只有仍在排队（未被工作线程领取）时才能直接取消
+                cancelled = db.query(models.Job).filter(
+                    models.Job.id == job_id, models.Job.status == JOB_QUEUED
+                ).update({'status': JOB_CANCELLED}, synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+            if cancelled:
+                self._finish(job, JOB_CANCELLED, '作业在开始前被取消')
+                return {'success': True, 'message': f'作业 {job_id} 已取消', 'job': job}
+            return self.cancel(job_id)
+        return {'success': False, 'message': f'作业 {job_id} 已结束，状态为 {job.status}', 'job': job}
+
+    def _save(self, job: Job):
+        with job.lock:
+            db = SessionLocal()
+            try:
+                db.merge(job.to_row())
+                db.commit()
+            finally:
+                db.close()
+
+    def _recover(self):
+        # 只回收租约过期的作业：其他进程（多 worker 或滚动重启时的新旧进程）仍在执行的作业会按时续约
+        cutoff = _now() - datetime.timedelta(seconds=settings.job_lease_timeout)
+        db = SessionLocal()
+        try:
+            recovered = db.query(models.Job).filter(
+                models.Job.status == JOB_RUNNING,
+                or_(models.Job.heartbeat_at.is_(None), models.Job.heartbeat_at < cutoff)
+            ).update(
+                {'status': JOB_QUEUED, 'next_run_at': _now(), 'owner': None,
+                 'message': '执行作业的进程已退出，作业重新排队'},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+        if recovered:
+            logger.info(f"已将 {recovered} 个中断的作业重新排队")
+        return recovered
+
+    def _heartbeat(self):
+        now = _now()
+        with self._lock:
+            jobs = list(self._running.values())
+        for job in jobs:
+            with job.lock:
+                job.heartbeat_at = now
+        if not jobs:
+            return
+        db = SessionLocal()
+        try:
+            renewed = db.query(models.Job).filter(
+                models.Job.id.in_([job.id for job in jobs]), models.Job.owner == self.owner
+            ).update({'heartbeat_at': now}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if renewed < len(jobs):
+            logger.warning(f"{len(jobs) - renewed} 个执行中作业的租约已被其他进程回收，可能被重复执行")
+
+    def _heartbeat_loop(self):
+        # 关闭后仍为执行中的作业续约，直到它们结束或进程退出
+        while not (self._stopping.is_set() and not self._running):
+            time.sleep(settings.job_heartbeat_interval)
+            try:
+                self._heartbeat()
+                if not self._stopping.is_set():
+                    self._recover()
+            except Exception as e:
+                logger.error(f"作业续约失败: {str(e)}")
+
+    def _claim(self) -> Optional[Job]:
+        db = SessionLocal()
+        try:
+            while True:
+                now = _now()
+                row = db.query(models.Job).filter(
+                    models.Job.status == JOB_QUEUED, models.Job.next_run_at <= now
+                ).order_by(models.Job.next_run_at, models.Job.created_at).first()
+                if row is None:
+                    return None
+                # 条件更新保证同一作业只会被一个工作线程（或进程）领取，领取时写入本进程的租约
+                claimed = db.query(models.Job).filter(
+                    models.Job.id == row.id, models.Job.status == JOB_QUEUED
+                ).update({
+                    'status': JOB_RUNNING,
+                    'attempts': models.Job.attempts + 1,
+                    'started_at': now,
+                    'updated_at': now,
+                    'owner': self.owner,
+                    'heartbeat_at': now
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    db.refresh(row)
+                    return Job.from_row(row)
+        finally:
+            db.close()
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                logger.error(f"领取作业失败: {str(e)}")
+                job = None
+            if job is None:
+                with self._cond:
+                    self._cond.wait(timeout=settings.job_poll_interval)
+                continue
+            self._execute(job)
+
+    def _execute(self, job: Job):
+        request_task_id_cv.set(job.id)
+        request_client_cv.set(job.client_ip or "system")
+        job.persist = lambda: self._save(job)
+        with self._lock:
+            self._running[job.id] = job
+        try:
+            handler = self._handlers.get(job.type)
+            if handler is None:
+                raise Exception(f"未知的作业类型: {job.type}")
+            message = handler(job)
+        except JobCancelled:
+            if job.stage:
+                job.end_stage(job.stage, 'cancelled')
+            self._finish(job, JOB_CANCELLED, f'作业在 {job.stage or "开始"} 阶段被取消')
+        except Exception as e:
+            logger.error(f"作业 {job.id} 第 {job.attempts} 次执行失败: {str(e)}")
+            if job.stage:
+                job.end_stage(job.stage, 'failed', str(e))
+            if job.attempts < job.max_attempts and not self._stopping.is_set():
+                self._retry(job, e)
+            else:
+                self._finish(job, JOB_FAILED, str(e))
+        else:
+            self._finish(job, JOB_SUCCEEDED, message)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+
+    def _retry(self, job: Job, error: Exception):
+        delay = min(settings.job_retry_backoff * 2 ** (job.attempts - 1), settings.job_retry_backoff_max)
+        with job.lock:
+            job.status = JOB_QUEUED
+            job.next_run_at = _now() + datetime.timedelta(seconds=delay)
+            job.message = f'第 {job.attempts} 次执行失败，{delay:.0f} 秒后重试: {str(error)}'
+            job._changed()
+
+    def _finish(self, job: Job, status: str, message: str):
+        with job.lock:
+            if job.finished:
+                return
+            job.status = status
+            job.message = message
+            job.finished_at = _now()
+            job.payload = _scrub(job.payload)
+            job.updated_at = job.finished_at
+        self._save(job)
+        op_status = {JOB_SUCCEEDED: "成功", JOB_FAILED: "失败", JOB_CANCELLED: "已取消"}[status]
+        db = SessionLocal()
+        try:
+            node, vmid = job.target_labels
+            log_operation(db, JOB_OPERATION_NAMES[job.type], vmid, node, op_status, message, job.client_ip, task_id=job.id)
+        except Exception as e:
+            logger.error(f"记录作业 {job.id} 操作日志失败: {str(e)}")
+        finally:
+            db.close()
+
+    def check_cancelled(self, job: Job):
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+
+    def _wait_for_task(self, job: Job, node: str, task_id: str):
+        job.set_task(task_id)
+        status = wait_for_task(self.service, job, node, task_id)
+        if status.get('exitstatus') != 'OK':
+            raise Exception(f"任务 {task_id} 执行失败: {status.get('exitstatus')}")
+
+    def _recorded_task_succeeded(self, job: Job, node: str, task_id: str) -> bool:
+        try:
+            self._wait_for_task(job, node, task_id)
+            return True
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.info(f"作业 {job.id} 之前下发的任务 {task_id} 未成功，重新执行该阶段: {str(e)}")
+            return False
+
+    def _run_stage(self, job: Job, name: str, message: str, action: Callable[[], Optional[Tuple[str, str]]]):
+        stage = job.get_stage(name)
+        if stage['status'] in STAGE_COMPLETED_STATES:
+            # 恢复执行或重试时跳过已完成的阶段
+            return
+        self.check_cancelled(job)
+        task_id = stage.get('task_id')
+        job.begin_stage(name, message)
+        if task_id and self._recorded_task_succeeded(job, job.node, task_id):
+            job.end_stage(name)
+            return
+        outcome = action()
+        if outcome is None:
+            job.end_stage(name)
+        else:
+            job.end_stage(name, *outcome)
+
+    def _rebuild(self, job: Job) -> str:
+        data = ContainerRebuild.model_validate(job.payload)
+        node, vmid = job.node, job.vmid
+        logger.info(f"开始重建容器 {vmid} on {node}...")
+
+        def stop():
+            try:
+                status_info = self.service.get_container_status(node, vmid)
+            except Exception:
+                logger.info(f"容器 {vmid} 可能不存在或无法获取状态，继续执行删除。")
+                return 'skipped', None
+            if status_info['status'] != 'running':
+                return 'skipped', None
+            stop_result = self.service.stop_container(node, vmid)
+            if not stop_result['success']:
+                raise Exception(f"停止容器失败 - {stop_result['message']}")
+            self._wait_for_task(job, node, stop_result['task_id'])
+            logger.info(f"容器 {vmid} 已停止。")
+
+        def delete():
+            delete_result = self.service.delete_container(node, vmid)
+            if not delete_result['success']:
+                message = delete_result['message'].lower()
+                if 'does not exist' not in message and 'no such ct' not in message:
+                    raise Exception(f"删除容器失败 - {delete_result['message']}")
+                logger.warning(f"删除容器 {vmid} 时出现 'does not exist' 或类似错误，可能已被删除，继续执行创建。")
+                return 'skipped', delete_result['message']
+            self._wait_for_task(job, node, delete_result['task_id'])
+            logger.info(f"容器 {vmid} 已删除。")
+
+        def create():
+            create_data = ContainerCreate(
+                node=node,
+                vmid=int(vmid),
+                ostemplate=data.ostemplate,
+                hostname=data.hostname,
+                password=data.password,
+                cores=data.cores,
+                cpulimit=data.cpulimit,
+                memory=data.memory,
+                swap=data.swap,
+                storage=data.storage,
+                disk_size=data.disk_size,
+                network=NetworkInterface(**data.network.model_dump()),
+                nesting=data.nesting,
+                unprivileged=data.unprivileged,
+                start=False,
+                features=data.features,
+                console_mode=data.console_mode
+            )
+            create_result = self.service.create_container(create_data)
+            if not create_result['success']:
+                raise Exception(f"创建容器失败 - {create_result['message']}")
+            self._wait_for_task(job, node, create_result['task_id'])
+
+        def start():
+            if not data.start:
+                return 'skipped', None
+            if self.service.get_container_status(node, vmid)['status'] == 'running':
+                return 'skipped', '容器已在运行'
+            start_result = self.service.start_container(node, vmid)
+            if not start_result['success']:
+                raise Exception(f"启动容器失败 - {start_result['message']}")
+            self._wait_for_task(job, node, start_result['task_id'])
+
+        self._run_stage(job, STAGE_STOPPING, f'正在停止容器 {vmid}', stop)
+        self._run_stage(job, STAGE_DELETING, f'正在删除容器 {vmid}', delete)
+        self._run_stage(job, STAGE_CREATING, f'正在使用新配置创建容器 {vmid}', create)
+        self._run_stage(job, STAGE_STARTING, f'正在启动容器 {vmid}', start)
+
+        logger.info(f"容器 {vmid} 重建完成。")
+        return f'容器 {vmid} 重建完成'
+
+    def _create(self, job: Job) -> str:
+        data = ContainerCreate.model_validate(job.payload)
+
+        def create():
+            node = node_placer.assign(data.node, data.storage, data.memory, data.disk_size)
+            try:
+                if node != data.node:
+                    # 自动选点的结果写回作业，恢复执行时按实际节点等待创建任务
+                    data.node = node
+                    with job.lock:
+                        job.node = job.payload['node'] = node
+                        job._changed()
+                result = self.service.create_container(data)
+                if not result['success']:
+                    raise Exception(result['message'])
+                self._wait_for_task(job, data.node, result['task_id'])
+            finally:
+                node_placer.release(node)
+
+        self._run_stage(job, STAGE_CREATING, f'正在创建容器 {data.vmid}', create)
+        return f'容器 {data.vmid} 创建完成'
+
+    def _delete(self, job: Job) -> str:
+        def delete():
+            result = self.service.delete_container(job.node, job.vmid)
+            if not result['success']:
+                raise Exception(result['message'])
+            self._wait_for_task(job, job.node, result['task_id'])
+
+        self._run_stage(job, STAGE_DELETING, f'正在删除容器 {job.vmid}', delete)
+        return f'容器 {job.vmid} 删除完成'
+
+    def _nat_resync(self, job: Job) -> str:
+        outcome = {}
+
+        def resync():
+            db = SessionLocal()
+            try:
+                success, message, stats = nat_service.resync_all_iptables_rules(db)
+            finally:
+                db.close()
+            if not success:
+                raise Exception(message)
+            outcome['message'] = message
+
+        self._run_stage(job, STAGE_RESYNCING, '正在重新同步NAT规则', resync)
+        return outcome.get('message', 'NAT规则重新同步完成')
+
+    def get_metrics(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            counts = dict(db.query(models.Job.status, func.count(models.Job.id)).group_by(models.Job.status).all())
+        finally:
+            db.close()
+        with self._lock:
+            running_here = len(self._running)
+        return {
+            'workers': self.workers,
+            'running_in_process': running_here,
+            'by_status': counts
+        }
+
+
+job_manager = JobManager(proxmox_service, settings.job_workers)
@@ -0,0 +1,256 @@
+import datetime
+import gzip
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, or_, select
+
+from .config import settings
+from .database import engine
+from .models import OperationLog
+from .operation_logs import LOG_FILTER_FIELDS, decode_log_cursor, encode_log_cursor, log_to_dict, utc_naive, utcnow
+
+logger = logging.getLogger(__name__)
+
+# 归档目录结构：<LOG_ARCHIVE_DIR>/<YYYY-MM-DD>/part-<最小 id>-<最大 id>.jsonl.gz，按日志的 created_at（UTC）分区；
+# 分片内按 (created_at, id) 倒序存放，与查询顺序一致
+PART_SUFFIX = '.jsonl.gz'
+
+LogKey = Tuple[datetime.datetime, int]
+
+
+def _row_key(row: Dict[str, Any]) -> LogKey:
+    created_at = datetime.datetime.fromisoformat(row['created_at']) if row.get('created_at') else datetime.datetime.min
+    return created_at, row['id']
+
+
+def _write_part(directory: str, rows: List[Dict[str, Any]]) -> str:
+    os.makedirs(directory, exist_ok=True)
+    ids = [row['id'] for row in rows]
+    rows = sorted(rows, key=_row_key, reverse=True)
+    path = os.path.join(directory, f"part-{min(ids):012d}-{max(ids):012d}{PART_SUFFIX}")
+    tmp_path = f"{path}.tmp"
+    # 先写临时文件并落盘，再原子替换，中途退出不会留下不完整的归档
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as gz:
+            for row in rows:
+                gz.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_part(path: str) -> Iterator[Tuple[LogKey, Dict[str, Any]]]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            row = json.loads(line)
+            yield _row_key(row), row
+
+
+def _read_partition(directory: str) -> Iterator[Tuple[LogKey, Dict[str, Any]]]:
+    # 各分片已按 (created_at, id) 倒序，归并后整个分区仍为倒序；逐行解压，调用方取够一页即可停止读取
+    parts = [_read_part(os.path.join(directory, name)) for name in sorted(os.listdir(directory))
+             if name.endswith(PART_SUFFIX)]
+    last_id = None
+    for key, row in heapq.merge(*parts, key=lambda item: item[0], reverse=True):
+        # 归档后、删除前中断会在下次运行时重复归档同一行，重复的行归并后相邻，按 id 去重
+        if row['id'] == last_id:
+            continue
+        last_id = row['id']
+        yield key, row
+
+
+class LogRetention:
+    # 操作日志保留策略：超过 LOG_RETENTION_DAYS 天或超出 LOG_RETENTION_MAX_ROWS 条的旧日志，
+    # 按 id 顺序分块写入按日期分区的 gzip 归档，再分小批删除，每批之间让出数据库，避免长时间锁表
+
+    def __init__(self, archive_dir: str = None):
+        self.archive_dir = archive_dir or settings.log_archive_dir
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock()
+        self.archived = 0
+        self.deleted = 0
+        self.parts = 0
+        self.runs = 0
+        self.last_run_at: Optional[str] = None
+        self.last_run_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-retention", daemon=True)
+        self._thread.start()
+        logger.info(f"操作日志保留任务已启动，保留 {settings.log_retention_days} 天、最多 {settings.log_retention_max_rows or '不限'} 条，"
+                    f"归档目录 {self.archive_dir}")
+
+    def stop(self, timeout: float = 10.0):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"操作日志归档失败: {str(e)}")
+            self._stop.wait(settings.log_retention_interval)
+
+    def _conditions(self, conn) -> list:
+        conditions = []
+        if settings.log_retention_days > 0:
+            cutoff = utcnow() - datetime.timedelta(days=settings.log_retention_days)
+            conditions.append(OperationLog.created_at < cutoff)
+        if settings.log_retention_max_rows > 0:
+            # 第 max_rows+1 新的一行及更早的行超出条数上限
+            boundary = conn.execute(
+                select(OperationLog.id).order_by(OperationLog.id.desc()).offset(settings.log_retention_max_rows).limit(1)
+            ).scalar()
+            if boundary is not None:
+                conditions.append(OperationLog.id <= boundary)
+        return conditions
+
+    def run_once(self) -> Dict[str, int]:
+        # 可由后台线程周期调用，也可手动调用；同一时刻只有一次归档在运行
+        if not self._run_lock.acquire(blocking=False):
+            return {'archived': 0, 'deleted': 0}
+        started = time.perf_counter()
+        archived = deleted = 0
+        try:
+            with engine.connect() as conn:
+                conditions = self._conditions(conn)
+            if not conditions:
+                return {'archived': 0, 'deleted': 0}
+            last_id = 0
+            while not self._stop.is_set():
+                with engine.connect() as conn:
+                    chunk = conn.execute(
+                        select(OperationLog.__table__).where(or_(*conditions), OperationLog.id > last_id)
+                        .order_by(OperationLog.id).limit(settings.log_retention_chunk_size)
+                    ).all()
+                rows = [log_to_dict(row) for row in chunk]
+                if not rows:
+                    break
+                self._archive(rows)
+                archived += len(rows)
+                deleted += self._delete([row['id'] for row in rows])
+                last_id = rows[-1]['id']
+            if archived:
+                logger.info(f"已归档并删除 {archived} 条操作日志，耗时 {time.perf_counter() - started:.1f} 秒")
+            self.last_error = None
+            return {'archived': archived, 'deleted': deleted}
+        finally:
+            self.runs += 1
+            self.archived += archived
+            self.deleted += deleted
+            self.last_run_at = utcnow().isoformat()
+            self.last_run_seconds = time.perf_counter() - started
+            self._run_lock.release()
+
+    def _archive(self, rows: List[Dict[str, Any]]):
+        partitions: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            day = (row['created_at'] or '')[:10] or 'unknown'
+            partitions.setdefault(day, []).append(row)
+        for day, part in partitions.items():
+            _write_part(os.path.join(self.archive_dir, day), part)
+            self.parts += 1
+
+    def _delete(self, ids: List[int]) -> int:
+        deleted = 0
+        batch_size = settings.log_retention_delete_batch
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with engine.begin() as conn:
+                deleted += conn.execute(delete(OperationLog).where(OperationLog.id.in_(batch))).rowcount
+            # 每批删除之间短暂停顿，让日志写入与查询拿到数据库锁
+            if settings.log_retention_batch_pause > 0:
+                time.sleep(settings.log_retention_batch_pause)
+        return deleted
+
+    def _partitions(self, since: Optional[datetime.datetime], until: Optional[datetime.datetime]) -> Iterator[Tuple[str, str]]:
+        if not os.path.isdir(self.archive_dir):
+            return
+        first = since.date().isoformat() if since else None
+        last = until.date().isoformat() if until else None
+        for day in sorted(os.listdir(self.archive_dir), reverse=True):
+            if (first and day < first) or (last and day > last):
+                continue
+            directory = os.path.join(self.archive_dir, day)
+            if os.path.isdir(directory):
+                yield day, directory
+
+    def read_archive(
+        self,
+        filters: Dict[str, Optional[str]],
+        since: Optional[datetime.datetime] = None,
+        until: Optional[datetime.datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # 查询语义与 /logs 一致：按 (created_at, id) 倒序返回，游标格式相同；只读取时间范围内的日期分区
+        since = utc_naive(since) if since else None
+        until = utc_naive(until) if until else None
+        position = decode_log_cursor(cursor) if cursor else None
+        if position is not None and (until is None or position[0] < until):
+            until_partition = position[0]
+        else:
+            until_partition = until
+        matched: List[Dict[str, Any]] = []
+        for day, directory in self._partitions(since, until_partition):
+            for key, row in _read_partition(directory):
+                created_at = key[0]
+                if since and created_at < since:
+                    # 按倒序读取，之后的行都早于 since；早于 since 所在日期的分区不会被读取
+                    break
+                if row.get('created_at') is None or (until and created_at >= until):
+                    continue
+                if position is not None and key >= position:
+                    continue
+                if any(filters.get(field) is not None and row.get(field) != filters[field] for field in LOG_FILTER_FIELDS):
+                    continue
+                matched.append(row)
+                if len(matched) > limit:
+                    break
+            if len(matched) > limit:
+                break
+        next_cursor = None
+        if len(matched) > limit:
+            matched = matched[:limit]
+            last = matched[-1]
+            next_cursor = encode_log_cursor(datetime.datetime.fromisoformat(last['created_at']), last['id'])
+        return matched, next_cursor
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'retention_days': settings.log_retention_days,
+            'max_rows': settings.log_retention_max_rows,
+            'archive_dir': self.archive_dir,
+            'runs': self.runs,
+            'archived': self.archived,
+            'deleted': self.deleted,
+            'parts': self.parts,
+            'last_run_at': self.last_run_at,
+            'last_run_seconds': round(self.last_run_seconds, 2),
+            'last_error': self.last_error
+        }
+
+
+log_retention = LogRetention()
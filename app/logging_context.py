@@ -1,3 +1,6 @@
 from contextvars import ContextVar
 
 request_task_id_cv: ContextVar[str] = ContextVar("request_task_id_cv", default="NO_TASK_ID_SET")
+
+# 发起当前操作的调用方（客户端 IP），用于准入调度的公平排队
+request_client_cv: ContextVar[str] = ContextVar("request_client_cv", default="system")
@@ -4,6 +4,7 @@ from fastapi.responses import JSONResponse
 import logging
 from logging.handlers import TimedRotatingFileHandler
 import sys
+import asyncio
 import datetime
 import uuid
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -11,9 +12,16 @@ from starlette.requests import Request as StarletteRequest
 
 
 from .config import settings
-from .database import create_tables
+from .database import create_tables, dispose_async_engine
+from .concurrency import run_blocking, shutdown_executor
+from .inventory import inventory_poller
+from .task_stream import task_stream_hub
+from .jobs import job_manager
+from .audit import audit_writer
+from .log_retention import log_retention
+from .proxmox import proxmox_service
 from .api import router as api_router
-from .logging_context import request_task_id_cv
+from .logging_context import request_task_id_cv, request_client_cv
 
 
 class ContextVarFilter(logging.Filter):
@@ -56,6 +64,7 @@ app = FastAPI(
 class RequestContextLogMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: StarletteRequest, call_next: "RequestResponseCallNext"):
         token = request_task_id_cv.set(str(uuid.uuid4()))
+        client_token = request_client_cv.set(request.client.host)
         task_id_for_header_and_log = request_task_id_cv.get()
 
         logger.info(f"请求开始: {request.method} {request.url.path} 从 {request.client.host}")
@@ -66,6 +75,7 @@ class RequestContextLogMiddleware(BaseHTTPMiddleware):
         logger.info(f"请求完成: {request.method} {request.url.path} - 状态码 {response.status_code}")
 
         request_task_id_cv.reset(token)
+        request_client_cv.reset(client_token)
         return response
 
 app.add_middleware(RequestContextLogMiddleware)
@@ -87,16 +97,38 @@ async def global_exception_handler(request: FastAPIRequest, exc: Exception):
         content={"error": "服务器内部错误", "detail": str(exc), "task_id": request_id}
     )
 
+async def connect_proxmox_in_background():
+    try:
+        await run_blocking(proxmox_service.ensure_connected)
+    except Exception as e:
+        logger.warning(f"后台连接 Proxmox 失败，将在首次请求时重试: {str(e)}")
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("正在启动 LXC 管理 API 服务...")
     create_tables()
     logger.info("数据库表创建完成（或已存在）")
+    if settings.audit_async:
+        audit_writer.start()
+    job_manager.start()
+    if settings.log_retention_enabled:
+        log_retention.start()
+    app.state.proxmox_connect_task = asyncio.create_task(connect_proxmox_in_background())
+    if settings.inventory_poll_enabled:
+        await inventory_poller.start()
     logger.info(f"API 服务启动成功，请通过 http://<您的IP>:8000/docs 访问")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("LXC 管理 API 服务正在关闭...")
+    await inventory_poller.stop()
+    await task_stream_hub.stop()
+    job_manager.shutdown()
+    proxmox_service.stop_background_tasks()
+    log_retention.stop()
+    audit_writer.stop()
+    await dispose_async_engine()
+    shutdown_executor()
 
 @app.get("/", summary="服务状态检查", tags=["服务状态"])
 async def root():
@@ -113,10 +145,21 @@ async def health_check():
     return {
         "status": "健康",
         "service": "lxc-api",
+        "proxmox": proxmox_service.connection_state,
         "timestamp": datetime.datetime.now().isoformat(),
         "task_id": request_task_id_cv.get()
     }
 
+@app.get("/ready", summary="就绪检查", tags=["服务状态"])
+async def readiness_check():
+    connection = proxmox_service.get_connection_state()
+    if not connection["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "未就绪", "proxmox": connection, "task_id": request_task_id_cv.get()}
+        )
+    return {"status": "就绪", "proxmox": connection, "task_id": request_task_id_cv.get()}
+
 app.include_router(api_router, prefix="/api/v1")
 
 if __name__ == "__main__":
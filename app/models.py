@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -6,14 +6,24 @@ class OperationLog(Base):
     __tablename__ = "operation_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    operation = Column(String(50), index=True)
-    container_id = Column(String(20), index=True)
+    operation = Column(String(50))
+    container_id = Column(String(20))
     node_name = Column(String(50))
     status = Column(String(20))
     message = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     ip_address = Column(String(45))
-    task_id = Column(String(255), nullable=True, index=True)
+    task_id = Column(String(255), nullable=True)
+
+    # /logs 按 (created_at, id) 倒序键集分页；带等值过滤时走 (过滤列, created_at, id) 索引，无需额外排序
+    __table_args__ = (
+        Index('ix_operation_logs_created_at_id', 'created_at', 'id'),
+        Index('ix_operation_logs_container_id_created_at', 'container_id', 'created_at', 'id'),
+        Index('ix_operation_logs_node_name_created_at', 'node_name', 'created_at', 'id'),
+        Index('ix_operation_logs_operation_created_at', 'operation', 'created_at', 'id'),
+        Index('ix_operation_logs_status_created_at', 'status', 'created_at', 'id'),
+        Index('ix_operation_logs_task_id_created_at', 'task_id', 'created_at', 'id'),
+    )
 
 class NatRule(Base):
     __tablename__ = "nat_rules"
@@ -31,3 +41,29 @@ class NatRule(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
     __table_args__ = (UniqueConstraint('host_port', 'protocol', name='uq_host_port_protocol'),)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String(32), primary_key=True)
+    type = Column(String(30), nullable=False, index=True)
+    node = Column(String(50), index=True)
+    vmid = Column(String(20), index=True)
+    status = Column(String(20), nullable=False, index=True)
+    stage = Column(String(30), nullable=True)
+    message = Column(Text)
+    payload = Column(Text)
+    stages = Column(Text)
+    items = Column(Text, nullable=True)
+    task_id = Column(String(255), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=1, nullable=False)
+    next_run_at = Column(DateTime, index=True)
+    client_ip = Column(String(45))
+    created_at = Column(DateTime, index=True)
+    updated_at = Column(DateTime)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # 执行中作业的租约：领取的进程定期刷新 heartbeat_at，超时未刷新的作业才会被重新排队
+    owner = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
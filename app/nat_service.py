@@ -4,7 +4,8 @@ import logging
 import os
 from typing import Tuple, Optional, List, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import exc as sqlalchemy_exc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import exc as sqlalchemy_exc, func, select
 
 from . import models, schemas
 from .proxmox import proxmox_service
@@ -114,15 +115,41 @@ def check_host_port_conflict(db: Session, host_port: int, protocol: str, rule_id
         query = query.filter(models.NatRule.id != rule_id_to_exclude)
     return query.first() is not None
 
+# 只读查询的异步版本，供 API 路由在事件循环中直接 await；写操作需要调用 iptables，仍在线程池中使用同步会话
+async def get_nat_rule_by_id_async(db: AsyncSession, rule_id: int) -> Optional[models.NatRule]:
+    return await db.get(models.NatRule, rule_id)
+
+async def _list_nat_rules_async(db: AsyncSession, conditions: tuple, skip: int, limit: int) -> Tuple[List[models.NatRule], int]:
+    total = await db.scalar(select(func.count()).select_from(models.NatRule).where(*conditions))
+    rules = (await db.scalars(
+        select(models.NatRule).where(*conditions).order_by(models.NatRule.id.desc()).offset(skip).limit(limit)
+    )).all()
+    return list(rules), total
+
+async def get_nat_rules_for_container_async(db: AsyncSession, node: str, vmid: int, skip: int = 0, limit: int = 100) -> Tuple[List[models.NatRule], int]:
+    return await _list_nat_rules_async(db, (models.NatRule.node == node, models.NatRule.vmid == vmid), skip, limit)
+
+async def get_all_nat_rules_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> Tuple[List[models.NatRule], int]:
+    return await _list_nat_rules_async(db, (), skip, limit)
+
 def create_nat_rule(db: Session, node: str, vmid: int, rule_create: schemas.NatRuleCreate) -> Tuple[Optional[models.NatRule], str]:
     if check_host_port_conflict(db, rule_create.host_port, rule_create.protocol):
         return None, f"主机端口 {rule_create.host_port}/{rule_create.protocol} 已被占用。"
 
-    container_ip = proxmox_service.get_container_ip(node, vmid)
+    # 先取状态再取 IP：两者共用同一份缓存的容器配置，DHCP 场景也无需再次查询状态
+    try:
+        container_status_info = proxmox_service.get_container_status(node, str(vmid))
+    except Exception as e:
+        logger.warning(f"获取容器 {node}/{vmid} 状态失败: {e}")
+        container_status_info = None
+
+    container_ip = proxmox_service.get_container_ip(
+        node, vmid,
+        current_status=container_status_info.get('status') if container_status_info else None
+    )
     if not container_ip:
         return None, f"无法获取容器 {node}/{vmid} 的 IP 地址。请确保容器正在运行且已配置网络。"
 
-    container_status_info = proxmox_service.get_container_status(node, str(vmid))
     if not container_status_info or container_status_info.get('status') != 'running':
          return None, f"容器 {node}/{vmid} 未运行或无法获取状态，无法添加NAT规则。"
 
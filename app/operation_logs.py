@@ -0,0 +1,122 @@
+import base64
+import datetime
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Index, and_, inspect, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import OperationLog
+
+logger = logging.getLogger(__name__)
+
+# 可作为等值过滤条件的列，均有 (列, created_at, id) 组合索引
+LOG_FILTER_FIELDS = ('container_id', 'node_name', 'operation', 'status', 'task_id')
+
+# 旧版本的单列索引，已由组合索引覆盖
+LEGACY_LOG_INDEXES = {
+    'ix_operation_logs_operation': 'operation',
+    'ix_operation_logs_container_id': 'container_id',
+    'ix_operation_logs_task_id': 'task_id'
+}
+
+
+def utc_naive(value: datetime.datetime) -> datetime.datetime:
+    # 日志时间统一按不带时区的 UTC 存储与比较
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def encode_log_cursor(created_at: datetime.datetime, log_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), log_id]).encode()).decode().rstrip('=')
+
+
+def decode_log_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        created_at, log_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.datetime.fromisoformat(created_at), int(log_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+def query_operation_logs(
+    db: Session,
+    filters: Dict[str, Optional[str]],
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100
+) -> Tuple[List[OperationLog], Optional[str]]:
+    # 按 (created_at, id) 倒序的键集分页：游标为上一页最后一行的 (created_at, id)，
+    # 每页都从索引上的该位置继续扫描，翻页耗时与页码无关
+    query = db.query(OperationLog)
+    for field in LOG_FILTER_FIELDS:
+        value = filters.get(field)
+        if value is not None:
+            query = query.filter(getattr(OperationLog, field) == value)
+    if since is not None:
+        query = query.filter(OperationLog.created_at >= utc_naive(since))
+    if until is not None:
+        query = query.filter(OperationLog.created_at < utc_naive(until))
+    if cursor is not None:
+        created_at, log_id = decode_log_cursor(cursor)
+        # 写成 created_at <= c AND (created_at < c OR id < i)，使 created_at 上的范围条件可以直接走索引
+        query = query.filter(and_(
+            OperationLog.created_at <= created_at,
+            or_(OperationLog.created_at < created_at, OperationLog.id < log_id)
+        ))
+    # 多取一行用于判断是否还有下一页
+    rows = query.order_by(OperationLog.created_at.desc(), OperationLog.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_log_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def log_to_dict(log: OperationLog) -> Dict[str, Any]:
+    return {
+        'id': log.id,
+        'operation': log.operation,
+        'container_id': log.container_id,
+        'node_name': log.node_name,
+        'status': log.status,
+        'message': log.message,
+        'ip_address': log.ip_address,
+        'task_id': log.task_id,
+        'created_at': log.created_at.isoformat() if log.created_at else None
+    }
+
+
+def upgrade_operation_logs(bind: Engine):
+    # create_all 不会给已存在的表补建索引：旧库首次启动时补建组合索引并删除被覆盖的单列索引
+    table = OperationLog.__table__
+    existing = {index['name'] for index in inspect(bind).get_indexes(table.name)}
+    missing = [index for index in table.indexes if index.name not in existing]
+    if not missing:
+        return
+    with bind.begin() as conn:
+        if bind.dialect.name == 'sqlite':
+            # SQLite 以文本保存时间：旧版本由 CURRENT_TIMESTAMP 默认值写入的时间不带微秒，与应用写入的
+            # 'YYYY-MM-DD HH:MM:SS.ffffff' 按字符串比较时次序不一致，补齐后按 (created_at, id) 翻页才正确
+            padded = conn.exec_driver_sql(
+                f"UPDATE {table.name} SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+            ).rowcount
+            if padded:
+                logger.info(f"已将 {padded} 条操作日志的时间补齐到微秒精度")
+        for name, column in LEGACY_LOG_INDEXES.items():
+            if name in existing:
+                legacy = Index(name, table.c[column])
+                legacy.drop(conn)
+                # 构造 Index 时会挂到表定义上，删除后移除，避免之后的 create_all 再建回来
+                table.indexes.discard(legacy)
+        for index in missing:
+            index.create(conn)
+    logger.info(f"已为操作日志表补建索引: {', '.join(index.name for index in missing)}")
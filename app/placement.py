@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import settings
+from .inventory import inventory_poller, InventoryPoller, InventorySnapshot
+from .proxmox import proxmox_service, ProxmoxService
+
+logger = logging.getLogger(__name__)
+
+AUTO_NODE = 'auto'
+
+# 打分函数：(节点状态, 创建请求) -> 分数，越小越空闲；节点状态由快照预先整理，见 NodePlacer._build_index
+Scorer = Callable[[Dict[str, Any], Dict[str, Any]], float]
+
+
+def score_cpu(state: Dict[str, Any], request: Dict[str, Any]) -> float:
+    return state['cpu']
+
+
+def score_memory(state: Dict[str, Any], request: Dict[str, Any]) -> float:
+    # 尚未完成的创建按本次请求的内存估算，避免同一时刻的多个创建都落到同一节点
+    if not state['maxmem']:
+        return 0.0
+    return (state['mem'] + (state['pending'] + 1) * request['memory']) / state['maxmem']
+
+
+def score_storage(state: Dict[str, Any], request: Dict[str, Any]) -> float:
+    storage = state['storages'].get(request['storage'])
+    if storage is None or not storage['total']:
+        return 0.0
+    return 1 - (storage['free'] - (state['pending'] + 1) * request['disk']) / storage['total']
+
+
+def score_pending(state: Dict[str, Any], request: Dict[str, Any]) -> float:
+    return state['pending']
+
+
+class NodePlacer:
+    # node="auto" 时自动选择创建容器的目标节点：基于内存中的集群快照（CPU、内存、存储剩余）
+    # 与各节点尚未完成的创建数打分，按权重求和后取分数最低的节点；快照过期时才会重新请求 Proxmox
+
+    def __init__(self, service: ProxmoxService, inventory: InventoryPoller):
+        self.service = service
+        self.inventory = inventory
+        self.scorers: Dict[str, Scorer] = {
+            'cpu': score_cpu,
+            'memory': score_memory,
+            'storage': score_storage,
+            'pending': score_pending
+        }
+        self.weights: Dict[str, float] = dict(settings.placement_weights)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self._index_source: Optional[InventorySnapshot] = None
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self.decisions = 0
+        self.decision_seconds = 0.0
+
+    def register_scorer(self, name: str, scorer: Scorer, weight: float = None):
+        # 注册自定义打分项；权重未指定时沿用 PLACEMENT_WEIGHTS 中的同名配置，均未配置则为 1
+        with self._lock:
+            self.scorers[name] = scorer
+            if weight is not None:
+                self.weights[name] = weight
+            else:
+                self.weights.setdefault(name, 1.0)
+
+    def _snapshot(self) -> InventorySnapshot:
+        snapshot = self.inventory.last_snapshot
+        if snapshot is None or snapshot.age > settings.placement_max_staleness:
+            self.inventory.refresh()
+            snapshot = self.inventory.last_snapshot
+        if snapshot is None:
+            raise Exception("无法获取集群快照，不能自动选择节点")
+        return snapshot
+
+    @staticmethod
+    def _build_index(snapshot: InventorySnapshot) -> Dict[str, Dict[str, Any]]:
+        index = {
+            n['node']: {
+                'node': n['node'],
+                'cpu': n.get('cpu') or 0.0,
+                'mem': n.get('mem') or 0,
+                'maxmem': n.get('maxmem') or 0,
+                'storages': {}
+            }
+            for n in snapshot.nodes
+        }
+        for s in snapshot.storages:
+            state = index.get(s.get('node'))
+            if state is not None and s.get('storage'):
+                total = s.get('maxdisk') or 0
+                state['storages'][s['storage']] = {'free': total - (s.get('disk') or 0), 'total': total}
+        return index
+
+    def place(self, storage: str, memory: int, disk_size: int, candidates: Optional[List[str]] = None) -> str:
+        # 选中的节点计入待创建数，调用方须在创建结束后调用 release（或 release_when_done）
+        snapshot = self._snapshot()
+        request = {'storage': storage, 'memory': memory * 1024 * 1024, 'disk': disk_size * 1024 ** 3}
+        with self._lock:
+            started = time.perf_counter()
+            if snapshot is not self._index_source:
+                self._index = self._build_index(snapshot)
+                self._index_source = snapshot
+            known_storage = any(state['storages'] for state in self._index.values())
+            best, best_score = None, None
+            for name in candidates or self._index:
+                state = self._index.get(name)
+                if state is None:
+                    continue
+                storage_state = state['storages'].get(storage)
+                # 快照中有存储信息时，排除没有该存储或剩余空间不足的节点
+                if known_storage and (storage_state is None or storage_state['free'] < request['disk']):
+                    continue
+                if state['maxmem'] and state['maxmem'] - state['mem'] < request['memory']:
+                    continue
+                state['pending'] = self._pending.get(name, 0)
+                score = sum(weight * self.scorers[key](state, request)
+                            for key, weight in self.weights.items() if weight and key in self.scorers)
+                if best_score is None or score < best_score:
+                    best, best_score = name, score
+            if best is None:
+                raise Exception(f"没有满足资源要求的在线节点（存储 {storage}，内存 {memory}MB，磁盘 {disk_size}GB）")
+            self._pending[best] = self._pending.get(best, 0) + 1
+            self.decisions += 1
+            self.decision_seconds += time.perf_counter() - started
+        logger.info(f"自动选择节点 {best}（得分 {best_score:.3f}）")
+        return best
+
+    def assign(self, node: str, storage: str, memory: int, disk_size: int,
+               candidates: Optional[List[str]] = None) -> str:
+        if node == AUTO_NODE:
+            return self.place(storage, memory, disk_size, candidates)
+        self.reserve(node)
+        return node
+
+    def reserve(self, node: str):
+        # 指定了节点的创建同样计入待创建数，供后续的自动选择参考
+        with self._lock:
+            self._pending[node] = self._pending.get(node, 0) + 1
+
+    def release(self, node: str):
+        with self._lock:
+            if self._pending.get(node, 0) > 0:
+                self._pending[node] -= 1
+
+    def release_when_done(self, node: str, upid: Optional[str]):
+        if not upid:
+            self.release(node)
+            return
+        self.service.task_tracker.track(node, upid).add_done_callback(lambda _: self.release(node))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'weights': dict(self.weights),
+                'pending_by_node': {node: count for node, count in self._pending.items() if count},
+                'decisions': self.decisions,
+                'mean_decision_us': round(self.decision_seconds / self.decisions * 1e6, 1) if self.decisions else 0.0
+            }
+
+
+node_placer = NodePlacer(proxmox_service, inventory_poller)
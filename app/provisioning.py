@@ -0,0 +1,238 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Set
+
+from .config import settings
+from .jobs import Job, JobCancelled, job_manager, JobManager, wait_for_task
+from .placement import AUTO_NODE, node_placer, NodePlacer
+from .proxmox import proxmox_service, ProxmoxService
+from .schemas import ContainerBatchCreate, ContainerCreate
+
+logger = logging.getLogger(__name__)
+
+ITEM_PENDING = 'pending'
+ITEM_CREATING = 'creating'
+ITEM_SUCCEEDED = 'succeeded'
+ITEM_FAILED = 'failed'
+ITEM_CANCELLED = 'cancelled'
+
+
+class VmidAllocator:
+    # /cluster/nextid 在容器真正创建之前一直返回同一个 ID，并发创建时需在本地登记已预留的 ID，
+    # 直到创建任务结束后再释放
+
+    def __init__(self, service: ProxmoxService):
+        self.service = service
+        self._lock = threading.Lock()
+        self._reserved: Set[int] = set()
+
+    def reserve(self, count: int, requested: List[Optional[int]] = None) -> List[int]:
+        requested = requested or [None] * count
+        with self._lock:
+            used = {int(r['vmid']) for r in self.service.get_cluster_resources('vm') if r.get('vmid') is not None}
+            taken = used | self._reserved
+            fixed = [vmid for vmid in requested if vmid is not None]
+            for vmid in fixed:
+                if vmid in taken:
+                    raise Exception(f"VMID {vmid} 已被占用或已被预留")
+            taken.update(fixed)
+
+            candidate = int(self.service.get_next_vmid())
+            vmids = []
+            for vmid in requested:
+                if vmid is None:
+                    while candidate in taken:
+                        candidate += 1
+                    vmid = candidate
+                    taken.add(vmid)
+                vmids.append(vmid)
+            self._reserved.update(vmids)
+            return vmids
+
+    def hold(self, vmid: int):
+        # 恢复执行的条目沿用已记录的 VMID，重新登记以免被其他批量作业分配
+        with self._lock:
+            self._reserved.add(vmid)
+
+    def release(self, vmid: int):
+        with self._lock:
+            self._reserved.discard(vmid)
+
+    @property
+    def reserved(self) -> int:
+        with self._lock:
+            return len(self._reserved)
+
+
+class Provisioner:
+    # 批量创建容器：预留 VMID、按节点负载自动放置；每个节点与存储同时进行的创建任务数由 service.admission 统一限制
+
+    def __init__(self, service: ProxmoxService, jobs: JobManager, placer: NodePlacer):
+        self.service = service
+        self.jobs = jobs
+        self.placer = placer
+        self.allocator = VmidAllocator(service)
+
+    def submit(self, data: ContainerBatchCreate, client_ip: str = None) -> Dict[str, Any]:
+        specs = self._expand(data)
+        # 批量作业不对应单个节点或容器，node/vmid 列留空，各条目的节点与 VMID 记录在 items 中
+        job = Job('provision', None, None, (), client_ip, payload={'specs': specs, 'nodes': data.nodes})
+        job.items = [
+            {'index': i, 'node': spec.get('node'), 'vmid': spec.get('vmid'), 'hostname': spec['hostname'],
+             'status': ITEM_PENDING, 'task_id': None, 'message': None}
+            for i, spec in enumerate(specs)
+        ]
+        return self.jobs.submit(job, exclusive=False)
+
+    def _expand(self, data: ContainerBatchCreate) -> List[Dict[str, Any]]:
+        if (data.count is None) == (data.overrides is None):
+            raise ValueError("count 与 overrides 必须且只能指定一个")
+        base = data.template.model_dump(mode='json')
+        overrides = data.overrides if data.overrides is not None else [{} for _ in range(data.count)]
+        if len(overrides) > settings.bulk_max_items:
+            raise ValueError(f"单次最多创建 {settings.bulk_max_items} 个容器")
+        specs = []
+        for i, override in enumerate(overrides, start=1):
+            spec = {**base, 'hostname': f"{base['hostname']}-{i}", **override}
+            # 预先按 ContainerCreate 校验，避免字段错误在后台作业中才暴露
+            ContainerCreate.model_validate({**spec, 'node': spec.get('node') or "placeholder",
+                                            'vmid': spec.get('vmid') or 100})
+            specs.append(spec)
+        return specs
+
+    def _place(self, specs: List[Dict[str, Any]], nodes: Optional[List[str]]):
+        placed = []
+        try:
+            for spec in specs:
+                # 未指定节点的条目按负载自动选择；选择时计入其他批量作业尚未完成的创建
+                spec['node'] = self.placer.assign(spec.get('node') or AUTO_NODE, spec['storage'], spec['memory'],
+                                                  spec['disk_size'], nodes)
+                placed.append(spec['node'])
+        except Exception:
+            for node in placed:
+                self.placer.release(node)
+            raise
+
+    def run_batch(self, job: Job) -> str:
+        specs = job.payload['specs']
+        resumed, pinned, todo = [], [], []
+        for i, item in enumerate(job.items):
+            if item['status'] == ITEM_SUCCEEDED:
+                continue
+            spec = dict(specs[i])
+            if item['status'] == ITEM_CREATING and item.get('task_id'):
+                # 恢复执行：创建任务已下发，只需等待该任务结束
+                spec.update(node=item['node'], vmid=item['vmid'])
+                resumed.append((i, spec, item['task_id']))
+            elif item['status'] in (ITEM_PENDING, ITEM_CREATING) and item.get('node') and item.get('vmid') is not None \
+                    and job.attempts > 1:
+                # 条目进度按批写回，创建请求可能已下发但未来得及记下状态或任务 ID：沿用已记录的节点与 VMID，
+                # 避免以新的 VMID 再创建一个容器而使先前的容器无人管理
+                spec.update(node=item['node'], vmid=item['vmid'])
+                pinned.append((i, spec, None))
+            else:
+                # 尚未下发（或已失败）的条目重新放置并分配新的 VMID
+                job.update_item(i, status=ITEM_PENDING, task_id=None, node=spec.get('node'), vmid=spec.get('vmid'))
+                todo.append((i, spec, None))
+
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+        self._place([spec for _, spec, _ in todo], job.payload.get('nodes'))
+        try:
+            vmids = self.allocator.reserve(len(todo), [spec.get('vmid') for _, spec, _ in todo])
+        except Exception:
+            for _, spec, _ in todo:
+                self.placer.release(spec['node'])
+            raise
+        # 先把预留的节点与 VMID 写入作业，再下发创建，恢复执行时据此沿用
+        for (i, spec, _), vmid in zip(todo, vmids):
+            spec['vmid'] = vmid
+            job.update_item(i, node=spec['node'], vmid=vmid)
+        job.flush()
+        for _, spec, _ in resumed + pinned:
+            self.allocator.hold(spec['vmid'])
+            self.placer.reserve(spec['node'])
+        job.message = f'正在创建 {len(todo) + len(resumed) + len(pinned)} 个容器'
+
+        work = resumed + pinned + todo
+        pinned_indexes = {i for i, _, _ in pinned}
+        if work:
+            workers = min(len(work), settings.provision_max_parallel)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"provision-{job.id[:8]}") as executor:
+                for i, spec, task_id in work:
+                    # 复制上下文，使日志 task_id 与准入调度的调用方沿用作业的值
+                    executor.submit(contextvars.copy_context().run, self._create_one, job, i, spec, task_id,
+                                    i in pinned_indexes)
+        job.flush()
+
+        progress = job.progress
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+        failed = progress.get(ITEM_FAILED, 0)
+        if failed:
+            raise Exception(f"{failed} 个容器创建失败，{progress.get(ITEM_SUCCEEDED, 0)} 个成功")
+        return f"{len(specs)} 个容器全部创建完成"
+
+    def _create_one(self, job: Job, index: int, spec: Dict[str, Any], task_id: Optional[str] = None,
+                    pinned: bool = False):
+        node, vmid = spec['node'], spec['vmid']
+        try:
+            if task_id is None:
+                if job.cancel_event.is_set():
+                    job.update_item(index, status=ITEM_CANCELLED, message='作业已取消')
+                    return
+                if pinned and self._created_before_resume(job, node, vmid, spec['hostname']):
+                    job.update_item(index, status=ITEM_SUCCEEDED, message=f'容器 {vmid} 已在作业中断前创建完成')
+                    return
+                job.update_item(index, status=ITEM_CREATING)
+                result = self.service.create_container(ContainerCreate(**spec))
+                if not result['success']:
+                    job.update_item(index, status=ITEM_FAILED, message=result['message'])
+                    return
+                task_id = result['task_id']
+                job.update_item(index, task_id=task_id)
+            status = wait_for_task(self.service, job, node, task_id)
+            if status.get('exitstatus') == 'OK':
+                job.update_item(index, status=ITEM_SUCCEEDED, message=f'容器 {vmid} 创建完成')
+            else:
+                job.update_item(index, status=ITEM_FAILED, message=f"创建任务失败: {status.get('exitstatus')}")
+        except JobCancelled:
+            job.update_item(index, status=ITEM_CANCELLED, message=f'作业已取消，已中止容器 {vmid} 的创建任务')
+        except FutureTimeoutError:
+            job.update_item(index, status=ITEM_FAILED, message=f'等待容器 {vmid} 创建任务超时')
+        except Exception as e:
+            logger.error(f"批量创建容器 {vmid} 失败: {str(e)}")
+            job.update_item(index, status=ITEM_FAILED, message=str(e))
+        finally:
+            self.allocator.release(vmid)
+            self.placer.release(node)
+
+    def _created_before_resume(self, job: Job, node: str, vmid: int, hostname: str) -> bool:
+        # 获取不到配置说明容器不存在（或创建失败后已被清理），按原 VMID 重新创建；
+        # 容器存在且带有 create 锁时创建仍在进行，等待锁释放
+        deadline = time.monotonic() + settings.job_stage_timeout
+        while True:
+            try:
+                config = self.service.get_container_config(node, vmid, max_age=0)['config']
+            except Exception:
+                return False
+            if config.get('lock') != 'create':
+                if config.get('hostname') not in (None, hostname):
+                    # 中断期间 VMID 的预留已丢失，已被其他容器占用
+                    raise Exception(f"VMID {vmid} 已被容器 {config.get('hostname')} 占用")
+                return True
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            if time.monotonic() >= deadline:
+                raise FutureTimeoutError()
+            time.sleep(settings.job_cancel_check_interval)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {'reserved_vmids': self.allocator.reserved}
+
+
+provisioner = Provisioner(proxmox_service, job_manager, node_placer)
+job_manager.register('provision', provisioner.run_batch)
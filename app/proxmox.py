@@ -1,87 +1,453 @@
 from proxmoxer import ProxmoxAPI
-from proxmoxer.core import AuthenticationError
+from proxmoxer.core import AuthenticationError, ResourceException
 from .config import settings
-from .schemas import ContainerCreate, ContainerRebuild, NetworkInterface, ConsoleMode
-from typing import List, Dict, Any, Optional
+from .cache import TTLCache
+from .concurrency import SingleFlight
+from .tasks import TaskTracker
+from .admission import AdmissionScheduler, AdmissionTimeout
+from .schemas import ContainerCreate, ConsoleMode
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from itertools import groupby
 import logging
+import socket
 import urllib3
 import time
 import ipaddress
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
 
+
+class KeepAliveAdapter(HTTPAdapter):
+    # 为连接池中的 socket 开启 TCP keep-alive，避免空闲连接被中间设备静默断开
+
+    def init_poolmanager(self, *args, **kwargs):
+        if settings.proxmox_tcp_keepalive:
+            socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, settings.proxmox_keepalive_idle))
+            if hasattr(socket, "TCP_KEEPINTVL"):
+                socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, settings.proxmox_keepalive_interval))
+            kwargs["socket_options"] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
 class ProxmoxService:
+    STATE_DISCONNECTED = "disconnected"
+    STATE_CONNECTING = "connecting"
+    STATE_READY = "ready"
+    STATE_FAILED = "failed"
+
     def __init__(self):
-        self.proxmox = None
-        self._connect()
+        # 不在导入时登录：首次使用时再连接，或由启动钩子在后台连接
+        self._proxmox = None
+        self.connection_state = self.STATE_DISCONNECTED
+        self.last_connect_error: Optional[str] = None
+        self._last_connect_failure = 0.0
+        self._session: Optional[requests.Session] = None
+        self._adapter: Optional[HTTPAdapter] = None
+        self._fanout_executor = ThreadPoolExecutor(
+            max_workers=settings.proxmox_node_concurrency,
+            thread_name_prefix="pve-fanout"
+        )
+        self.resource_cache = TTLCache(maxsize=settings.cache_max_entries)
+        self.config_cache = TTLCache(maxsize=settings.config_cache_max_entries, default_ttl=settings.config_cache_retention)
+        self._read_flight = SingleFlight()
+        self._mutation_listeners: List[Callable[[str, Optional[str]], None]] = []
+        self.on_container_mutation(self._invalidate_node_resources)
+        self.on_container_mutation(self._invalidate_container_config)
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+        self.login_count = 0
+        self.ticket_refresh_count = 0
+        self._refresher_stop = threading.Event()
+        self._refresher_thread: Optional[threading.Thread] = None
+        self.task_tracker = TaskTracker(self)
+        self.admission = AdmissionScheduler(self)
+
+    @property
+    def proxmox(self):
+        if self._proxmox is None:
+            self.ensure_connected()
+        return self._proxmox
+
+    @property
+    def is_ready(self) -> bool:
+        return self._proxmox is not None
+
+    def ensure_connected(self):
+        if self._proxmox is not None:
+            return self._proxmox
+        with self._login_lock:
+            if self._proxmox is None:
+                # 最近刚连接失败时直接返回错误，避免每个请求都等待一次连接超时
+                since_failure = time.monotonic() - self._last_connect_failure
+                if self.last_connect_error and since_failure < settings.proxmox_connect_retry_interval:
+                    raise Exception(f"无法连接到 Proxmox 服务器: {self.last_connect_error}")
+                self._connect()
+        return self._proxmox
+
+    def get_connection_state(self) -> Dict[str, Any]:
+        return {
+            'state': self.connection_state,
+            'ready': self.is_ready,
+            'error': self.last_connect_error
+        }
 
     def _connect(self):
+        if self._proxmox is None:
+            self.connection_state = self.STATE_CONNECTING
         try:
-            self.proxmox = ProxmoxAPI(
+            if self.uses_api_token:
+                credentials = {
+                    'token_name': settings.proxmox_token_name,
+                    'token_value': settings.proxmox_token_value
+                }
+            else:
+                credentials = {'password': settings.proxmox_password}
+            proxmox = ProxmoxAPI(
                 settings.proxmox_host,
                 port=settings.proxmox_port,
                 user=settings.proxmox_user,
-                password=settings.proxmox_password,
-                verify_ssl=False
+                verify_ssl=False,
+                timeout=(settings.proxmox_connect_timeout, settings.proxmox_read_timeout),
+                **credentials
             )
-            logger.info("成功连接到 Proxmox 服务器")
+            self._attach_pooled_session(proxmox)
+            self._proxmox = proxmox
+            self.connection_state = self.STATE_READY
+            self.last_connect_error = None
+            self._login_generation += 1
+            self.login_count += 1
+            if not self.uses_api_token:
+                self._start_ticket_refresher()
+            logger.info("成功连接到 Proxmox 服务器" + (" (API Token 认证)" if self.uses_api_token else ""))
         except Exception as e:
             logger.error(f"连接 Proxmox 服务器失败: {str(e)}")
+            self.last_connect_error = str(e)
+            self._last_connect_failure = time.monotonic()
+            if self._proxmox is None:
+                self.connection_state = self.STATE_FAILED
             raise Exception(f"无法连接到 Proxmox 服务器: {str(e)}")
 
+    @property
+    def uses_api_token(self) -> bool:
+        return bool(settings.proxmox_token_name and settings.proxmox_token_value)
+
+    def _ticket_auth(self):
+        backend = getattr(self._proxmox, '_backend', None)
+        auth = getattr(backend, 'auth', None)
+        if auth is None or not hasattr(auth, 'birth_time'):
+            return None
+        return auth
+
+    def _relogin(self, seen_generation: int):
+        # 同一时刻只允许一次重新登录；若等待期间其他线程已完成登录，则直接复用新票据
+        with self._login_lock:
+            if self._login_generation != seen_generation:
+                return
+            self._connect()
+
+    def refresh_ticket(self, force: bool = False) -> bool:
+        auth = self._ticket_auth()
+        if auth is None:
+            return False
+        if not force and time.monotonic() - auth.birth_time < settings.proxmox_ticket_refresh_age:
+            return False
+        with self._login_lock:
+            auth = self._ticket_auth()
+            if auth is None or (not force and time.monotonic() - auth.birth_time < settings.proxmox_ticket_refresh_age):
+                return False
+            try:
+                # 用仍有效的旧票据换取新票据，无需再次提交密码
+                auth._get_new_tokens()
+                self.ticket_refresh_count += 1
+                logger.info("Proxmox 访问票据已提前续期")
+            except Exception as e:
+                logger.warning(f"续期 Proxmox 票据失败，改为重新登录: {str(e)}")
+                self._connect()
+        return True
+
+    def _start_ticket_refresher(self):
+        if self._refresher_thread is not None and self._refresher_thread.is_alive():
+            return
+        self._refresher_stop.clear()
+        self._refresher_thread = threading.Thread(target=self._ticket_refresh_loop, name="pve-ticket-refresher", daemon=True)
+        self._refresher_thread.start()
+
+    def _ticket_refresh_loop(self):
+        while not self._refresher_stop.wait(settings.proxmox_ticket_check_interval):
+            try:
+                self.refresh_ticket()
+            except Exception as e:
+                logger.error(f"后台续期 Proxmox 票据失败: {str(e)}")
+
+    def stop_background_tasks(self):
+        self._refresher_stop.set()
+        self.task_tracker.stop()
+
+    def get_auth_stats(self) -> Dict[str, Any]:
+        auth = self._ticket_auth()
+        return {
+            'mode': 'token' if self.uses_api_token else 'password',
+            'ticket_age': round(time.monotonic() - auth.birth_time, 1) if auth is not None else None,
+            'logins': self.login_count,
+            'ticket_refreshes': self.ticket_refresh_count
+        }
+
+    def _attach_pooled_session(self, proxmox):
+        # 重新登录只替换认证信息，沿用同一个 Session 及其连接池中已完成 TLS 握手的连接
+        store = getattr(proxmox, '_store', None)
+        new_session = store.get('session') if isinstance(store, dict) else None
+        if not isinstance(new_session, requests.Session):
+            return
+        if self._session is None:
+            self._adapter = KeepAliveAdapter(
+                pool_connections=settings.proxmox_pool_connections,
+                pool_maxsize=settings.proxmox_pool_maxsize
+            )
+            new_session.mount("https://", self._adapter)
+            self._session = new_session
+        else:
+            self._session.auth = new_session.auth
+            self._session.cookies.clear()
+            store['session'] = self._session
+            new_session.close()
+
+    def get_connection_stats(self) -> Dict[str, Any]:
+        if self._adapter is None:
+            return {'new_connections': 0, 'requests': 0, 'reused_connections': 0, 'reuse_ratio': 0.0}
+        pools = self._adapter.poolmanager.pools
+        connection_pools = [pools[key] for key in pools.keys()]
+        new_connections = sum(getattr(pool, 'num_connections', 0) for pool in connection_pools)
+        total_requests = sum(getattr(pool, 'num_requests', 0) for pool in connection_pools)
+        reused = max(total_requests - new_connections, 0)
+        return {
+            'new_connections': new_connections,
+            'requests': total_requests,
+            'reused_connections': reused,
+            'reuse_ratio': round(reused / total_requests, 4) if total_requests else 0.0
+        }
+
     def _call_proxmox_api(self, api_call_func, *args, **kwargs):
+        key = self._coalesce_key(api_call_func, args, kwargs) if settings.proxmox_coalesce_reads else None
+        if key is None:
+            return self._call_with_reauth(api_call_func, *args, **kwargs)
+        return self._read_flight.do(key, self._call_with_reauth, api_call_func, *args, **kwargs)
+
+    def _call_admitted(self, node: str, storage: Optional[str], api_call_func, *args,
+                       admission_timeout: Optional[float] = None, **kwargs):
+        # 变更操作先排队取得节点与存储的配额，配额占用到返回的任务结束为止
+        ticket = self.admission.acquire(node, storage, admission_timeout)
+        try:
+            upid = self._call_proxmox_api(api_call_func, *args, **kwargs)
+        except BaseException:
+            self.admission.release(ticket)
+            raise
+        self.admission.hold(ticket, upid)
+        return upid
+
+    @staticmethod
+    def _coalesce_key(api_call_func, args, kwargs) -> Optional[Tuple]:
+        # 只合并 GET；POST/PUT/DELETE 等变更操作每次都必须真实发出
+        if getattr(api_call_func, '__name__', None) != 'get':
+            return None
+        store = getattr(getattr(api_call_func, '__self__', None), '_store', None)
+        if not isinstance(store, dict) or not store.get('base_url'):
+            return None
+        key = (store['base_url'], args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _call_with_reauth(self, api_call_func, *args, **kwargs):
+        login_generation = self._login_generation
         try:
             return api_call_func(*args, **kwargs)
         except AuthenticationError as auth_err:
             logger.warning(f"Proxmox API 认证失败: {str(auth_err)}. 尝试重新连接...")
-            self._connect()
+            self._relogin(login_generation)
             logger.info("重新连接 Proxmox 成功，重试 API 调用...")
             return api_call_func(*args, **kwargs)
         except Exception as e:
-            error_message = str(e).lower()
-            if "authentication failed" in error_message or \
-               "couldn't authenticate user" in error_message or \
-               "401 unauthorized" in error_message or \
-               "login failed" in error_message or \
-               "ticket" in error_message:
+            if self._is_auth_failure(e):
                 logger.warning(f"Proxmox API 调用因疑似认证/票据问题失败: {str(e)}. 尝试重新连接...")
-                self._connect()
+                self._relogin(login_generation)
                 logger.info("重新连接 Proxmox 成功，重试 API 调用...")
                 return api_call_func(*args, **kwargs)
             else:
                 raise
 
-    def get_nodes(self) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _is_auth_failure(error: Exception) -> bool:
+        if isinstance(error, ResourceException):
+            return error.status_code == 401
+        error_message = str(error).lower()
+        return "authentication failed" in error_message or \
+               "couldn't authenticate user" in error_message or \
+               "401 unauthorized" in error_message or \
+               "login failed" in error_message or \
+               "ticket" in error_message
+
+    def on_container_mutation(self, callback: Callable[[str, Optional[str]], None]):
+        self._mutation_listeners.append(callback)
+
+    def _container_mutated(self, node: str, vmid: Optional[str] = None):
+        for callback in self._mutation_listeners:
+            try:
+                callback(node, vmid)
+            except Exception as e:
+                logger.warning(f"容器变更回调执行失败 ({node}/{vmid}): {str(e)}")
+
+    def _invalidate_node_resources(self, node: str, vmid: Optional[str] = None):
+        # 创建/删除/重建会改变节点内存与存储用量，模板列表也可能随存储变化
+        self.resource_cache.invalidate(('nodes',))
+        self.resource_cache.invalidate(('storages', node))
+        self.resource_cache.invalidate(('templates', node))
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'resource_cache': self.resource_cache.stats(),
+            'config_cache': self.config_cache.stats(),
+            'read_coalescing': self._read_flight.stats(),
+            'connections': self.get_connection_stats(),
+            'auth': self.get_auth_stats(),
+            'connection_state': self.get_connection_state(),
+            'task_tracker': self.task_tracker.get_metrics(),
+            'admission': self.admission.get_metrics()
+        }
+
+    def get_nodes(self, use_cache: bool = True) -> List[Dict[str, Any]]:
         try:
-            nodes = self._call_proxmox_api(self.proxmox.nodes.get)
-            return [node for node in nodes if node.get('status') == 'online']
+            return self.resource_cache.get_or_load(
+                ('nodes',), self._fetch_online_nodes,
+                ttl=settings.cache_ttl_nodes, bypass=not use_cache
+            )
         except Exception as e:
             logger.error(f"获取节点列表失败: {str(e)}")
             raise Exception(f"获取节点列表失败: {str(e)}")
 
-    def get_containers(self, node: str = None) -> List[Dict[str, Any]]:
-        try:
-            containers = []
-            nodes_data = self.get_nodes()
-            nodes_to_check = [node] if node else [n['node'] for n in nodes_data]
+    def _fetch_online_nodes(self) -> List[Dict[str, Any]]:
+        nodes = self._call_proxmox_api(self.proxmox.nodes.get)
+        return [node for node in nodes if node.get('status') == 'online']
+
+    def get_containers(self, node: str = None, mode: str = None) -> List[Dict[str, Any]]:
+        containers, _ = self.get_containers_with_errors(node, mode)
+        return containers
 
-            for node_name in nodes_to_check:
-                node_containers = self._call_proxmox_api(self.proxmox.nodes(node_name).lxc.get)
-                for container in node_containers:
-                    container['node'] = node_name
-                    containers.append(container)
+    def get_containers_with_errors(self, node: str = None, mode: str = None) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        by_node: Dict[str, List[Dict[str, Any]]] = {}
+        errors = {}
+        for node_name, node_containers, error in self.iter_containers(node, mode):
+            if error is not None:
+                errors[node_name] = error
+            else:
+                by_node[node_name] = node_containers
+        containers = [c for node_name in sorted(by_node) for c in by_node[node_name]]
+
+        if errors:
+            error_summary = "; ".join(f"{node_name}: {error}" for node_name, error in errors.items())
+            if not by_node:
+                logger.error(f"获取容器列表失败: {error_summary}")
+                raise Exception(f"获取容器列表失败: {error_summary}")
+            logger.warning(f"部分节点获取容器列表失败: {error_summary}")
+        return containers, errors
+
+    def iter_containers(self, node: str = None, mode: str = None) -> Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]:
+        # 按节点产出 (节点, 容器列表, 错误信息)，按节点查询时按完成先后产出，供流式接口边取边写
+        if (mode or settings.container_list_mode) == "cluster":
+            try:
+                containers = self._get_cluster_containers(node)
+            except Exception as e:
+                logger.warning(f"通过 /cluster/resources 获取容器列表失败，回退到按节点查询: {str(e)}")
+            else:
+                for node_name, group in groupby(containers, key=lambda c: c['node']):
+                    yield node_name, list(group), None
+                return
 
-            return containers
+        try:
+            if node:
+                nodes_to_check = [node]
+            else:
+                nodes_to_check = sorted(n['node'] for n in self.get_nodes())
         except Exception as e:
             logger.error(f"获取容器列表失败: {str(e)}")
             raise Exception(f"获取容器列表失败: {str(e)}")
 
+        futures = {
+            self._fanout_executor.submit(self._get_node_containers, node_name): node_name
+            for node_name in nodes_to_check
+        }
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=settings.proxmox_node_timeout):
+                pending.discard(future)
+                if future.exception() is not None:
+                    yield futures[future], [], str(future.exception())
+                else:
+                    yield futures[future], future.result(), None
+        except FutureTimeoutError:
+            for future in sorted(pending, key=futures.get):
+                if future.done() and future.exception() is None:
+                    yield futures[future], future.result(), None
+                else:
+                    future.cancel()
+                    yield futures[future], [], f"请求超时 (>{settings.proxmox_node_timeout}秒)"
+
+    def _get_cluster_containers(self, node: str = None) -> List[Dict[str, Any]]:
+        resources = self.get_cluster_resources('vm')
+        return self.containers_from_resources(resources, node)
+
+    def get_cluster_resources(self, resource_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        if resource_type:
+            return self._call_proxmox_api(self.proxmox.cluster.resources.get, type=resource_type)
+        return self._call_proxmox_api(self.proxmox.cluster.resources.get)
+
+    def get_next_vmid(self, vmid: Optional[int] = None) -> int:
+        if vmid is not None:
+            return int(self._call_proxmox_api(self.proxmox.cluster.nextid.get, vmid=vmid))
+        return int(self._call_proxmox_api(self.proxmox.cluster.nextid.get))
+
+    @staticmethod
+    def containers_from_resources(resources: List[Dict[str, Any]], node: str = None) -> List[Dict[str, Any]]:
+        containers = []
+        for resource in resources:
+            # type=vm 同时返回 qemu 与 lxc；离线节点上的容器状态为 unknown，与按节点查询时一样跳过
+            if resource.get('type') != 'lxc' or resource.get('status') == 'unknown':
+                continue
+            if node and resource.get('node') != node:
+                continue
+            containers.append({
+                'vmid': resource.get('vmid'),
+                'name': resource.get('name'),
+                'status': resource.get('status'),
+                'node': resource.get('node'),
+                'cpu': resource.get('cpu', 0),
+                'mem': resource.get('mem', 0),
+                'maxmem': resource.get('maxmem', 0),
+                'uptime': resource.get('uptime', 0),
+                'template': resource.get('template', 0)
+            })
+        return sorted(containers, key=lambda c: (c['node'], int(c['vmid'])))
+
+    def _get_node_containers(self, node_name: str) -> List[Dict[str, Any]]:
+        node_containers = self._call_proxmox_api(self.proxmox.nodes(node_name).lxc.get)
+        for container in node_containers:
+            container['node'] = node_name
+        return sorted(node_containers, key=lambda c: int(c.get('vmid', 0)))
+
     def get_container_status(self, node: str, vmid: str) -> Dict[str, Any]:
         try:
             status = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).status.current.get)
-            config = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).config.get)
+            config = self.get_container_config(node, vmid)['config']
 
             result = {
                 'vmid': vmid,
@@ -100,42 +466,77 @@ class ProxmoxService:
             logger.error(f"获取容器 {vmid} 状态失败: {str(e)}")
             raise Exception(f"获取容器状态失败: {str(e)}")
 
-    def get_container_ip(self, node: str, vmid: str, interface_name: str = "eth0") -> Optional[str]:
+    def get_container_config(self, node: str, vmid: str, max_age: Optional[float] = None) -> Dict[str, Any]:
+        # 短时间窗口内直接复用缓存；过期后重新获取，若 digest 未变则沿用已解析的网络配置
+        key = (node, str(vmid))
+        max_age = settings.config_cache_ttl if max_age is None else max_age
+        entry = self.config_cache.get(key)
+        now = time.monotonic()
+        if entry and now - entry['fetched_at'] <= max_age:
+            return entry
+
+        config = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).config.get)
+        digest = config.get('digest')
+        if entry and digest and entry['digest'] == digest:
+            entry = dict(entry, fetched_at=now)
+        else:
+            entry = {
+                'digest': digest,
+                'config': config,
+                'interfaces': self._parse_net_interfaces(config),
+                'fetched_at': now
+            }
+        self.config_cache.set(key, entry)
+        return entry
+
+    @staticmethod
+    def _parse_net_interfaces(config: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+        interfaces = {}
+        for key, value in config.items():
+            if key.startswith("net") and isinstance(value, str):
+                net_details = {}
+                for part in value.split(','):
+                    if '=' in part:
+                        k, v = part.split('=', 1)
+                        net_details[k.strip()] = v.strip()
+                if "name" in net_details:
+                    interfaces.setdefault(net_details["name"], net_details)
+        return interfaces
+
+    def _invalidate_container_config(self, node: str, vmid: Optional[str] = None):
+        if vmid is None:
+            self.config_cache.invalidate_where(lambda key: key[0] == node)
+        else:
+            self.config_cache.invalidate((node, str(vmid)))
+
+    def get_container_ip(self, node: str, vmid: str, interface_name: str = "eth0",
+                         current_status: Optional[str] = None) -> Optional[str]:
         try:
-            config = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).config.get)
-            for key, value in config.items():
-                if key.startswith("net") and isinstance(value, str):
-                    net_details = {}
-                    parts = value.split(',')
-                    for part in parts:
-                        if '=' in part:
-                            k, v = part.split('=', 1)
-                            net_details[k.strip()] = v.strip()
-                    
-                    if net_details.get("name") == interface_name:
-                        if "ip" in net_details:
-                            ip_config = net_details["ip"]
-                            if ip_config.lower() == "dhcp":
-
-                                current_status = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).status.current.get)
-                                if current_status.get("status") != "running":
-                                    logger.warning(f"容器 {vmid} ({node}) 未运行，无法通过 agent 获取DHCP IP。")
-                                    return None
-                                try:
-                                    interfaces_info = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).agent.get("network-get-interfaces"))
-                                    if interfaces_info and "result" in interfaces_info:
-                                        for iface in interfaces_info["result"]:
-                                            if iface.get("name") == interface_name and "ip-addresses" in iface:
-                                                for ip_info in iface["ip-addresses"]:
-                                                    if ip_info.get("ip-address-type") == "ipv4":
-                                                        return str(ipaddress.ip_address(ip_info["ip-address"]))
-                                except Exception as agent_e:
-                                    logger.warning(f"通过 agent 获取容器 {vmid} IP 地址失败: {agent_e}")
-                                return None # DHCP, but couldn't get from agent
-                            else: # Static IP
-                                ip_with_cidr = ip_config.split('/')[0]
-                                return str(ipaddress.ip_address(ip_with_cidr))
-            return None
+            net_details = self.get_container_config(node, vmid)['interfaces'].get(interface_name)
+            if not net_details or "ip" not in net_details:
+                return None
+
+            ip_config = net_details["ip"]
+            if ip_config.lower() != "dhcp":
+                ip_with_cidr = ip_config.split('/')[0]
+                return str(ipaddress.ip_address(ip_with_cidr))
+
+            if current_status is None:
+                current_status = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).status.current.get).get("status")
+            if current_status != "running":
+                logger.warning(f"容器 {vmid} ({node}) 未运行，无法通过 agent 获取DHCP IP。")
+                return None
+            try:
+                interfaces_info = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).agent.get("network-get-interfaces"))
+                if interfaces_info and "result" in interfaces_info:
+                    for iface in interfaces_info["result"]:
+                        if iface.get("name") == interface_name and "ip-addresses" in iface:
+                            for ip_info in iface["ip-addresses"]:
+                                if ip_info.get("ip-address-type") == "ipv4":
+                                    return str(ipaddress.ip_address(ip_info["ip-address"]))
+            except Exception as agent_e:
+                logger.warning(f"通过 agent 获取容器 {vmid} IP 地址失败: {agent_e}")
+            return None # DHCP, but couldn't get from agent
         except Exception as e:
             logger.error(f"获取容器 {vmid} ({node}) IP 地址失败: {str(e)}")
             return None
@@ -201,7 +602,18 @@ class ProxmoxService:
                 'message': f'重启容器失败: {str(e)}'
             }
 
-    def create_container(self, data: ContainerCreate) -> Dict[str, Any]:
+    def run_power_action(self, node: str, vmid: str, action: str) -> Dict[str, Any]:
+        handler = {
+            'start': self.start_container,
+            'stop': self.stop_container,
+            'shutdown': self.shutdown_container,
+            'reboot': self.reboot_container
+        }.get(action)
+        if handler is None:
+            return {'success': False, 'message': f'不支持的电源操作: {action}'}
+        return handler(node, vmid)
+
+    def create_container(self, data: ContainerCreate, admission_timeout: Optional[float] = None) -> Dict[str, Any]:
         try:
             node = data.node
             vmid = data.vmid
@@ -248,7 +660,9 @@ class ProxmoxService:
                 params['tty'] = 2
 
 
-            result = self._call_proxmox_api(self.proxmox.nodes(node).lxc.post, **params)
+            result = self._call_admitted(node, data.storage, self.proxmox.nodes(node).lxc.post,
+                                         admission_timeout=admission_timeout, **params)
+            self._container_mutated(node, str(vmid))
 
             return {
                 'success': True,
@@ -256,6 +670,13 @@ class ProxmoxService:
                 'task_id': result
             }
 
+        except AdmissionTimeout as e:
+            logger.warning(f"创建容器 {vmid} 未能取得操作配额: {str(e)}")
+            return {
+                'success': False,
+                'message': f'创建容器失败: {str(e)}',
+                'busy': True
+            }
         except Exception as e:
             logger.error(f"创建容器 {vmid} 失败: {str(e)}")
             return {
@@ -263,111 +684,36 @@ class ProxmoxService:
                 'message': f'创建容器失败: {str(e)}'
             }
 
-    def delete_container(self, node: str, vmid: str) -> Dict[str, Any]:
+    def _container_storage(self, node: str, vmid: str) -> Optional[str]:
+        # rootfs 形如 "local-lvm:vm-100-disk-0,size=8G"，取冒号前的存储名；获取失败时只按节点限流
+        try:
+            rootfs = self.get_container_config(node, vmid)['config'].get('rootfs')
+        except Exception:
+            return None
+        return rootfs.split(':', 1)[0] if rootfs and ':' in rootfs else None
+
+    def delete_container(self, node: str, vmid: str, admission_timeout: Optional[float] = None) -> Dict[str, Any]:
         try:
-            result = self._call_proxmox_api(self.proxmox.nodes(node).lxc(vmid).delete)
+            result = self._call_admitted(node, self._container_storage(node, vmid), self.proxmox.nodes(node).lxc(vmid).delete,
+                                         admission_timeout=admission_timeout)
+            self._container_mutated(node, str(vmid))
             return {
                 'success': True,
                 'message': f'容器 {vmid} 删除任务已启动',
                 'task_id': result
             }
-        except Exception as e:
-            logger.error(f"删除容器 {vmid} 失败: {str(e)}")
+        except AdmissionTimeout as e:
+            logger.warning(f"删除容器 {vmid} 未能取得操作配额: {str(e)}")
             return {
                 'success': False,
-                'message': f'删除容器失败: {str(e)}'
+                'message': f'删除容器失败: {str(e)}',
+                'busy': True
             }
-
-    def _wait_for_task(self, node: str, task_id: str, timeout: int = 300) -> bool:
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                status = self.get_task_status(node, task_id)
-                if status.get('status') == 'stopped':
-                    return status.get('exitstatus') == 'OK'
-                elif status.get('status') == 'error':
-                    return False
-            except Exception as e:
-                logger.warning(f"等待任务 {task_id} 时发生错误: {str(e)}")
-                return False
-            time.sleep(2)
-        logger.error(f"等待任务 {task_id} 超时")
-        return False
-
-    def rebuild_container(self, node: str, vmid: str, data: ContainerRebuild) -> Dict[str, Any]:
-        try:
-            logger.info(f"开始重建容器 {vmid} on {node}...")
-
-            try:
-                status_info = self.get_container_status(node, vmid)
-                if status_info['status'] == 'running':
-                    logger.info(f"容器 {vmid} 正在运行，尝试停止...")
-                    stop_result = self.stop_container(node, vmid)
-                    if not stop_result['success']:
-                        return {'success': False, 'message': f"重建失败: 停止容器失败 - {stop_result['message']}"}
-                    if not self._wait_for_task(node, stop_result['task_id']):
-                         return {'success': False, 'message': f"重建失败: 停止容器任务失败或超时"}
-                    logger.info(f"容器 {vmid} 已停止。")
-            except Exception:
-                 logger.info(f"容器 {vmid} 可能不存在或无法获取状态，继续执行删除。")
-
-
-            logger.info(f"正在删除容器 {vmid}...")
-            delete_result = self.delete_container(node, vmid)
-            if not delete_result['success']:
-                 try:
-                     if 'does not exist' not in delete_result['message'].lower() and 'no such ct' not in delete_result['message'].lower():
-                         return {'success': False, 'message': f"重建失败: 删除容器失败 - {delete_result['message']}"}
-                     logger.warning(f"删除容器 {vmid} 时出现 'does not exist' 或类似错误，可能已被删除，继续执行创建。")
-                 except Exception:
-                    return {'success': False, 'message': f"重建失败: 删除容器失败 - {delete_result['message']}"}
-            else:
-                if not self._wait_for_task(node, delete_result['task_id']):
-                    return {'success': False, 'message': f"重建失败: 删除容器任务失败或超时"}
-                logger.info(f"容器 {vmid} 已删除。")
-
-
-            logger.info(f"正在使用新配置创建容器 {vmid}...")
-            create_data = ContainerCreate(
-                node=node,
-                vmid=int(vmid),
-                ostemplate=data.ostemplate,
-                hostname=data.hostname,
-                password=data.password,
-                cores=data.cores,
-                cpulimit=data.cpulimit,
-                memory=data.memory,
-                swap=data.swap,
-                storage=data.storage,
-                disk_size=data.disk_size,
-                network=NetworkInterface(**data.network.model_dump()),
-                nesting=data.nesting,
-                unprivileged=data.unprivileged,
-                start=data.start,
-                features=data.features,
-                console_mode=data.console_mode
-            )
-            create_result = self.create_container(create_data)
-
-            if create_result['success']:
-                logger.info(f"容器 {vmid} 重建任务已启动。")
-                return {
-                    'success': True,
-                    'message': f'容器 {vmid} 重建任务已启动',
-                    'task_id': create_result.get('task_id')
-                }
-            else:
-                logger.error(f"重建容器 {vmid} 的创建步骤失败: {create_result['message']}")
-                return {
-                    'success': False,
-                    'message': f"重建失败 (创建步骤): {create_result['message']}"
-                }
-
         except Exception as e:
-            logger.error(f"重建容器 {vmid} 失败: {str(e)}")
+            logger.error(f"删除容器 {vmid} 失败: {str(e)}")
             return {
                 'success': False,
-                'message': f'重建容器失败: {str(e)}'
+                'message': f'删除容器失败: {str(e)}'
             }
 
     def get_container_console(self, node: str, vmid: str) -> Dict[str, Any]:
@@ -409,34 +755,65 @@ class ProxmoxService:
                 'message': f'获取任务状态失败: {str(e)}'
             }
 
-    def get_templates(self, node: str) -> List[Dict[str, Any]]:
+    def stop_task(self, node: str, task_id: str) -> Dict[str, Any]:
+        try:
+            self._call_proxmox_api(self.proxmox.nodes(node).tasks(task_id).delete)
+            return {
+                'success': True,
+                'message': f'任务 {task_id} 已请求中止',
+                'task_id': task_id
+            }
+        except Exception as e:
+            logger.error(f"中止任务 {task_id} 失败: {str(e)}")
+            return {
+                'success': False,
+                'message': f'中止任务失败: {str(e)}'
+            }
+
+    def get_node_tasks(self, node: str, **params) -> List[Dict[str, Any]]:
+        return self._call_proxmox_api(self.proxmox.nodes(node).tasks.get, **params)
+
+    def get_task_log(self, node: str, task_id: str, start: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        # start 为行偏移，只取该偏移之后的新日志行
+        return self._call_proxmox_api(self.proxmox.nodes(node).tasks(task_id).log.get, start=start, limit=limit)
+
+    def get_templates(self, node: str, use_cache: bool = True) -> List[Dict[str, Any]]:
         try:
-            storages = self._call_proxmox_api(self.proxmox.nodes(node).storage.get)
-            templates = []
-            for storage in storages:
-                if 'vztmpl' in storage.get('content', ''):
-                    content = self._call_proxmox_api(self.proxmox.nodes(node).storage(storage['storage']).content.get, content='vztmpl')
-                    templates.extend(content)
-            return templates
+            return self.resource_cache.get_or_load(
+                ('templates', node), lambda: self._fetch_templates(node),
+                ttl=settings.cache_ttl_templates, bypass=not use_cache
+            )
         except Exception as e:
             logger.error(f"获取节点 {node} 模板失败: {str(e)}")
             raise Exception(f"获取节点模板失败: {str(e)}")
 
-    def get_storages(self, node: str) -> List[Dict[str, Any]]:
+    def _fetch_templates(self, node: str) -> List[Dict[str, Any]]:
+        storages = self._call_proxmox_api(self.proxmox.nodes(node).storage.get)
+        templates = []
+        for storage in storages:
+            if 'vztmpl' in storage.get('content', ''):
+                content = self._call_proxmox_api(self.proxmox.nodes(node).storage(storage['storage']).content.get, content='vztmpl')
+                templates.extend(content)
+        return templates
+
+    def get_storages(self, node: str, use_cache: bool = True) -> List[Dict[str, Any]]:
         try:
-            storages = self._call_proxmox_api(self.proxmox.nodes(node).storage.get)
-            return storages
+            return self.resource_cache.get_or_load(
+                ('storages', node), lambda: self._call_proxmox_api(self.proxmox.nodes(node).storage.get),
+                ttl=settings.cache_ttl_storages, bypass=not use_cache
+            )
         except Exception as e:
             logger.error(f"获取节点 {node} 存储失败: {str(e)}")
             raise Exception(f"获取节点存储失败: {str(e)}")
 
-    def get_networks(self, node: str) -> List[Dict[str, Any]]:
+    def get_networks(self, node: str, use_cache: bool = True) -> List[Dict[str, Any]]:
         try:
-            networks = self._call_proxmox_api(self.proxmox.nodes(node).network.get, type='bridge')
-            return networks
+            return self.resource_cache.get_or_load(
+                ('networks', node), lambda: self._call_proxmox_api(self.proxmox.nodes(node).network.get, type='bridge'),
+                ttl=settings.cache_ttl_networks, bypass=not use_cache
+            )
         except Exception as e:
             logger.error(f"获取节点 {node} 网络失败: {str(e)}")
             raise Exception(f"获取节点网络失败: {str(e)}")
 
-
 proxmox_service = ProxmoxService()
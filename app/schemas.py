@@ -34,6 +34,8 @@ class NodeResourceResponse(BaseModel):
 class ContainerList(BaseModel):
     containers: List[ContainerStatus]
     total: int
+    errors: Optional[Dict[str, str]] = None
+    next_cursor: Optional[str] = None
 
 class ErrorResponse(BaseModel):
     error: str
@@ -49,7 +51,7 @@ class NetworkInterface(BaseModel):
     rate: Optional[int] = Field(None, description="网络速率限制 (MB/s)", example=50)
 
 class ContainerCreate(BaseModel):
-    node: str = Field(..., description="目标 Proxmox 节点名称", example="pve")
+    node: str = Field(..., description="目标 Proxmox 节点名称，为 \"auto\" 时按节点负载自动选择", example="pve")
     vmid: int = Field(..., description="新容器的 VMID (必须是唯一的)", example=105)
     hostname: str = Field(..., description="容器的主机名", example="my-ct")
     password: str = Field(..., description="容器的 root 用户密码", example="a_very_secure_password")
@@ -67,6 +69,29 @@ class ContainerCreate(BaseModel):
     features: Optional[str] = Field(None, description="额外的功能特性 (例如 'keyctl=1,mount=cifs')", example="keyctl=1")
     console_mode: Optional[ConsoleMode] = Field(ConsoleMode.DEFAULT_TTY, description="选择控制台模式: '默认 (tty)' 或 'shell'", example=ConsoleMode.DEFAULT_TTY)
 
+class ContainerBatchTemplate(BaseModel):
+    hostname: str = Field(..., description="主机名前缀，未覆盖时依次生成 <前缀>-1、<前缀>-2 ...", example="lab-ct")
+    password: str = Field(..., description="容器的 root 用户密码", example="a_very_secure_password")
+    ostemplate: str = Field(..., description="使用的操作系统模板 (格式: <storage>:<path_to_template>)", example="local:vztmpl/ubuntu-22.04-standard_22.04-1_amd64.tar.gz")
+    storage: str = Field(..., description="根文件系统所在的存储池名称", example="local-lvm")
+    disk_size: int = Field(..., description="根磁盘大小 (GB)", example=8)
+    cores: int = Field(1, description="分配给容器的 CPU 核心数", example=2)
+    cpulimit: Optional[int] = Field(None, description="CPU 限制 (0 表示无限制)", example=1)
+    memory: int = Field(512, description="分配给容器的内存大小 (MB)", example=1024)
+    swap: int = Field(512, description="分配给容器的 SWAP 大小 (MB)", example=512)
+    network: NetworkInterface = Field(..., description="网络接口配置")
+    nesting: Optional[bool] = Field(False, description="是否启用嵌套虚拟化 (需要内核支持)", example=True)
+    unprivileged: Optional[bool] = Field(True, description="是否创建为非特权容器", example=True)
+    start: Optional[bool] = Field(False, description="创建后是否立即启动容器", example=True)
+    features: Optional[str] = Field(None, description="额外的功能特性 (例如 'keyctl=1,mount=cifs')", example="keyctl=1")
+    console_mode: Optional[ConsoleMode] = Field(ConsoleMode.DEFAULT_TTY, description="选择控制台模式: '默认 (tty)' 或 'shell'", example=ConsoleMode.DEFAULT_TTY)
+
+class ContainerBatchCreate(BaseModel):
+    template: ContainerBatchTemplate = Field(..., description="所有容器共用的创建参数")
+    count: Optional[int] = Field(None, ge=1, description="按模板创建的容器数量，与 overrides 二选一", example=50)
+    overrides: Optional[List[Dict[str, Any]]] = Field(None, description="逐个容器覆盖模板字段（可包含 node、vmid、hostname 等），列表长度即创建数量", example=[{"hostname": "web-1"}, {"hostname": "web-2", "node": "pve2"}])
+    nodes: Optional[List[str]] = Field(None, description="可放置的节点，默认为所有在线节点", example=["pve1", "pve2"])
+
 class ContainerRebuild(BaseModel):
     ostemplate: str = Field(..., description="新的操作系统模板", example="local:vztmpl/debian-11-standard_11.7-1_amd64.tar.gz")
     hostname: str = Field(..., description="新的容器主机名", example="rebuilt-ct")
@@ -84,6 +109,35 @@ class ContainerRebuild(BaseModel):
     features: Optional[str] = Field(None, description="新的额外功能特性", example="nesting=1")
     console_mode: Optional[ConsoleMode] = Field(ConsoleMode.DEFAULT_TTY, description="选择新的控制台模式: '默认 (tty)' 或 'shell'", example=ConsoleMode.DEFAULT_TTY)
 
+class PowerAction(str, Enum):
+    START = "start"
+    STOP = "stop"
+    SHUTDOWN = "shutdown"
+    REBOOT = "reboot"
+
+class BulkPowerItem(BaseModel):
+    node: str = Field(..., description="节点名称", example="pve")
+    vmid: str = Field(..., description="容器 ID", example="101")
+    action: PowerAction = Field(..., description="电源操作: start、stop、shutdown 或 reboot", example=PowerAction.START)
+
+class BulkPowerRequest(BaseModel):
+    items: List[BulkPowerItem] = Field(..., min_length=1, description="要执行的电源操作列表，同一容器只能出现一次")
+
+class BulkPowerResult(BaseModel):
+    node: str
+    vmid: str
+    action: PowerAction
+    success: bool
+    message: str
+    task_id: Optional[str] = None
+
+class BulkPowerResponse(BaseModel):
+    success: bool
+    message: str
+    data: List[BulkPowerResult]
+    succeeded: int
+    failed: int
+
 class ConsoleTicket(BaseModel):
     ticket: str
     port: int
@@ -151,3 +205,15 @@ class NatRuleListResponse(BaseModel):
     message: str
     data: List[NatRuleDisplay]
     total: int
+
+class JobListResponse(BaseModel):
+    success: bool
+    message: str
+    data: List[Dict[str, Any]]
+    total: int
+
+class OperationLogListResponse(BaseModel):
+    success: bool
+    message: str
+    data: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .config import settings
+from .concurrency import run_blocking
+from .proxmox import proxmox_service, ProxmoxService
+
+logger = logging.getLogger(__name__)
+
+TASK_END_MARKERS = ('TASK OK', 'TASK ERROR', 'TASK WARNINGS')
+# 起始偏移之后没有新日志时，Proxmox 返回唯一一行占位内容
+NO_CONTENT_LINE = 'no content'
+
+
+class TaskStream:
+    # 单个 UPID 的事件序列：状态变化与增量日志按顺序追加，订阅方各自维护读取位置
+
+    def __init__(self, node: str, upid: str):
+        self.node = node
+        self.upid = upid
+        self.events: List[Dict[str, Any]] = []
+        self.log_offset = 0
+        self.finished = False
+        self.subscribers = 0
+        self.poller: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str, data: Any):
+        self.events.append({'id': len(self.events), 'event': event, 'data': data})
+        self._notify()
+
+    def finish(self):
+        self.finished = True
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class TaskStreamHub:
+    # 同一任务的所有订阅方共享一个上游轮询协程：日志按 start 偏移增量拉取，任务结束由日志结束标记或共享任务跟踪器判定
+
+    def __init__(self, service: ProxmoxService):
+        self.service = service
+        self._streams: Dict[str, TaskStream] = {}
+        self.log_fetches = 0
+        self.status_fetches = 0
+        self.subscriptions = 0
+
+    async def subscribe(self, node: str, upid: str, last_event_id: Optional[int] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        stream = self._streams.get(upid)
+        if stream is None:
+            stream = TaskStream(node, upid)
+            self._streams[upid] = stream
+            stream.poller = asyncio.create_task(self._poll(stream))
+            # 新建的事件序列与客户端之前看到的编号无关，只能从头重放
+            last_event_id = None
+        stream.subscribers += 1
+        self.subscriptions += 1
+        index = 0 if last_event_id is None else last_event_id + 1
+        try:
+            while True:
+                changed = stream._changed
+                pending = stream.events[index:]
+                if pending:
+                    index += len(pending)
+                    for event in pending:
+                        yield event
+                    continue
+                if stream.finished:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=settings.task_stream_heartbeat)
+                except asyncio.TimeoutError:
+                    # None 表示心跳，由调用方转换成 SSE 注释行
+                    yield None
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0:
+                if stream.poller is not None and not stream.poller.done():
+                    stream.poller.cancel()
+                if self._streams.get(upid) is stream:
+                    del self._streams[upid]
+
+    async def _poll(self, stream: TaskStream):
+        tracked = None
+        try:
+            self.status_fetches += 1
+            status = await run_blocking(self.service.get_task_status, stream.node, stream.upid)
+            if status.get('status') == 'error':
+                stream.publish('error', {'message': status.get('message')})
+                return
+            stream.publish('status', status)
+
+            done = None
+            if status.get('status') != 'stopped':
+                tracked = self.service.task_tracker.track(stream.node, stream.upid)
+                done = asyncio.wrap_future(tracked)
+            while True:
+                finished = done is None or done.done()
+                ended_in_log = await self._fetch_log(stream)
+                if finished or ended_in_log:
+                    break
+                await asyncio.wait({done}, timeout=settings.task_stream_poll_interval)
+
+            if done is not None:
+                if done.done():
+                    status = done.result()
+                else:
+                    # 日志已出现结束标记，不必等待任务跟踪器的下一次轮询
+                    self.status_fetches += 1
+                    status = await run_blocking(self.service.get_task_status, stream.node, stream.upid)
+                stream.publish('status', status)
+            stream.publish('done', status)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"推送任务 {stream.upid} 状态失败: {str(e)}")
+            stream.publish('error', {'message': str(e)})
+        finally:
+            if tracked is not None:
+                self.service.task_tracker.untrack(stream.upid, tracked)
+            stream.finish()
+
+    async def _fetch_log(self, stream: TaskStream) -> bool:
+        page_size = settings.task_log_page_size
+        ended = False
+        while True:
+            self.log_fetches += 1
+            lines = await run_blocking(self.service.get_task_log, stream.node, stream.upid, stream.log_offset, page_size)
+            if len(lines) == 1 and lines[0].get('t') == NO_CONTENT_LINE:
+                return ended
+            for line in lines:
+                stream.publish('log', line)
+                # Proxmox 在任务结束时写入 "TASK OK" 或 "TASK ERROR: ..." 作为最后一行
+                if str(line.get('t', '')).startswith(TASK_END_MARKERS):
+                    ended = True
+            # n 是从 1 开始的行号，下一次从最后一行之后开始拉取
+            last = lines[-1].get('n') if lines else None
+            stream.log_offset = last if isinstance(last, int) and last > stream.log_offset else stream.log_offset + len(lines)
+            if len(lines) < page_size:
+                return ended
+
+    async def stop(self):
+        pollers = [s.poller for s in self._streams.values() if s.poller is not None and not s.poller.done()]
+        for poller in pollers:
+            poller.cancel()
+        await asyncio.gather(*pollers, return_exceptions=True)
+        for stream in self._streams.values():
+            stream.finish()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'active_streams': len(self._streams),
+            'subscribers': sum(s.subscribers for s in self._streams.values()),
+            'subscriptions': self.subscriptions,
+            'status_fetches': self.status_fetches,
+            'log_fetches': self.log_fetches
+        }
+
+
+task_stream_hub = TaskStreamHub(proxmox_service)
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 各类任务的 (初始轮询间隔, 最大轮询间隔)，单位秒；未列出的类型使用默认值
+TASK_POLL_PROFILES: Dict[str, Tuple[float, float]] = {
+    'vzstart': (0.5, 1.5),
+    'vzstop': (0.5, 1.5),
+    'vzshutdown': (1.0, 2.0),
+    'vzreboot': (1.0, 2.0),
+    'vzdestroy': (1.0, 2.0),
+    'vzcreate': (1.0, 2.5),
+    'vzrestore': (2.0, 5.0),
+    'vzdump': (5.0, 15.0),
+}
+DEFAULT_POLL_PROFILE: Tuple[float, float] = (1.0, 2.5)
+
+
+def parse_upid(upid: str) -> Dict[str, Any]:
+    # UPID:{node}:{pid}:{pstart}:{starttime}:{type}:{id}:{user}:
+    parts = upid.split(':')
+    if len(parts) < 8 or parts[0] != 'UPID':
+        return {}
+    try:
+        starttime = int(parts[4], 16)
+    except ValueError:
+        starttime = None
+    return {'node': parts[1], 'starttime': starttime, 'type': parts[5], 'id': parts[6], 'user': parts[7]}
+
+
+class TrackedTask:
+    def __init__(self, node: str, upid: str):
+        info = parse_upid(upid)
+        self.node = node
+        self.upid = upid
+        self.type = info.get('type')
+        self.starttime = info.get('starttime')
+        self.future: Future = Future()
+        self.interval, self.max_interval = TASK_POLL_PROFILES.get(self.type, DEFAULT_POLL_PROFILE)
+        self.registered_at = time.monotonic()
+        self.next_poll_at = self.registered_at + self.interval
+        self.waiters = 0
+        self.errors = 0
+
+    def backoff(self, now: float):
+        self.interval = min(self.interval * settings.task_poll_backoff, self.max_interval)
+        self.next_poll_at = now + self.interval
+
+
+class TaskTracker:
+    # 共享的任务跟踪器：按节点批量轮询 /nodes/{node}/tasks，一次请求覆盖该节点所有未完成的 UPID
+
+    def __init__(self, service):
+        self.service = service
+        self._tasks: Dict[str, TrackedTask] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.node_polls = 0
+        self.fallback_polls = 0
+        self.completed = 0
+
+    def track(self, node: str, upid: str) -> Future:
+        # 每次 track 记为一个等待方；不再等待时调用 untrack，没有等待方的任务停止轮询
+        with self._cond:
+            task = self._tasks.get(upid)
+            if task is None:
+                task = TrackedTask(node, upid)
+                self._tasks[upid] = task
+                self._ensure_thread()
+                self._cond.notify()
+            task.waiters += 1
+            return task.future
+
+    def untrack(self, upid: str, future: Future):
+        with self._cond:
+            task = self._tasks.get(upid)
+            # 只释放同一个 future 的等待方，任务结束后重新跟踪的同名 UPID 不受影响
+            if task is None or task.future is not future:
+                return
+            task.waiters -= 1
+            if task.waiters > 0:
+                return
+            del self._tasks[upid]
+        task.future.cancel()
+
+    def wait_sync(self, node: str, upid: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        future = self.track(node, upid)
+        try:
+            return future.result(timeout=timeout)
+        finally:
+            self.untrack(upid, future)
+
+    async def wait(self, node: str, upid: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        future = self.track(node, upid)
+        try:
+            # shield：单个等待方超时不应取消其他调用方共享的 future
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=timeout)
+        finally:
+            self.untrack(upid, future)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="pve-task-tracker", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._tasks:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                next_due = min(task.next_poll_at for task in self._tasks.values())
+                if next_due > now:
+                    self._cond.wait(timeout=next_due - now)
+                    continue
+                # 一个节点只要有任务到期，就在同一次轮询中检查该节点所有未完成的任务
+                due_nodes = {task.node for task in self._tasks.values() if task.next_poll_at <= now}
+                by_node: Dict[str, List[TrackedTask]] = {}
+                for task in self._tasks.values():
+                    if task.node in due_nodes:
+                        by_node.setdefault(task.node, []).append(task)
+
+            for node, tasks in by_node.items():
+                self._poll_node(node, tasks)
+
+    def _poll_node(self, node: str, tasks: List[TrackedTask]):
+        now = time.monotonic()
+        try:
+            starttimes = [task.starttime for task in tasks if task.starttime is not None]
+            params = {'source': 'all', 'limit': max(50, len(tasks) * 4)}
+            if starttimes:
+                params['since'] = min(starttimes) - 1
+            entries = self.service.get_node_tasks(node, **params)
+            self.node_polls += 1
+        except Exception as e:
+            logger.warning(f"轮询节点 {node} 任务列表失败: {str(e)}")
+            entries = None
+
+        found = {entry.get('upid'): entry for entry in entries or [] if entry.get('upid')}
+        for task in tasks:
+            due = task.next_poll_at <= now
+            entry = found.get(task.upid)
+            if entry is None and due:
+                # 列表被截断或获取失败时，到期的任务退回到单个任务状态查询
+                try:
+                    entry = self._poll_single(task)
+                except Exception as e:
+                    self._fail(task, e)
+                    continue
+            if entry is not None and entry.get('endtime'):
+                self._resolve(task, entry)
+            elif now - task.registered_at > settings.task_track_timeout:
+                self._fail(task, TimeoutError(f"任务 {task.upid} 超过 {settings.task_track_timeout} 秒仍未结束"))
+            elif due:
+                # 只有到期的任务才退避；顺带检查的任务保持原有轮询计划
+                task.backoff(now)
+
+    def _poll_single(self, task: TrackedTask) -> Optional[Dict[str, Any]]:
+        self.fallback_polls += 1
+        status = self.service.get_task_status(task.node, task.upid)
+        if status.get('status') == 'error':
+            task.errors += 1
+            logger.warning(f"查询任务 {task.upid} 状态失败（第 {task.errors} 次）: {status.get('message')}")
+            if task.errors >= settings.task_poll_max_errors:
+                raise Exception(f"查询任务 {task.upid} 状态连续失败 {task.errors} 次: {status.get('message')}")
+            return None
+        task.errors = 0
+        if status.get('status') not in ('running', 'stopped'):
+            raise Exception(f"任务 {task.upid} 在节点 {task.node} 上不存在")
+        if status.get('status') != 'stopped':
+            return {}
+        return {
+            'upid': task.upid,
+            'status': status.get('exitstatus'),
+            'type': status.get('type'),
+            'id': status.get('id'),
+            'starttime': status.get('starttime'),
+            'endtime': status.get('endtime') or int(time.time())
+        }
+
+    def _resolve(self, task: TrackedTask, entry: Dict[str, Any]):
+        with self._cond:
+            self._tasks.pop(task.upid, None)
+        self.completed += 1
+        if not task.future.done():
+            task.future.set_result({
+                'status': 'stopped',
+                'exitstatus': entry.get('status'),
+                'type': entry.get('type', task.type),
+                'id': entry.get('id'),
+                'starttime': entry.get('starttime', task.starttime),
+                'endtime': entry.get('endtime')
+            })
+
+    def _fail(self, task: TrackedTask, error: Exception):
+        with self._cond:
+            self._tasks.pop(task.upid, None)
+        if not task.future.done():
+            task.future.set_exception(error)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            outstanding = len(self._tasks)
+        return {
+            'outstanding': outstanding,
+            'node_polls': self.node_polls,
+            'fallback_polls': self.fallback_polls,
+            'completed': self.completed
+        }
@@ -0,0 +1,63 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_proxmox import FakeCluster, install
+
+
+def create_and_wait(service, tenant, node, vmid, submitted_at):
+    from app.logging_context import request_client_cv
+    from app.schemas import ContainerCreate, NetworkInterface
+
+    request_client_cv.set(tenant)
+    data = ContainerCreate(node=node, vmid=vmid, hostname=f"{tenant}-{vmid}", password="x",
+                           ostemplate="local:vztmpl/t.tar.gz", storage="local", disk_size=4, network=NetworkInterface())
+    result = service.create_container(data)
+    if not result['success']:
+        return tenant, False, time.perf_counter() - submitted_at
+    status = service.task_tracker.wait_sync(node, result['task_id'], timeout=600)
+    return tenant, status.get('exitstatus') == 'OK', time.perf_counter() - submitted_at
+
+
+def run(service, cluster, args, vmid_base):
+    # 租户 A 一次性提交大批量创建，租户 B 稍后提交少量创建，全部压在同一个节点上
+    node = cluster.nodes[0]
+    with ThreadPoolExecutor(max_workers=args.batch + args.small) as executor:
+        start = time.perf_counter()
+        futures = [executor.submit(create_and_wait, service, "tenant-a", node, vmid_base + i, start)
+                   for i in range(args.batch)]
+        time.sleep(args.duration / 2)
+        small_start = time.perf_counter()
+        futures += [executor.submit(create_and_wait, service, "tenant-b", node, vmid_base + args.batch + i, small_start)
+                    for i in range(args.small)]
+        results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+    ok = sum(1 for _, success, _ in results if success)
+    small = [latency for tenant, _, latency in results if tenant == "tenant-b"]
+    return ok, len(results) - ok, elapsed, sum(small) / len(small)
+
+
+def main(args):
+    cluster = install(FakeCluster(["pve0"], containers_per_node=0, latency=args.latency,
+                                  task_duration=args.duration, storage_slots=args.slots))
+
+    from app.proxmox import proxmox_service
+
+    admission = proxmox_service.admission
+    print(f"单节点 {args.batch}+{args.small} 个创建任务，存储可并行 {args.slots} 个，单个任务基础耗时 {args.duration}s")
+    for label, node_limit, storage_limit, vmid_base in (("不限流", 0, 0, 1000), ("准入调度", 0, args.slots, 2000)):
+        admission.node_limit, admission.storage_limit = node_limit, storage_limit
+        ok, failed, elapsed, small_latency = run(proxmox_service, cluster, args, vmid_base)
+        print(f"{label:6s} 成功 {ok:3d}  失败 {failed:3d}  总耗时 {elapsed:6.2f}s  "
+              f"成功速率 {ok / elapsed:5.2f}/s  租户 B 平均完成耗时 {small_latency:6.2f}s")
+    print(f"准入指标: {admission.get_metrics()['wait_seconds']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同一节点并发创建时，不限流与按节点/存储准入调度的成功率与吞吐对比")
+    parser.add_argument("--batch", type=int, default=40, help="租户 A 一次提交的创建数")
+    parser.add_argument("--small", type=int, default=4, help="租户 B 稍后提交的创建数")
+    parser.add_argument("--slots", type=int, default=4, help="节点存储可无损并行的任务数")
+    parser.add_argument("--duration", type=float, default=1.0, help="单个创建任务的基础耗时 (秒)")
+    parser.add_argument("--latency", type=float, default=0.01, help="单次 API 请求耗时 (秒)")
+    main(parser.parse_args())
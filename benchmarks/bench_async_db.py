@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fake_proxmox import percentile
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.005):
+    # 事件循环被阻塞时，sleep 的实际耗时会超出预期，超出部分即其他协程被耽搁的时间
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_mode(handler, concurrency, duration):
+    stop = asyncio.Event()
+    lags, latencies = [], []
+
+    async def client(i):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await handler(i)
+            latencies.append(time.perf_counter() - start)
+            # 同步处理函数中没有 await，这里让出一次事件循环，否则其他协程永远得不到运行
+            await asyncio.sleep(0)
+
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    clients = [asyncio.create_task(client(i)) for i in range(concurrency)]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(beat, *clients)
+    return latencies, lags
+
+
+async def main(args):
+    from app import nat_service
+    from app.audit import audit_writer
+    from app.auth import log_operation, log_operation_async
+    from app.concurrency import run_blocking
+    from app.database import SessionLocal, async_session, create_tables, dispose_async_engine
+    from app.models import NatRule
+
+    create_tables()
+    db = SessionLocal()
+    db.add_all([NatRule(node=f"pve{i % 4}", vmid=100 + i % 50, host_port=20000 + i, container_port=22,
+                        protocol='tcp', container_ip_at_creation=f"10.0.{i // 250}.{i % 250}")
+                for i in range(args.rules)])
+    db.commit()
+    db.close()
+
+    # 每个请求与 NAT 列表路由相同：查询一页规则并记录一条操作日志；--sync-log 时每条日志单独提交（AUDIT_ASYNC=false 的路径）
+    if not args.sync_log:
+        audit_writer.start()
+    def sync_request(i):
+        db = SessionLocal()
+        try:
+            rules, total = nat_service.get_all_nat_rules(db, 0, args.page)
+            log_operation(db, "列出所有NAT规则", "全部", "系统", "成功", f"获取到 {len(rules)} 条规则", "127.0.0.1")
+        finally:
+            db.close()
+
+    async def on_loop(i):
+        sync_request(i)
+
+    async def in_executor(i):
+        await run_blocking(sync_request, i)
+
+    async def with_async_session(i):
+        async with async_session() as db:
+            rules, total = await nat_service.get_all_nat_rules_async(db, 0, args.page)
+            await log_operation_async(db, "列出所有NAT规则", "全部", "系统", "成功", f"获取到 {len(rules)} 条规则", "127.0.0.1")
+
+    print(f"{args.concurrency} 个并发请求，每个请求查询 {args.page} 条 NAT 规则并记录一条操作日志"
+          f"（{'逐条提交' if args.sync_log else '后台批量写入'}），每种方式运行 {args.duration:.0f} 秒")
+    for label, handler in (("同步会话（在事件循环中）", on_loop), ("同步会话（线程池）", in_executor),
+                           ("异步会话（aiosqlite）", with_async_session)):
+        latencies, lags = await run_mode(handler, args.concurrency, args.duration)
+        print(f"{label:14s} 吞吐 {len(latencies) / args.duration:7.1f} 次/秒  请求 p50 {percentile(latencies, 50) * 1000:7.2f}ms  "
+              f"p99 {percentile(latencies, 99) * 1000:7.2f}ms  事件循环延迟 p99 {percentile(lags, 99) * 1000:7.2f}ms  "
+              f"最大 {max(lags, default=0) * 1000:7.2f}ms")
+    audit_writer.stop()
+    await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同步会话与异步会话执行 NAT 查询和日志写入时的吞吐与事件循环延迟")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发请求数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每种方式的运行秒数")
+    parser.add_argument("--rules", type=int, default=500, help="NAT 规则数")
+    parser.add_argument("--page", type=int, default=100, help="每次查询的规则数")
+    parser.add_argument("--sync-log", action="store_true", help="不启动后台批量写入，每条操作日志单独提交")
+    args = parser.parse_args()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-async-db-')}/lxc_api.db")
+    asyncio.run(main(args))
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_proxmox import FakeCluster, install, percentile
+
+
+def run_requests(client, headers, count, workers):
+    def one(_):
+        start = time.perf_counter()
+        response = client.get("/api/v1/nodes", headers=headers)
+        assert response.status_code == 200, response.text
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(one, range(count)))
+    return latencies, time.perf_counter() - start
+
+
+def main(args):
+    install(FakeCluster(["pve0", "pve1"], containers_per_node=5, latency=0.0))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.audit import AuditLogWriter, audit_writer
+    from app.database import SessionLocal, engine
+    from app.main import app
+    from app.models import OperationLog
+
+    commits = {'count': 0}
+    event.listen(engine, "commit", lambda conn: commits.__setitem__('count', commits['count'] + 1))
+    headers = {"Authorization": "Bearer bench-key"}
+    print(f"{args.requests} 次 GET /nodes（节点列表命中缓存），{args.workers} 个并发客户端，SQLite 文件数据库")
+
+    with TestClient(app) as client:
+        client.get("/api/v1/nodes", headers=headers)
+        for label, use_writer in (("同步提交日志", False), ("后台批量写入", True)):
+            if use_writer:
+                audit_writer.start()
+            else:
+                audit_writer.stop()
+            commits['count'] = 0
+            latencies, elapsed = run_requests(client, headers, args.requests, args.workers)
+            audit_writer.stop()
+            print(f"{label:8s} p50 {percentile(latencies, 50) * 1000:6.2f}ms  p99 {percentile(latencies, 99) * 1000:6.2f}ms  "
+                  f"吞吐 {args.requests / elapsed:7.1f} 次/秒  日志事务 {commits['count']:5d}")
+        db = SessionLocal()
+        rows = db.query(OperationLog).count()
+        db.close()
+        print(f"操作日志行数 {rows}（预期 {2 * args.requests + 1}）")
+
+    # 溢出策略：写入线程未启动、队列很小时，从事件循环（async 路由）中提交 300 条；
+    # drop 直接丢弃计数，block 不在事件循环中等待，由线程池等到写入线程启动后入队
+    async def submit_on_loop(writer):
+        start = time.perf_counter()
+        for i in range(300):
+            writer.submit({'operation': 'bench', 'container_id': str(i), 'node_name': 'pve0', 'status': '成功',
+                           'message': '', 'ip_address': '127.0.0.1', 'task_id': None})
+        elapsed = time.perf_counter() - start
+        writer.start()
+        return elapsed
+
+    for policy in ("drop", "block"):
+        writer = AuditLogWriter(queue_size=100, batch_size=50, flush_interval=0.1, overflow_policy=policy)
+        elapsed = asyncio.run(submit_on_loop(writer))
+        writer.stop()
+        print(f"队列满 ({policy:5s}) 事件循环中提交 300 条耗时 {elapsed * 1000:6.2f}ms  等待入队 {writer.blocked}  "
+              f"写入 {writer.written}  丢弃 {writer.dropped}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="每次请求同步提交操作日志与后台批量写入的请求延迟和事务数对比")
+    parser.add_argument("--requests", type=int, default=2000, help="请求数")
+    parser.add_argument("--workers", type=int, default=8, help="并发客户端数")
+    main(parser.parse_args())
@@ -0,0 +1,44 @@
+import argparse
+import time
+
+from fake_proxmox import FakeCluster, install
+
+
+def main(args):
+    cluster = install(FakeCluster([f"pve{i}" for i in range(args.nodes)], containers_per_node=args.per_node,
+                                  latency=args.latency))
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.main import app
+
+    commits = {'count': 0}
+    event.listen(engine, "commit", lambda conn: commits.__setitem__('count', commits['count'] + 1))
+    headers = {"Authorization": "Bearer bench-key"}
+    items = [{'node': c['node'], 'vmid': str(vmid), 'action': 'reboot'} for vmid, c in cluster.containers.items()]
+    print(f"{len(items)} 个容器，{args.nodes} 个节点，单次 API 请求耗时 {args.latency}s")
+
+    with TestClient(app) as client:
+        commits['count'] = 0
+        start = time.perf_counter()
+        for item in items:
+            response = client.post(f"/api/v1/containers/{item['node']}/{item['vmid']}/reboot", headers=headers)
+            assert response.status_code == 200, response.text
+        print(f"逐个调用 /reboot  耗时 {time.perf_counter() - start:6.2f}s  日志事务 {commits['count']:4d}")
+
+        commits['count'] = 0
+        start = time.perf_counter()
+        response = client.post("/api/v1/containers/bulk/power", json={'items': items}, headers=headers)
+        body = response.json()
+        assert response.status_code == 200 and body['succeeded'] == len(items), response.text
+        print(f"批量电源操作     耗时 {time.perf_counter() - start:6.2f}s  日志事务 {commits['count']:4d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="逐个调用电源接口与批量电源操作的耗时对比")
+    parser.add_argument("--nodes", type=int, default=4, help="节点数")
+    parser.add_argument("--per-node", type=int, default=50, help="每个节点的容器数")
+    parser.add_argument("--latency", type=float, default=0.05, help="单次 API 请求耗时 (秒)")
+    main(parser.parse_args())
@@ -0,0 +1,55 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_unresponsive_server():
+    # 接受 TCP 连接但从不响应，模拟卡住的 Proxmox（TLS 握手会一直等待到超时）
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(128)
+    held = []
+
+    def accept_forever():
+        while True:
+            conn, _ = server.accept()
+            held.append(conn)
+
+    threading.Thread(target=accept_forever, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def measure_import(port, workdir):
+    env = dict(os.environ, PYTHONPATH=ROOT, PROXMOX_HOST="127.0.0.1", PROXMOX_PORT=str(port),
+               PROXMOX_PASSWORD="bench", DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", "import app.main"], cwd=workdir, env=env,
+                            capture_output=True, text=True)
+    return time.perf_counter() - start, result.returncode
+
+
+def main(args):
+    port = start_unresponsive_server()
+    workdir = tempfile.mkdtemp(prefix="pve-cold-start-")
+    durations = []
+    for _ in range(args.rounds):
+        duration, returncode = measure_import(port, workdir)
+        durations.append(duration)
+        if returncode != 0:
+            print(f"导入 app.main 失败 (退出码 {returncode})，耗时 {duration:.2f}s")
+    print(f"Proxmox 无响应时导入 app.main：中位数 {statistics.median(durations) * 1000:.0f}ms，"
+          f"最大 {max(durations) * 1000:.0f}ms（{args.rounds} 次）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proxmox 无响应时 app.main 的冷启动耗时")
+    parser.add_argument("--rounds", type=int, default=5, help="重复次数")
+    main(parser.parse_args())
@@ -0,0 +1,38 @@
+import argparse
+import time
+
+from fake_proxmox import FakeCluster, install, percentile
+
+
+def measure(service, cluster, mode, rounds):
+    latencies = []
+    cluster.reset()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        service.get_containers_with_errors(None, mode)
+        latencies.append(time.perf_counter() - start)
+    return cluster.total_requests() / rounds, percentile(latencies, 50)
+
+
+def main(args):
+    cluster = install(FakeCluster([], containers_per_node=args.containers, latency=args.latency))
+
+    from app.proxmox import ProxmoxService
+
+    print(f"{'节点数':>6} {'模式':>8} {'请求数/次':>10} {'p50 延迟':>12}")
+    for node_count in args.nodes:
+        cluster.__init__([f"pve{i:02d}" for i in range(node_count)],
+                         containers_per_node=args.containers, latency=args.latency)
+        service = ProxmoxService()
+        for mode in ("nodes", "cluster"):
+            requests_per_call, p50 = measure(service, cluster, mode, args.rounds)
+            print(f"{node_count:>6} {mode:>8} {requests_per_call:>10.1f} {p50 * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按节点查询与 /cluster/resources 单次查询的请求数和延迟对比")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4, 8, 14, 32], help="节点数列表")
+    parser.add_argument("--containers", type=int, default=20, help="每个节点的容器数")
+    parser.add_argument("--latency", type=float, default=0.02, help="单次 API 请求耗时 (秒)")
+    parser.add_argument("--rounds", type=int, default=5, help="每种配置的重复次数")
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+import argparse
+import threading
+import time
+import tracemalloc
+
+from fake_proxmox import FakeCluster, install
+
+
+def fetch(base_url, params):
+    import httpx
+
+    headers = {"Authorization": "Bearer bench-key"}
+    start = time.perf_counter()
+    first_byte, size = None, 0
+    with httpx.stream("GET", f"{base_url}/api/v1/containers", params=params, headers=headers, timeout=120) as response:
+        assert response.status_code == 200, response.read()
+        for chunk in response.iter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+    return first_byte, time.perf_counter() - start, size
+
+
+def main(args):
+    nodes = [f"pve{i:02d}" for i in range(args.nodes)]
+    # 节点响应耗时从 latency 线性增加到 slowest，整体列表要等最慢的节点
+    step = (args.slowest - args.latency) / max(len(nodes) - 1, 1)
+    install(FakeCluster(nodes, containers_per_node=args.containers, latency=args.latency,
+                        node_latency={n: args.latency + i * step for i, n in enumerate(nodes)}))
+
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"{args.nodes} 个节点 x {args.containers} 个容器，节点响应 {args.latency}s ~ {args.slowest}s")
+    fetch(base_url, {'mode': 'nodes'})  # 预热：建立连接、加载节点列表缓存
+    for label, params in (("一次性 JSON", {'mode': 'nodes'}), ("NDJSON 流式", {'mode': 'nodes', 'format': 'ndjson'})):
+        tracemalloc.start()
+        first_byte, elapsed, size = fetch(base_url, params)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:10s} 首字节 {first_byte * 1000:7.1f}ms  完成 {elapsed * 1000:7.1f}ms  "
+              f"响应 {size / 1024 / 1024:5.1f}MB  进程内存峰值增量 {peak / 1024 / 1024:6.1f}MB")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/containers 一次性 JSON 与 NDJSON 流式返回的首字节时间与内存峰值对比")
+    parser.add_argument("--nodes", type=int, default=16, help="节点数")
+    parser.add_argument("--containers", type=int, default=1500, help="每个节点的容器数")
+    parser.add_argument("--latency", type=float, default=0.02, help="最快节点的响应耗时 (秒)")
+    parser.add_argument("--slowest", type=float, default=0.8, help="最慢节点的响应耗时 (秒)")
+    parser.add_argument("--port", type=int, default=18765, help="本地监听端口")
+    main(parser.parse_args())
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import time
+
+from fake_proxmox import FakeCluster, install, percentile
+
+
+async def timed_get(client, url, headers, latencies, delay):
+    # 以计划发出时间计时：若事件循环被阻塞，等待时间也计入延迟
+    issued_at = time.perf_counter() + delay
+    await asyncio.sleep(delay)
+    response = await client.get(url, headers=headers)
+    latencies.append(time.perf_counter() - issued_at)
+    return response.status_code
+
+
+async def main(args):
+    install(FakeCluster(["fast", "slow"], latency=args.latency, node_latency={"slow": args.slow}))
+
+    import httpx
+    from app.config import settings
+    from app.database import create_tables
+    from app.main import app
+
+    create_tables()
+    headers = {"Authorization": f"Bearer {settings.global_api_key}"}
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        health, containers = [], []
+        await asyncio.gather(
+            client.get("/api/v1/containers?node=slow", headers=headers),
+            *[timed_get(client, "/health", headers, health, 0.1) for _ in range(args.requests)],
+            *[timed_get(client, "/api/v1/containers?node=fast", headers, containers, 0.1) for _ in range(args.requests)],
+        )
+
+    print(f"慢节点延迟 {args.slow:.1f}s，并发请求数 {args.requests}")
+    for name, values in (("/health", health), ("/api/v1/containers?node=fast", containers)):
+        print(f"{name:32s} p50={percentile(values, 50) * 1000:8.1f}ms "
+              f"p99={percentile(values, 99) * 1000:8.1f}ms max={max(values) * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="慢节点阻塞时 /health 与 /containers 的并发延迟")
+    parser.add_argument("--slow", type=float, default=3.0, help="慢节点单次请求耗时 (秒)")
+    parser.add_argument("--latency", type=float, default=0.02, help="普通节点单次请求耗时 (秒)")
+    parser.add_argument("--requests", type=int, default=20, help="每个端点的并发请求数")
+    asyncio.run(main(parser.parse_args()))
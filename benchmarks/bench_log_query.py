@@ -0,0 +1,128 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from fake_proxmox import percentile
+
+
+def build_table(engine, rows):
+    # 用递归 CTE 在 SQLite 内部生成数据，避免 Python 端逐行插入；索引在数据写完后再建
+    from app.models import OperationLog
+    table = OperationLog.__table__
+    table.create(engine)
+    for index in table.indexes:
+        index.drop(engine)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"""
+            WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {rows})
+            INSERT INTO operation_logs (operation, container_id, node_name, status, message, ip_address, task_id, created_at)
+            SELECT
+                CASE abs(random() % 5) WHEN 0 THEN '创建容器' WHEN 1 THEN '删除容器' WHEN 2 THEN '启动容器'
+                                       WHEN 3 THEN '停止容器' ELSE '获取容器列表' END,
+                CAST(100 + abs(random() % 5000) AS TEXT),
+                'pve' || abs(random() % 16),
+                CASE WHEN abs(random() % 20) = 0 THEN '失败' ELSE '成功' END,
+                'bench',
+                '10.0.0.' || abs(random() % 250),
+                NULL,
+                -- 每秒约 5 条，同一秒内的多行 created_at 相同，由 id 决定先后
+                strftime('%Y-%m-%d %H:%M:%S', 1700000000 + n / 5, 'unixepoch') || '.000000'
+            FROM seq
+        """)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    for index in table.indexes:
+        index.create(engine)
+    print(f"生成 {rows} 行 {loaded:.1f}s，建立 {len(table.indexes)} 个索引 {time.perf_counter() - start:.1f}s")
+
+
+def timed(fn, rounds):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return percentile(latencies, 50) * 1000
+
+
+def main(args):
+    random.seed(args.seed)
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models import OperationLog
+    from app.operation_logs import encode_log_cursor, query_operation_logs
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench-logs-"), "logs.db")
+    engine = create_engine(f"sqlite:///{path}")
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        build_table(engine, args.rows)
+    db = sessionmaker(bind=engine)()
+    rows = db.query(OperationLog).count()
+    print(f"operation_logs 共 {rows} 行（{path}），每页 {args.limit} 条，每项取 {args.rounds} 次中位数")
+    ordered = OperationLog.__table__.select().order_by(OperationLog.created_at.desc(), OperationLog.id.desc())
+
+    print("\n翻到第 N 行处的一页：OFFSET 分页 vs (created_at, id) 键集分页")
+    for depth in (0, 100_000, 1_000_000, rows // 2, rows - args.limit - 1):
+        if depth < 0 or depth >= rows:
+            continue
+        offset_ms = timed(lambda: db.execute(ordered.offset(depth).limit(args.limit)).fetchall(), args.rounds)
+        cursor = None
+        if depth:
+            # 游标即上一页最后一行的 (created_at, id)，此处直接取第 depth 行构造
+            last = db.execute(ordered.offset(depth - 1).limit(1)).first()
+            cursor = encode_log_cursor(last.created_at, last.id)
+        keyset_ms = timed(lambda: query_operation_logs(db, {}, cursor=cursor, limit=args.limit), args.rounds)
+        print(f"  第 {depth:>9d} 行  OFFSET {offset_ms:9.2f}ms   键集 {keyset_ms:6.2f}ms")
+
+    container_id = str(100 + random.randrange(5000))
+    cases = [
+        ("container_id", {'container_id': container_id}, False),
+        ("container_id 第二页", {'container_id': container_id}, False),
+        ("node_name + status", {'node_name': 'pve3', 'status': '失败'}, False),
+        ("operation + 当天", {'operation': '删除容器'}, True),
+    ]
+    newest = db.query(OperationLog.created_at).order_by(OperationLog.created_at.desc()).first()[0]
+
+    def run_cases():
+        results, cursor = [], None
+        for label, filters, ranged in cases:
+            since = newest.replace(hour=0, minute=0, second=0, microsecond=0) if ranged else None
+            page_cursor = cursor if label.endswith("第二页") else None
+            results.append(timed(lambda: query_operation_logs(db, filters, since=since, cursor=page_cursor,
+                                                              limit=args.limit), args.rounds))
+            cursor = query_operation_logs(db, filters, since=since, limit=args.limit)[1]
+        return results
+
+    composite = run_cases()
+    # 换回改动前的索引（operation、container_id、task_id 单列索引）对比同一组查询，结束后恢复
+    composite_indexes = [index for index in OperationLog.__table__.indexes if index.name != 'ix_operation_logs_id']
+    for index in composite_indexes:
+        index.drop(engine)
+    for column in ('operation', 'container_id', 'task_id'):
+        db.execute(text(f"CREATE INDEX bench_{column} ON operation_logs ({column})"))
+    db.commit()
+    single = run_cases()
+    for column in ('operation', 'container_id', 'task_id'):
+        db.execute(text(f"DROP INDEX bench_{column}"))
+    db.commit()
+    for index in composite_indexes:
+        index.create(engine)
+
+    print("\n带过滤条件的一页：单列索引 vs (列, created_at, id) 组合索引")
+    for (label, _, _), before, after in zip(cases, single, composite):
+        print(f"  {label:20s} 单列索引 {before:9.2f}ms   组合索引 {after:6.2f}ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="千万行操作日志上 OFFSET 分页与 (created_at, id) 键集分页、组合索引过滤的耗时")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="生成的日志行数")
+    parser.add_argument("--limit", type=int, default=100, help="每页条数")
+    parser.add_argument("--rounds", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--db", default=None, help="复用已生成的 SQLite 文件，不存在时生成")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
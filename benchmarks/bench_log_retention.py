@@ -0,0 +1,107 @@
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from fake_proxmox import percentile
+
+
+class Writer(threading.Thread):
+    # 模拟归档期间持续写入的操作日志，记录每次插入的耗时与因锁超时失败的次数
+    def __init__(self, engine, interval):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.interval = interval
+        self.latencies = []
+        self.failures = 0
+        self.stop_event = threading.Event()
+
+    def run(self):
+        from sqlalchemy import insert
+
+        from app.models import OperationLog
+        from app.operation_logs import utcnow
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(OperationLog), [{'operation': 'bench', 'container_id': '100', 'node_name': 'pve0',
+                                                         'status': '成功', 'message': '', 'created_at': utcnow()}])
+                self.latencies.append(time.perf_counter() - start)
+            except Exception:
+                self.failures += 1
+            self.stop_event.wait(self.interval)
+
+
+def measure(label, engine, interval, action):
+    writer = Writer(engine, interval)
+    writer.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    result = action()
+    elapsed = time.perf_counter() - start
+    writer.stop_event.set()
+    writer.join()
+    latencies = writer.latencies
+    print(f"{label:10s} 耗时 {elapsed:6.1f}s  {result}  并发写入 {len(latencies)} 次，p50 {percentile(latencies, 50) * 1000:7.1f}ms  "
+          f"p99 {percentile(latencies, 99) * 1000:7.1f}ms  最大 {max(latencies, default=0) * 1000:7.1f}ms  失败 {writer.failures}")
+
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="bench-retention-")
+    source = os.path.join(workdir, "source.db")
+    target = os.path.join(workdir, "logs.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{target}"
+    os.environ["LOG_ARCHIVE_DIR"] = os.path.join(workdir, "archive")
+
+    from sqlalchemy import create_engine, text
+
+    from bench_log_query import build_table
+    build_table(create_engine(f"sqlite:///{source}"), args.rows)
+
+    from app.config import settings
+    from app.database import engine
+    from app.log_retention import log_retention
+
+    keep = int(args.rows * args.keep_ratio)
+    settings.log_retention_days = 0
+    settings.log_retention_max_rows = keep
+    print(f"{args.rows} 行操作日志，保留最新 {keep} 行，归档/删除其余 {args.rows - keep} 行；"
+          f"归档期间每 {args.interval * 1000:.0f}ms 写入一条日志")
+
+    def single_delete():
+        with engine.begin() as conn:
+            boundary = conn.execute(text("SELECT id FROM operation_logs ORDER BY id DESC LIMIT 1 OFFSET :n"),
+                                    {'n': keep}).scalar()
+            deleted = conn.execute(text("DELETE FROM operation_logs WHERE id <= :id"), {'id': boundary}).rowcount
+        return f"删除 {deleted} 行"
+
+    def retention():
+        result = log_retention.run_once()
+        return f"归档 {result['archived']} 行"
+
+    for label, action in (("一次性删除", single_delete), ("分块归档", retention)):
+        engine.dispose()
+        shutil.copy(source, target)
+        measure(label, engine, args.interval, action)
+
+    archive_bytes = sum(os.path.getsize(os.path.join(root, name))
+                        for root, _, names in os.walk(log_retention.archive_dir) for name in names)
+    print(f"归档 {log_retention.parts} 个分片，共 {archive_bytes / 1024 / 1024:.1f}MB"
+          f"（约 {archive_bytes / max(log_retention.archived, 1):.0f} 字节/行）")
+
+    start = time.perf_counter()
+    logs, _ = log_retention.read_archive({'node_name': 'pve3'}, limit=100)
+    print(f"读取归档最新一天中 pve3 的 100 条日志 {(time.perf_counter() - start) * 1000:.0f}ms，"
+          f"最新一条 {logs[0]['created_at'] if logs else None}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="一次性删除旧日志与分块归档、分批删除时并发写入日志的延迟")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="日志总行数")
+    parser.add_argument("--keep-ratio", type=float, default=0.2, help="保留的最新日志比例")
+    parser.add_argument("--interval", type=float, default=0.01, help="并发写入间隔（秒）")
+    main(parser.parse_args())
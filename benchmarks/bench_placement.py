@@ -0,0 +1,66 @@
+import argparse
+import random
+import time
+from collections import Counter
+
+from fake_proxmox import FakeCluster, install, percentile
+
+
+def fresh_api_choice(service, nodes, storage, memory, disk):
+    # 对照组：每次创建都重新请求节点列表与各节点存储，再按空闲内存挑选
+    best, best_free = None, None
+    for node in service.get_nodes(use_cache=False):
+        entry = next((s for s in service.get_storages(node['node'], use_cache=False) if s['storage'] == storage), None)
+        if entry is None or entry['avail'] < disk:
+            continue
+        free = node['maxmem'] - node['mem'] - memory
+        if best_free is None or free > best_free:
+            best, best_free = node['node'], free
+    return best
+
+
+def main(args):
+    random.seed(args.seed)
+    nodes = [f"pve{i}" for i in range(args.nodes)]
+    cluster = install(FakeCluster(nodes, containers_per_node=5, latency=args.latency))
+    for node in nodes:
+        cluster.node_metrics[node].update(cpu=random.uniform(0.05, 0.95), mem=random.randint(1, 7) << 30)
+    # 一个节点的存储几乎写满，自动选点应排除它
+    cluster.storage_used[nodes[-1]] = 98 << 30
+
+    from app.placement import node_placer
+    from app.proxmox import proxmox_service
+
+    print(f"{args.nodes} 个节点，单次 API 请求耗时 {args.latency}s")
+    start = time.perf_counter()
+    for _ in range(args.fresh):
+        fresh_api_choice(proxmox_service, nodes, 'local', 512 << 20, 8 << 30)
+    print(f"每次请求 API 选点   平均 {(time.perf_counter() - start) / args.fresh * 1000:9.3f} ms/次")
+
+    node_placer.place('local', 512, 8)  # 首次调用加载快照
+    node_placer.release(nodes[0])
+    timings = []
+    for _ in range(args.decisions):
+        start = time.perf_counter()
+        node = node_placer.place('local', 512, 8)
+        timings.append((time.perf_counter() - start) * 1e6)
+        node_placer.release(node)
+    print(f"快照打分选点        平均 {sum(timings) / len(timings):9.1f} us/次  p99 {percentile(timings, 99):7.1f} us")
+
+    placed = Counter(node_placer.place('local', 512, 8) for _ in range(args.burst))
+    print(f"连续 {args.burst} 个创建（未完成前均计入待创建数）的分布:")
+    for node in nodes:
+        metrics = cluster.node_metrics[node]
+        print(f"  {node}  cpu {metrics['cpu']:4.2f}  内存 {metrics['mem'] >> 30}/{metrics['maxmem'] >> 30}G  "
+              f"存储已用 {cluster.storage_used[node] >> 30:3d}G  分配 {placed.get(node, 0):3d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按快照打分自动选点与每次请求 API 选点的耗时，以及选点分布")
+    parser.add_argument("--nodes", type=int, default=8, help="节点数")
+    parser.add_argument("--decisions", type=int, default=10000, help="快照选点的次数")
+    parser.add_argument("--fresh", type=int, default=20, help="每次请求 API 选点的次数")
+    parser.add_argument("--burst", type=int, default=40, help="连续自动选点的创建数")
+    parser.add_argument("--latency", type=float, default=0.02, help="单次 API 请求耗时 (秒)")
+    parser.add_argument("--seed", type=int, default=3, help="随机种子")
+    main(parser.parse_args())
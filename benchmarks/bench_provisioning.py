@@ -0,0 +1,74 @@
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_proxmox import FakeCluster, install
+
+
+def naive_create(service, node, hostname):
+    # 旧用法：客户端各自调用 /cluster/nextid 取 ID 后立即创建，并发时会拿到相同的 ID
+    from app.schemas import ContainerCreate, NetworkInterface
+
+    data = ContainerCreate(node=node, vmid=service.get_next_vmid(), hostname=hostname, password="x",
+                           ostemplate="local:vztmpl/t.tar.gz", storage="local", disk_size=4, network=NetworkInterface())
+    return service.create_container(data)['success']
+
+
+def max_overlap(tasks):
+    events = sorted([(t['started_at'], 1) for t in tasks] + [(t['done_at'], -1) for t in tasks])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def main(args):
+    nodes = [f"pve{i}" for i in range(args.nodes)]
+    cluster = install(FakeCluster(nodes, containers_per_node=5, latency=args.latency, task_duration=args.duration))
+
+    from fastapi.testclient import TestClient
+
+    from app.config import settings
+    from app.main import app
+    from app.proxmox import proxmox_service
+
+    print(f"批量创建 {args.count} 个容器，{args.nodes} 个节点，创建任务耗时 {args.duration}s")
+
+    with ThreadPoolExecutor(max_workers=args.count) as executor:
+        results = list(executor.map(lambda i: naive_create(proxmox_service, nodes[i % len(nodes)], f"naive-{i}"),
+                                    range(args.count)))
+    print(f"并发 nextid + 创建  成功 {sum(results):3d}  VMID 冲突失败 {results.count(False):3d}")
+
+    cluster.tasks.clear()
+    headers = {"Authorization": "Bearer bench-key"}
+    template = {'hostname': 'lab', 'password': 'x', 'ostemplate': 'local:vztmpl/t.tar.gz', 'storage': 'local',
+                'disk_size': 4, 'network': {}}
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        job_id = client.post("/api/v1/containers/batch", json={'template': template, 'count': args.count},
+                             headers=headers).json()['data']['job_id']
+        while True:
+            job = client.get(f"/api/v1/jobs/{job_id}", headers=headers).json()['data']
+            if job['status'] not in ('queued', 'running'):
+                break
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - start
+
+    vmids = [item['vmid'] for item in job['items']]
+    creates = [t for t in cluster.tasks.values() if t['type'] == 'vzcreate']
+    per_node = Counter(item['node'] for item in job['items'])
+    peak = max(max_overlap([t for t in creates if t['node'] == n]) for n in nodes)
+    print(f"批量创建作业        状态 {job['status']}  进度 {job['progress']}  耗时 {elapsed:5.2f}s")
+    print(f"VMID 唯一 {len(set(vmids)) == len(vmids)}  节点分布 {dict(sorted(per_node.items()))}  "
+          f"单节点最大并发创建 {peak} (上限 {settings.admission_node_concurrency})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发自取 VMID 与批量创建作业的对比")
+    parser.add_argument("--count", type=int, default=50, help="创建的容器数")
+    parser.add_argument("--nodes", type=int, default=4, help="节点数")
+    parser.add_argument("--duration", type=float, default=1.0, help="单个创建任务耗时 (秒)")
+    parser.add_argument("--latency", type=float, default=0.02, help="单次 API 请求耗时 (秒)")
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from fake_proxmox import FakeCluster, install, percentile
+
+
+def run_workload(session_factory, writers, readers, duration):
+    from app import nat_service
+    from app.auth import log_operation
+
+    stats = {'write': [], 'read': [], 'write_errors': 0, 'read_errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def writer(i):
+        while time.perf_counter() < deadline:
+            db = session_factory()
+            start = time.perf_counter()
+            try:
+                log_operation(db, "获取容器列表", str(100 + i), f"pve{i % 4}", "成功", "bench", "127.0.0.1")
+                with lock:
+                    stats['write'].append(time.perf_counter() - start)
+            except Exception:
+                db.rollback()
+                with lock:
+                    stats['write_errors'] += 1
+            finally:
+                db.close()
+
+    def reader(i):
+        while time.perf_counter() < deadline:
+            db = session_factory()
+            start = time.perf_counter()
+            try:
+                if i % 2:
+                    nat_service.get_all_nat_rules(db, 0, 100)
+                else:
+                    nat_service.get_nat_rules_for_container(db, f"pve{i % 4}", 100 + i % 50)
+                with lock:
+                    stats['read'].append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    stats['read_errors'] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def main(args):
+    install(FakeCluster(["pve0"], containers_per_node=1, latency=0.0))
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database import Base, build_engine
+    from app.models import NatRule
+
+    workdir = tempfile.mkdtemp(prefix="bench-sqlite-")
+    print(f"{args.writers} 个线程逐条提交操作日志，{args.readers} 个线程查询 NAT 规则，每种配置运行 {args.duration:.0f} 秒")
+    modes = (
+        # 改动前 database.py 的写法：回滚日志、synchronous=FULL、驱动默认 5 秒锁等待、默认连接池
+        ("默认配置", lambda url: create_engine(url, connect_args={"check_same_thread": False})),
+        ("WAL 调优", build_engine),
+    )
+    for label, factory in modes:
+        path = os.path.join(workdir, f"{len(os.listdir(workdir))}.db")
+        engine = factory(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = session_factory()
+        db.add_all([NatRule(node=f"pve{i % 4}", vmid=100 + i % 50, host_port=20000 + i, container_port=22,
+                            protocol='tcp', container_ip_at_creation=f"10.0.{i // 250}.{i % 250}")
+                    for i in range(args.rules)])
+        db.commit()
+        db.close()
+
+        stats = run_workload(session_factory, args.writers, args.readers, args.duration)
+        with engine.connect() as conn:
+            journal = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        writes, reads = stats['write'], stats['read']
+        print(f"{label}（journal_mode={journal}）")
+        print(f"  写入 {len(writes) / args.duration:8.1f} 次/秒  p50 {percentile(writes, 50) * 1000:7.2f}ms  "
+              f"p99 {percentile(writes, 99) * 1000:8.2f}ms  database is locked 等错误 {stats['write_errors']}")
+        print(f"  读取 {len(reads) / args.duration:8.1f} 次/秒  p50 {percentile(reads, 50) * 1000:7.2f}ms  "
+              f"p99 {percentile(reads, 99) * 1000:8.2f}ms  错误 {stats['read_errors']}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="默认 SQLite 配置与 WAL 调优配置下并发写日志、读 NAT 规则的吞吐与延迟")
+    parser.add_argument("--writers", type=int, default=8, help="写日志线程数")
+    parser.add_argument("--readers", type=int, default=4, help="读 NAT 规则线程数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每种配置的运行秒数")
+    parser.add_argument("--rules", type=int, default=500, help="NAT 规则数")
+    main(parser.parse_args())
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import random
+import time
+
+from fake_proxmox import FakeCluster, install
+
+
+async def legacy_subscriber(service, run_blocking, node, upid, interval):
+    # 旧方式：每个客户端循环请求任务状态，并每次重新拉取完整日志；各客户端的轮询相位随机
+    await asyncio.sleep(random.uniform(0, interval))
+    while True:
+        status = await run_blocking(service.get_task_status, node, upid)
+        await run_blocking(service.get_task_log, node, upid, 0, 500)
+        if status.get('status') == 'stopped':
+            return
+        await asyncio.sleep(interval)
+
+
+async def stream_subscriber(hub, node, upid):
+    lines = 0
+    async for event in hub.subscribe(node, upid):
+        if event is not None and event['event'] == 'log':
+            lines += 1
+    return lines
+
+
+async def run(cluster, args, use_stream):
+    from app.concurrency import run_blocking
+    from app.proxmox import proxmox_service
+    from app.task_stream import task_stream_hub
+
+    cluster.reset()
+    node = cluster.nodes[0]
+    upid = cluster.new_task(node, "vzcreate", 200, args.duration)
+    start = time.perf_counter()
+    if use_stream:
+        await asyncio.gather(*(stream_subscriber(task_stream_hub, node, upid) for _ in range(args.subscribers)))
+    else:
+        await asyncio.gather(*(legacy_subscriber(proxmox_service, run_blocking, node, upid, args.interval)
+                               for _ in range(args.subscribers)))
+    elapsed = time.perf_counter() - start
+    return cluster.total_requests(), elapsed
+
+
+async def main(args):
+    random.seed(args.seed)
+    cluster = install(FakeCluster(["pve0"], latency=args.latency))
+    print(f"{args.subscribers} 个客户端订阅同一任务，任务耗时 {args.duration}s")
+    for label, use_stream in (("客户端各自轮询", False), ("共享任务流", True)):
+        requests, elapsed = await run(cluster, args, use_stream)
+        print(f"{label:10s} 上游请求数 {requests:5d}  全部结束耗时 {elapsed:6.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="客户端轮询与共享任务流 (SSE) 的上游请求数对比")
+    parser.add_argument("--subscribers", type=int, default=50, help="订阅同一任务的客户端数")
+    parser.add_argument("--duration", type=float, default=5.0, help="任务耗时 (秒)")
+    parser.add_argument("--interval", type=float, default=1.0, help="旧方式的客户端轮询间隔 (秒)")
+    parser.add_argument("--latency", type=float, default=0.01, help="单次 API 请求耗时 (秒)")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_proxmox import FakeCluster, install, percentile
+
+
+def legacy_wait(service, node, upid, interval):
+    # 旧实现：每个等待方各自按固定间隔轮询任务状态
+    while True:
+        status = service.get_task_status(node, upid)
+        if status.get('status') == 'stopped':
+            return
+        time.sleep(interval)
+
+
+def run(service, cluster, args, use_tracker):
+    rng = random.Random(args.seed)
+    cluster.reset()
+    upids = []
+    for i in range(args.tasks):
+        node = cluster.nodes[i % len(cluster.nodes)]
+        task_type = rng.choice(["vzcreate", "vzdestroy", "vzstop", "vzstart"])
+        upids.append((node, cluster.new_task(node, task_type, 1000 + i, rng.uniform(args.min_duration, args.max_duration))))
+
+    def wait(node, upid):
+        if use_tracker:
+            service.task_tracker.wait_sync(node, upid, 600)
+        else:
+            legacy_wait(service, node, upid, args.legacy_interval)
+        # 完成延迟：任务实际结束到等待方感知结束之间的时间
+        return time.monotonic() - cluster.tasks[upid]['done_at']
+
+    with ThreadPoolExecutor(max_workers=args.tasks) as executor:
+        lags = list(executor.map(lambda item: wait(*item), upids))
+    polls = sum(count for key, count in cluster.requests.items() if '/tasks' in key)
+    return polls, lags
+
+
+def main(args):
+    cluster = install(FakeCluster([f"pve{i}" for i in range(args.nodes)], latency=args.latency))
+
+    from app.proxmox import ProxmoxService
+
+    service = ProxmoxService()
+    print(f"{args.tasks} 个并发任务，{args.nodes} 个节点，任务耗时 {args.min_duration}-{args.max_duration}s")
+    for label, use_tracker in (("逐任务固定间隔轮询", False), ("共享任务跟踪器", True)):
+        polls, lags = run(service, cluster, args, use_tracker)
+        print(f"{label:12s} 轮询请求数 {polls:5d}  完成延迟 平均 {sum(lags) / len(lags):5.2f}s  "
+              f"p95 {percentile(lags, 95):5.2f}s  最大 {max(lags):5.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="逐任务轮询与共享任务跟踪器的轮询请求数与完成延迟对比")
+    parser.add_argument("--tasks", type=int, default=40, help="并发任务数")
+    parser.add_argument("--nodes", type=int, default=3, help="节点数")
+    parser.add_argument("--min-duration", type=float, default=2.0, help="任务最短耗时 (秒)")
+    parser.add_argument("--max-duration", type=float, default=10.0, help="任务最长耗时 (秒)")
+    parser.add_argument("--legacy-interval", type=float, default=2.0, help="旧实现的轮询间隔 (秒)")
+    parser.add_argument("--latency", type=float, default=0.01, help="单次 API 请求耗时 (秒)")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    main(parser.parse_args())
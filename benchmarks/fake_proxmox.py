@@ -0,0 +1,234 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class FakeCluster:
+    # 模拟 Proxmox API：按节点配置延迟，并统计每个路径的请求次数
+
+    def __init__(self, nodes: List[str], containers_per_node: int = 10, latency: float = 0.02,
+                 node_latency: Optional[Dict[str, float]] = None, task_duration: float = 0.0,
+                 storage_slots: Optional[int] = None):
+        self.nodes = list(nodes)
+        # 模拟节点存储的 IO 能力：同时进行的创建/删除任务超过 storage_slots 时按比例变慢，
+        # 达到两倍时新任务因拿不到存储锁而失败
+        self.storage_slots = storage_slots
+        # 各节点的负载与本地存储用量，基准脚本可直接修改
+        self.node_metrics = {n: {'cpu': 0.1, 'maxcpu': 8, 'mem': 1 << 30, 'maxmem': 8 << 30,
+                                 'disk': 1 << 30, 'maxdisk': 100 << 30} for n in self.nodes}
+        self.storage_used = {n: 50 << 30 for n in self.nodes}
+        self.latency = latency
+        self.task_duration = task_duration
+        self.tasks = {}
+        self._task_seq = 0
+        self.node_latency = node_latency or {}
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        self.containers = {}
+        vmid = 100
+        for node in self.nodes:
+            for _ in range(containers_per_node):
+                self.containers[vmid] = {
+                    'vmid': vmid, 'name': f'ct-{vmid}', 'node': node,
+                    'status': 'running' if vmid % 3 else 'stopped',
+                    'cpu': (vmid % 7) / 10, 'mem': vmid * 1024 * 1024, 'maxmem': 512 * 1024 * 1024,
+                    'uptime': vmid * 60, 'template': 0,
+                }
+                vmid += 1
+
+    def total_requests(self) -> int:
+        with self.lock:
+            return sum(self.requests.values())
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+
+    def _storage_active(self, node: str) -> int:
+        now = time.monotonic()
+        return sum(1 for t in self.tasks.values()
+                   if t['node'] == node and t['type'] in ('vzcreate', 'vzdestroy') and t['done_at'] > now)
+
+    def new_task(self, node: str, task_type: str, vmid, duration: Optional[float] = None) -> str:
+        with self.lock:
+            self._task_seq += 1
+            starttime = int(time.time())
+            upid = f"UPID:{node}:{self._task_seq:08X}:00000001:{starttime:08X}:{task_type}:{vmid}:root@pam:"
+            duration = self.task_duration if duration is None else duration
+            exitstatus = 'OK'
+            if self.storage_slots and task_type in ('vzcreate', 'vzdestroy'):
+                active = self._storage_active(node)
+                if active >= 2 * self.storage_slots:
+                    exitstatus = "can't lock file '/var/lock/pve-manager/pve-storage' - got timeout"
+                duration *= max(1.0, (active + 1) / self.storage_slots)
+            self.tasks[upid] = {
+                'upid': upid, 'node': node, 'type': task_type, 'id': str(vmid), 'user': 'root@pam',
+                'starttime': starttime,
+                'started_at': time.monotonic(),
+                'done_at': time.monotonic() + duration,
+                'exitstatus': exitstatus,
+                'log': [f"{task_type} {vmid}: step {i}" for i in range(5)],
+            }
+        return upid
+
+    def _task_view(self, task):
+        view = {k: task[k] for k in ('upid', 'node', 'type', 'id', 'user', 'starttime')}
+        if time.monotonic() >= task['done_at']:
+            view.update(status=task.get('exitstatus', 'OK'), endtime=task['starttime'] + 1)
+        return view
+
+    def _sleep_for(self, parts: List[str]):
+        if len(parts) >= 2 and parts[0] == 'nodes' and parts[1] in self.node_latency:
+            time.sleep(self.node_latency[parts[1]])
+        else:
+            time.sleep(self.latency)
+
+    def handle(self, method: str, path: str, params: dict):
+        parts = [p for p in path.split('/') if p]
+        with self.lock:
+            self.requests[f"{method} {'/'.join(parts)}"] += 1
+        self._sleep_for(parts)
+
+        if parts == ['nodes']:
+            return [dict(self.node_metrics[n], node=n, status='online', uptime=1000) for n in self.nodes]
+        if parts == ['cluster', 'resources']:
+            resources = [dict(c, id=f"lxc/{c['vmid']}", type='lxc') for c in self.containers.values()]
+            if params.get('type') == 'vm':
+                return resources
+            nodes = [dict(self.node_metrics[n], id=f'node/{n}', type='node', node=n, status='online') for n in self.nodes]
+            storages = [{'id': f'storage/{n}/local', 'type': 'storage', 'node': n, 'storage': 'local', 'shared': 0,
+                         'disk': self.storage_used[n], 'maxdisk': 100 << 30, 'status': 'available'} for n in self.nodes]
+            return resources + nodes + storages
+        if parts == ['cluster', 'nextid']:
+            with self.lock:
+                if 'vmid' in params:
+                    if int(params['vmid']) in self.containers:
+                        raise Exception(f"VM {params['vmid']} already exists")
+                    return str(params['vmid'])
+                vmid = 100
+                while vmid in self.containers:
+                    vmid += 1
+                return str(vmid)
+        if len(parts) == 3 and parts[0] == 'nodes' and parts[2] == 'lxc':
+            if method == 'POST':
+                vmid = int(params.get('vmid'))
+                with self.lock:
+                    if vmid in self.containers:
+                        raise Exception(f"CT {vmid} already exists on node '{self.containers[vmid]['node']}'")
+                    self.containers[vmid] = {
+                        'vmid': vmid, 'name': params.get('hostname'), 'node': parts[1], 'status': 'stopped',
+                        'cpu': 0, 'mem': 0, 'maxmem': params.get('memory', 512) * 1024 * 1024, 'uptime': 0, 'template': 0,
+                    }
+                return self.new_task(parts[1], 'vzcreate', vmid)
+            return [{k: v for k, v in c.items() if k != 'node'}
+                    for c in self.containers.values() if c['node'] == parts[1]]
+        if len(parts) >= 4 and parts[0] == 'nodes' and parts[2] == 'lxc':
+            container = self.containers.get(int(parts[3]), {})
+            tail = parts[4:]
+            if tail == ['status', 'current']:
+                return {k: container.get(k) for k in ('status', 'uptime', 'cpu', 'mem', 'maxmem')}
+            if tail == ['config']:
+                if not container:
+                    raise Exception(f"Configuration file 'nodes/{parts[1]}/lxc/{parts[3]}.conf' does not exist")
+                return {'hostname': container.get('name'), 'digest': 'd1', 'rootfs': f"local:vm-{parts[3]}-disk-0,size=8G",
+                        'net0': 'name=eth0,bridge=vmbr0,ip=10.0.0.%d/24' % (int(parts[3]) % 250)}
+            if method == 'DELETE':
+                with self.lock:
+                    self.containers.pop(int(parts[3]), None)
+                return self.new_task(parts[1], 'vzdestroy', parts[3])
+            if method == 'POST' and len(tail) == 2 and tail[0] == 'status':
+                return self.new_task(parts[1], f"vz{tail[1]}", parts[3])
+        if len(parts) == 3 and parts[0] == 'nodes' and parts[2] == 'tasks':
+            since = params.get('since', 0)
+            return [self._task_view(t) for t in list(self.tasks.values())
+                    if t['node'] == parts[1] and t['starttime'] >= since][:params.get('limit', 50)]
+        if len(parts) == 4 and parts[0] == 'nodes' and parts[2] == 'tasks' and method == 'DELETE':
+            task = self.tasks.get(parts[3])
+            if task is not None:
+                task['done_at'] = min(task['done_at'], time.monotonic())
+            return None
+        if len(parts) >= 5 and parts[0] == 'nodes' and parts[2] == 'tasks':
+            task = self.tasks.get(parts[3])
+            if task is None:
+                raise Exception(f"unable to open file '/var/log/pve/tasks/{parts[3]}' - No such file or directory")
+            view = self._task_view(task)
+            if parts[4] == 'status':
+                return dict(view, status='stopped', exitstatus=view['status']) if 'endtime' in view else dict(view, status='running')
+            if parts[4] == 'log':
+                finished = 'endtime' in view
+                end = 'TASK OK' if view.get('status') == 'OK' else f"TASK ERROR: {view.get('status')}"
+                lines = task['log'] + [end] if finished else task['log'][:2]
+                start = int(params.get('start', 0))
+                page = [{'n': i + 1, 't': line} for i, line in enumerate(lines)][start:start + int(params.get('limit', 50))]
+                # 与 Proxmox 一致：偏移之后没有日志时返回一行占位内容
+                return page or [{'n': 1, 't': 'no content'}]
+        if len(parts) == 3 and parts[0] == 'nodes' and parts[2] == 'storage':
+            return [{'storage': 'local', 'content': 'vztmpl,iso,rootdir', 'avail': (100 << 30) - self.storage_used[parts[1]],
+                     'used': self.storage_used[parts[1]], 'total': 100 << 30, 'shared': 0}]
+        if len(parts) == 3 and parts[0] == 'nodes' and parts[2] == 'network':
+            return [{'iface': 'vmbr0', 'type': 'bridge'}]
+        return {}
+
+
+class FakeResource:
+    def __init__(self, cluster: FakeCluster, base_url: str = ""):
+        self._store = {'base_url': base_url, 'cluster': cluster}
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+        return FakeResource(self._store['cluster'], f"{self._store['base_url']}/{item}")
+
+    def __call__(self, resource_id=None):
+        if resource_id in (None, ""):
+            return self
+        if isinstance(resource_id, (list, tuple)):
+            resource_id = "/".join(str(r) for r in resource_id)
+        return FakeResource(self._store['cluster'], f"{self._store['base_url']}/{resource_id}")
+
+    def _request(self, method, args, params):
+        target = self(args) if args else self
+        return self._store['cluster'].handle(method, target._store['base_url'], params)
+
+    def get(self, *args, **params):
+        return self._request('GET', args, params)
+
+    def post(self, *args, **data):
+        return self._request('POST', args, data)
+
+    def put(self, *args, **data):
+        return self._request('PUT', args, data)
+
+    def delete(self, *args, **params):
+        return self._request('DELETE', args, params)
+
+
+def install(cluster: FakeCluster):
+    # 必须在导入 app.* 之前调用：替换 proxmoxer.ProxmoxAPI 并使用临时数据库
+    import proxmoxer
+
+    class FakeProxmoxAPI(FakeResource):
+        def __init__(self, host=None, **kwargs):
+            super().__init__(cluster)
+
+    proxmoxer.ProxmoxAPI = FakeProxmoxAPI
+    db_path = os.path.join(tempfile.mkdtemp(prefix="pve-bench-"), "bench.db")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{db_path}")
+    os.environ.setdefault("GLOBAL_API_KEY", "bench-key")
+    return cluster
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -11,6 +11,46 @@ CREATE TABLE IF NOT EXISTS operation_logs (
 );
 
 CREATE INDEX IF NOT EXISTS ix_operation_logs_id ON operation_logs (id);
-CREATE INDEX IF NOT EXISTS ix_operation_logs_operation ON operation_logs (operation);
-CREATE INDEX IF NOT EXISTS ix_operation_logs_container_id ON operation_logs (container_id);
-CREATE INDEX IF NOT EXISTS ix_operation_logs_task_id ON operation_logs (task_id);
+
+-- 单列索引由下面的 (列, created_at, id) 组合索引覆盖
+DROP INDEX IF EXISTS ix_operation_logs_operation;
+DROP INDEX IF EXISTS ix_operation_logs_container_id;
+DROP INDEX IF EXISTS ix_operation_logs_task_id;
+
+CREATE INDEX IF NOT EXISTS ix_operation_logs_created_at_id ON operation_logs (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_operation_logs_container_id_created_at ON operation_logs (container_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_operation_logs_node_name_created_at ON operation_logs (node_name, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_operation_logs_operation_created_at ON operation_logs (operation, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_operation_logs_status_created_at ON operation_logs (status, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_operation_logs_task_id_created_at ON operation_logs (task_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    type VARCHAR(30) NOT NULL,
+    node VARCHAR(50),
+    vmid VARCHAR(20),
+    status VARCHAR(20) NOT NULL,
+    stage VARCHAR(30),
+    message TEXT,
+    payload TEXT,
+    stages TEXT,
+    items TEXT,
+    task_id VARCHAR(255),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    next_run_at TIMESTAMP,
+    client_ip VARCHAR(45),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    owner VARCHAR(64),
+    heartbeat_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_type ON jobs (type);
+CREATE INDEX IF NOT EXISTS ix_jobs_node ON jobs (node);
+CREATE INDEX IF NOT EXISTS ix_jobs_vmid ON jobs (vmid);
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS ix_jobs_next_run_at ON jobs (next_run_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_created_at ON jobs (created_at);
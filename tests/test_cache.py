@@ -0,0 +1,60 @@
+import threading
+
+from app.cache import TTLCache
+
+
+def test_invalidate_during_slow_load_does_not_store_stale_value():
+    cache = TTLCache(maxsize=8, default_ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return 'stale'
+
+    worker = threading.Thread(target=lambda: results.append(cache.get_or_load('ct', slow_loader)))
+    worker.start()
+    assert started.wait(5)
+    cache.invalidate('ct')
+    release.set()
+    worker.join(5)
+
+    assert results == ['stale']
+    assert cache.get('ct') is None
+    assert cache.get_or_load('ct', lambda: 'fresh') == 'fresh'
+    assert cache.get('ct') == 'fresh'
+
+
+def test_invalidate_where_during_slow_load_does_not_store_stale_value():
+    cache = TTLCache(maxsize=8, default_ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait(5)
+        return 'stale'
+
+    worker = threading.Thread(target=lambda: cache.get_or_load(('node1', 100), slow_loader))
+    worker.start()
+    assert started.wait(5)
+    cache.invalidate_where(lambda key: key[0] == 'node1')
+    release.set()
+    worker.join(5)
+
+    assert cache.get(('node1', 100)) is None
+
+
+def test_load_without_invalidation_is_cached():
+    cache = TTLCache(maxsize=8, default_ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return 'value'
+
+    assert cache.get_or_load('ct', loader) == 'value'
+    assert cache.get_or_load('ct', loader) == 'value'
+    assert len(calls) == 1
@@ -0,0 +1,48 @@
+import base64
+import json
+
+import pytest
+
+from app.inventory import ContainerIndex, decode_cursor, encode_cursor
+
+
+def make_index():
+    return ContainerIndex([
+        {'vmid': 100 + i, 'node': f'pve{i % 2}', 'name': f'ct-{i}', 'status': 'running', 'cpu': i / 10,
+         'mem': i * 1024, 'uptime': i, 'template': 0}
+        for i in range(6)
+    ])
+
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def test_cursor_continues_from_last_item():
+    index = make_index()
+    page, total, cursor = index.query(sort='cpu', limit=4)
+    assert total == 6
+    rest, _, next_cursor = index.query(sort='cpu', limit=4, cursor=cursor)
+    assert [c['vmid'] for c in page + rest] == [100, 101, 102, 103, 104, 105]
+    assert next_cursor is None
+
+
+@pytest.mark.parametrize('sort, values', [
+    ('vmid', ['vmid', 'x', 'pve0', 100]),
+    ('name', ['name', 1, 'pve0', 100]),
+    ('cpu', ['cpu', 'x', 1, 2]),
+    ('cpu', ['cpu', 0.5, 'pve0', '100']),
+    ('mem', ['mem', True, 'pve0', 100]),
+    ('uptime', ['uptime', None, 'pve0', 100]),
+])
+def test_tampered_cursor_is_rejected(sort, values):
+    cursor = raw_cursor(values)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort)
+    with pytest.raises(ValueError):
+        make_index().query(sort=sort, cursor=cursor, limit=2)
+
+
+def test_cursor_for_other_sort_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('vmid', (100, 'pve0', 100)), 'name')